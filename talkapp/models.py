@@ -12,6 +12,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 import re
 from django.core.exceptions import ValidationError
+from utils.images import register_image_variants, variant_url
 
 user = settings.AUTH_USER_MODEL
 
@@ -101,7 +102,7 @@ class CustomUser(AbstractUser, ModelUtilsMixin):
             data["date_of_birth"] = self.individuals_profile.date_of_birth
             data["interests"] = self.individuals_profile.interests
             data["bio"] = self.individuals_profile.bio
-            data["profile_photo"] = self.individuals_profile.get_profile_photo().photo.url if hasattr(self.individuals_profile, 'get_profile_photo') else None
+            data["profile_photo"] = self.individuals_profile.get_profile_photo()
         elif user_role[1] == "service providers":
             data["business_name"] = self.serviceproviders_profile.business_name 
             data["business_email"] = self.serviceproviders_profile.business_email 
@@ -111,7 +112,7 @@ class CustomUser(AbstractUser, ModelUtilsMixin):
             data["city"] = self.serviceproviders_profile.city 
             data["address"] = self.serviceproviders_profile.address 
             data["address_verified"] = self.serviceproviders_profile.address_verified 
-            data["logo"] = self.get_logo().logo.url if hasattr(self.serviceproviders_profile, 'get_logo') else None
+            data["logo"] = self.serviceproviders_profile.get_logo()
         return data
 
     def generate_talk_id(self):
@@ -167,13 +168,14 @@ class Individual(ModelUtilsMixin):
     date_of_birth = models.DateField()
     interests = models.JSONField(blank=True, null=True)
     photo = models.FileField(upload_to=individual_profile_image_upload_path, blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True, null=True)
 
     def __str__(self):
         return str(self.user)
     
-    def get_profile_photo(self):
-        return self.photo.url if self.photo else None
+    def get_profile_photo(self, size="thumb"):
+        return variant_url(self.photo, self.photo_variants, size)
 
 
 class ServiceProvider(ModelUtilsMixin):
@@ -185,6 +187,7 @@ class ServiceProvider(ModelUtilsMixin):
     business_tel = models.CharField(max_length=25, blank=False)
     business_type = models.CharField(max_length=100)
     logo = models.FileField(upload_to=sp_profile_image_upload_path, blank=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField()
     city = models.CharField(max_length=100)
     address = models.CharField(max_length=255)
@@ -193,8 +196,8 @@ class ServiceProvider(ModelUtilsMixin):
     def __str__(self):
         return str(self.business_name)
     
-    def get_logo(self):
-        return self.logo.url if self.logo else None
+    def get_logo(self, size="thumb"):
+        return variant_url(self.logo, self.logo_variants, size)
 class Review(models.Model):
     service_provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE)
     user = models.ForeignKey(user, on_delete=models.CASCADE)
@@ -205,3 +208,7 @@ class Review(models.Model):
         return f"{self.user} rated {self.service_provider} with {self.rating}"
 
 
+
+
+register_image_variants(Individual, "photo")
+register_image_variants(ServiceProvider, "logo")
@@ -0,0 +1,149 @@
+"""
+Batched rendering for post feeds.
+
+``PostContent.post_profile()`` looks up likers, media and the author one post
+at a time. The helpers below load the same relations for a whole page up
+front, so rendering a feed costs a fixed number of queries however many posts
+it holds. Payloads are served from the fragment cache where possible and only
+the misses are rebuilt.
+"""
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+from .fragments import get_fragments, store_fragments
+from .models import PostContent, PostLikes, RePostContent
+
+FEED_PREFETCH = (
+    "post_images",
+    "post_videos",
+)
+
+# Reposts of reposts are followed this many levels down, deeper originals are
+# rendered as null
+REPOST_MAX_DEPTH = getattr(settings, "REPOST_MAX_DEPTH", 5)
+
+
+def feed_queryset(queryset=None):
+    """
+    Loads ``queryset`` for rendering in one statement: reposts come back as
+    ``RePostContent`` through a join rather than a second polymorphic query,
+    the author is joined on and the search vector, which no payload uses, is
+    left behind.
+    """
+    if queryset is None:
+        queryset = PostContent.objects.all()
+    return queryset.fast_path(RePostContent).select_related("user").defer("search_vector")
+
+
+def attach_original_posts(posts, max_depth=REPOST_MAX_DEPTH):
+    """
+    Loads the original post of every repost in ``posts`` and caches it on the
+    repost, one query per level of repost chain rather than one per repost,
+    for at most ``max_depth`` levels. Posts already loaded are never fetched
+    again, which also stops at cycles.
+
+    Returns every post that was touched, originals included, so callers can
+    prefetch relations for all of them at once.
+    """
+    loaded = {post.pk: post for post in posts}
+    pending = [post for post in posts if isinstance(post, RePostContent)]
+
+    for _ in range(max_depth):
+        if not pending:
+            break
+        missing = {
+            repost.original_post_id for repost in pending
+            if repost.original_post_id and repost.original_post_id not in loaded
+        }
+        fetched = list(feed_queryset().filter(pk__in=missing)) if missing else []
+        loaded.update((original.pk, original) for original in fetched)
+
+        for repost in pending:
+            original = loaded.get(repost.original_post_id)
+            if original is not None:
+                repost._state.fields_cache["original_post"] = original
+
+        pending = [original for original in fetched if isinstance(original, RePostContent)]
+
+    return list(loaded.values())
+
+
+def mark_liked(payload, liked_ids):
+    """
+    Sets ``liked_by_me`` on a post payload and on every level of the repost
+    chain it embeds, since a repost can be liked apart from its original.
+    """
+    while payload is not None:
+        payload["liked_by_me"] = payload["id"] in liked_ids
+        payload = payload.get("original_post")
+
+
+def render_posts(posts):
+    """
+    Returns ``{post_id: payload}`` for the plain (non-repost) posts in
+    ``posts``. Cached fragments are fetched in one multi-get; only the misses
+    are prefetched, rendered and written back to the cache.
+    """
+    plain = [post for post in posts if not isinstance(post, RePostContent)]
+    payloads = get_fragments(plain)
+    misses = [post for post in plain if post.pk not in payloads]
+    if misses:
+        prefetch_related_objects(misses, *FEED_PREFETCH)
+        previews = PostLikes.liker_previews(post.pk for post in misses)
+        rendered = {}
+        for post in misses:
+            post.liker_preview = previews.get(post.pk, [])
+            rendered[post.pk] = post.post_profile()
+        store_fragments(misses, rendered)
+        payloads.update(rendered)
+    return payloads
+
+
+def _attached_original(repost):
+    # Only what attach_original_posts() loaded, never a lazy query
+    return repost._state.fields_cache.get("original_post")
+
+
+def compose_profile(post, payloads, max_depth=REPOST_MAX_DEPTH):
+    """
+    Builds the payload of ``post`` from ``payloads``, which maps post ids to
+    rendered plain posts and receives every repost payload composed here, so
+    a post shared by several reposts on a page is built once.
+
+    The chain is walked iteratively and cut at ``max_depth`` reposts or at
+    the first post seen twice; the original at the cut is rendered as null.
+    """
+    chain = []
+    seen = set()
+    current = post
+    while isinstance(current, RePostContent) and current.pk not in payloads:
+        if current.pk in seen or len(chain) >= max_depth:
+            current = None
+            break
+        seen.add(current.pk)
+        chain.append(current)
+        current = _attached_original(current)
+
+    profile = payloads.get(current.pk) if current is not None else None
+    for repost in reversed(chain):
+        profile = payloads[repost.pk] = repost.repost_profile(profile)
+    return profile
+
+
+def render_feed(posts, user=None):
+    """
+    Returns the ``post_profile()`` payload of each post in ``posts``, with all
+    the data the payloads need fetched in bulk beforehand. Passing ``user``
+    adds a ``liked_by_me`` flag to every post, looked up for the page in one
+    query.
+    """
+    posts = list(posts)
+    loaded = attach_original_posts(posts)
+    payloads = render_posts(loaded)
+    profiles = [compose_profile(post, payloads) for post in posts]
+
+    if user is not None:
+        liked_ids = PostLikes.liked_post_ids(user, (post.pk for post in loaded))
+        for profile in profiles:
+            mark_liked(profile, liked_ids)
+    return profiles
@@ -0,0 +1,64 @@
+"""
+Cache of rendered post payloads.
+
+Most posts never change after they are created, so the ``post_profile()`` of
+a plain post is kept in the ``post_fragments`` cache under its id, together
+with the version of the post it was rendered from: its ``updated`` timestamp
+and its counters. A fragment only counts as a hit when that version still
+matches the post. Counter updates do not touch ``updated``, so without the
+counters a worker whose cache missed an invalidation would keep serving old
+like and comment counts.
+
+Writes to the post or to its likes, comments and media also delete the
+fragment outright (see the signal receivers in talkcontent.models and
+PostContent.adjust_counters). That only reaches other workers when the
+cache is shared, so point POST_FRAGMENT_CACHE_URL at e.g. Redis when
+running several of them.
+
+Reposts are not cached themselves, they are cheap to wrap around the cached
+fragment of their original.
+"""
+from django.core.cache import caches
+
+FRAGMENT_CACHE_ALIAS = "post_fragments"
+
+
+def fragment_cache():
+    return caches[FRAGMENT_CACHE_ALIAS]
+
+
+def fragment_key(post_id):
+    return f"post-fragment:{post_id}"
+
+
+def fragment_version(post):
+    return (post.updated, post.like_count, post.comment_count, post.repost_count, post.share_count)
+
+
+def get_fragments(posts):
+    """
+    Multi-gets the cached payloads of ``posts`` and returns ``{post_id:
+    payload}`` for the ones still rendered from the current version.
+    """
+    posts = list(posts)
+    if not posts:
+        return {}
+    cached = fragment_cache().get_many([fragment_key(post.pk) for post in posts])
+    fragments = {}
+    for post in posts:
+        entry = cached.get(fragment_key(post.pk))
+        if entry is not None and entry["version"] == fragment_version(post):
+            fragments[post.pk] = entry["payload"]
+    return fragments
+
+
+def store_fragments(posts, payloads):
+    """Caches ``payloads`` (``{post_id: payload}``) rendered from ``posts``."""
+    fragment_cache().set_many({
+        fragment_key(post.pk): {"version": fragment_version(post), "payload": payloads[post.pk]}
+        for post in posts
+    })
+
+
+def invalidate_fragments(*post_ids):
+    fragment_cache().delete_many([fragment_key(post_id) for post_id in post_ids if post_id])
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from talkcontent.models import PostComments
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the materialized path, depth and thread of every comment, "
+        "one level of nesting at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of comments updated per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fields = ["path", "depth", "thread"]
+        level = PostComments.objects.filter(parent_comment__isnull=True)
+        parents = {}
+        total = depth = 0
+
+        while True:
+            placed = {}
+            for comment in level.only("id", "created", "parent_comment").order_by("pk").iterator(chunk_size=batch_size):
+                comment.place_under(parents.get(comment.parent_comment_id))
+                placed[comment.pk] = comment
+            if not placed:
+                break
+
+            batch = list(placed.values())
+            for start in range(0, len(batch), batch_size):
+                with transaction.atomic():
+                    PostComments.objects.bulk_update(batch[start:start + batch_size], fields)
+
+            total += len(placed)
+            self.stdout.write(f"Depth {depth}: {len(placed)} comments")
+            # Only the level just written is needed to place the next one
+            parents = placed
+            level = PostComments.objects.filter(parent_comment_id__in=list(placed))
+            depth += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled paths for {total} comments"))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from talkcontent.timelines import backfill_timelines
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy recent posts onto their audience's home timelines, recovering "
+        "fan-outs lost when a worker restarted or crashed. Safe to repeat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes", type=int, default=60,
+            help="Fan out the posts created in this many past minutes (default: 60).",
+        )
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Fan out every post, e.g. to fill timelines from scratch.",
+        )
+
+    def handle(self, *args, **options):
+        since = None if options["all"] else timezone.now() - timedelta(minutes=options["minutes"])
+        fanned = backfill_timelines(since)
+        self.stdout.write(self.style.SUCCESS(f"Fanned out {fanned} posts"))
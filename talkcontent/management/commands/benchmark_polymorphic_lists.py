@@ -0,0 +1,119 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from talkcontent.models import PostContent, RePostContent
+from talkmarketplace.models import MarketPlaceProduct, Product, TakaProduct
+
+BENCH_SLUG_PREFIX = "bench-poly-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list queries through the PolymorphicManager with the "
+        "single-statement fast_path() on posts and products."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts", type=int, default=0,
+            help="Generate this many synthetic posts first, a quarter of them reposts (default: 0).",
+        )
+        parser.add_argument(
+            "--page-size", type=int, default=50,
+            help="Rows fetched per list query (default: 50).",
+        )
+        parser.add_argument(
+            "--runs", type=int, default=20,
+            help="Timed runs per query, the median is reported (default: 20).",
+        )
+        parser.add_argument(
+            "--cleanup", action="store_true",
+            help="Delete the generated posts and exit.",
+        )
+
+    def handle(self, *args, **options):
+        bench_posts = PostContent.objects.non_polymorphic().filter(slug__startswith=BENCH_SLUG_PREFIX)
+        if options["cleanup"]:
+            deleted, _ = bench_posts.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} benchmark rows"))
+            return
+        if options["posts"]:
+            self.generate(options["posts"])
+
+        size = options["page_size"]
+        cases = [
+            (
+                "posts",
+                PostContent.objects.select_related("user")[:size],
+                PostContent.objects.fast_path(RePostContent).select_related("user").defer("search_vector")[:size],
+            ),
+            (
+                "products",
+                Product.objects.all()[:size],
+                Product.objects.fast_path(MarketPlaceProduct, TakaProduct)[:size],
+            ),
+            (
+                "marketplace",
+                MarketPlaceProduct.objects.all()[:size],
+                MarketPlaceProduct.objects.fast_path()[:size],
+            ),
+        ]
+        for label, polymorphic, fast in cases:
+            self.stdout.write(f"\n{label}")
+            for mode, queryset in (("polymorphic", polymorphic), ("fast_path", fast)):
+                timings, queries, rows = self.time_query(queryset, options["runs"])
+                self.stdout.write(
+                    f"  {mode:<12} median {statistics.median(timings):7.2f} ms"
+                    f"  min {min(timings):7.2f} ms  {queries} queries  ({rows} rows)"
+                )
+
+    def generate(self, total):
+        post_type = ContentType.objects.get_for_model(PostContent, for_concrete_model=False)
+        repost_type = ContentType.objects.get_for_model(RePostContent, for_concrete_model=False)
+        rng = random.Random(0)
+        posts = []
+        original_ids = []
+        reposts = []
+        for index in range(total):
+            pk = uuid.uuid4()
+            is_repost = bool(original_ids) and index % 4 == 3
+            posts.append(PostContent(
+                id=pk,
+                polymorphic_ctype=repost_type if is_repost else post_type,
+                title=f"Benchmark post {index}",
+                slug=f"{BENCH_SLUG_PREFIX}{pk}",
+                content="Lorem ipsum dolor sit amet",
+            ))
+            if is_repost:
+                reposts.append((pk, rng.choice(original_ids), "Worth a read"))
+            else:
+                original_ids.append(pk)
+
+        with transaction.atomic():
+            PostContent.objects.bulk_create(posts, batch_size=5000)
+            # bulk_create() does not support multi-table inheritance, the
+            # child rows of the reposts go in separately
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {RePostContent._meta.db_table} "
+                    "(postcontent_ptr_id, original_post_id, additional_content) VALUES (%s, %s, %s)",
+                    reposts,
+                )
+        self.stdout.write(f"Generated {total} posts ({len(reposts)} reposts)")
+
+    def time_query(self, queryset, runs):
+        timings = []
+        rows = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                rows = list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings, len(queries), len(rows)
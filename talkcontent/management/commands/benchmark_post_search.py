@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from talkcontent.models import PostContent
+
+BENCH_SLUG_PREFIX = "bench-"
+
+VOCABULARY = (
+    "campus lecture exam library hostel semester faculty department project "
+    "internship scholarship football match concert party election union "
+    "course assignment deadline result convocation seminar workshop startup "
+    "market price textbook laptop roommate apartment transport shuttle cafeteria "
+    "research thesis lab science engineering medicine law business design art "
+    "music drama sports fitness volunteer charity club society debate chess"
+).split()
+TAGS = ("general", "job", "event", "announcement", "discussion", "promotion")
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic post corpus and compare full-text search on the "
+        "GIN-indexed search_vector against a plain icontains scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts", type=int, default=1_000_000,
+            help="Size of the corpus to benchmark against (default: 1000000).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Number of posts inserted per statement while generating (default: 5000).",
+        )
+        parser.add_argument(
+            "--runs", type=int, default=5,
+            help="Timed runs per query, the median is reported (default: 5).",
+        )
+        parser.add_argument(
+            "--terms", nargs="+", default=["exam", "internship", "football concert"],
+            help="Search terms to time.",
+        )
+        parser.add_argument(
+            "--explain", action="store_true",
+            help="Print the query plan of each query.",
+        )
+        parser.add_argument(
+            "--cleanup", action="store_true",
+            help="Delete the generated posts and exit.",
+        )
+
+    def handle(self, *args, **options):
+        bench_posts = PostContent.objects.non_polymorphic().filter(slug__startswith=BENCH_SLUG_PREFIX)
+        if options["cleanup"]:
+            deleted, _ = bench_posts.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} benchmark rows"))
+            return
+
+        missing = options["posts"] - bench_posts.count()
+        if missing > 0:
+            self.generate(missing, options["batch_size"])
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {PostContent._meta.db_table}")
+
+        for terms in options["terms"]:
+            query = SearchQuery(terms, search_type="websearch", config="english")
+            full_text = PostContent.objects.non_polymorphic().filter(search_vector=query)
+
+            scan = Q()
+            for word in terms.split():
+                scan &= Q(title__icontains=word) | Q(summary__icontains=word) | Q(content__icontains=word)
+            icontains = PostContent.objects.non_polymorphic().filter(scan)
+
+            self.stdout.write(f"\n{terms!r}")
+            for label, queryset in (("full-text", full_text), ("icontains", icontains)):
+                # Same shape as a search page: ids of the first 50 matches
+                page = queryset.order_by("-created", "id").values_list("id", flat=True)[:50]
+                timings, count = self.time_query(page, options["runs"])
+                self.stdout.write(
+                    f"  {label:<10} median {statistics.median(timings):8.1f} ms"
+                    f"  min {min(timings):8.1f} ms  ({count} rows)"
+                )
+                if options["explain"]:
+                    self.stdout.write(page.explain(analyze=True))
+
+    def generate(self, total, batch_size):
+        rng = random.Random(0)
+        ctype = ContentType.objects.get_for_model(PostContent, for_concrete_model=False)
+        created = 0
+        while created < total:
+            size = min(batch_size, total - created)
+            posts = []
+            for _ in range(size):
+                pk = uuid.uuid4()
+                posts.append(PostContent(
+                    id=pk,
+                    polymorphic_ctype=ctype,
+                    title=_sentence(rng, rng.randint(3, 8)),
+                    slug=f"{BENCH_SLUG_PREFIX}{pk}",
+                    summary=_sentence(rng, rng.randint(10, 25)),
+                    content=_sentence(rng, rng.randint(40, 120)),
+                    tags=rng.sample(TAGS, rng.randint(1, 2)),
+                ))
+            with transaction.atomic():
+                PostContent.objects.bulk_create(posts)
+            created += size
+            self.stdout.write(f"Generated {created}/{total} posts", ending="\r")
+        self.stdout.write("")
+
+    def time_query(self, queryset, runs):
+        timings = []
+        rows = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            rows = list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, len(rows)
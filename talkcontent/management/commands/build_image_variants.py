@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from utils.images import _run_process_image, needs_variants, registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized WebP variants of every stored image that does not "
+        "have them yet, e.g. images uploaded before the pipeline existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Number of images processed in parallel (default: 4).",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for model, field_name, variants_field, on_ready in registry:
+                rows = (
+                    model._default_manager
+                    .exclude(**{field_name: ""})
+                    .exclude(**{f"{field_name}__isnull": True})
+                    .only("pk", field_name, variants_field)
+                )
+                queued = 0
+                for instance in rows.iterator():
+                    if needs_variants(instance, field_name, variants_field):
+                        pool.submit(
+                            _run_process_image, model, instance.pk, field_name, variants_field,
+                            getattr(instance, field_name).name, on_ready,
+                        )
+                        queued += 1
+                self.stdout.write(f"{model._meta.label}.{field_name}: {queued} images queued")
+                total += queued
+
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {total} images"))
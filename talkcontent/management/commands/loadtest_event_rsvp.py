@@ -0,0 +1,128 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from talkcontent.models import Event, EventRSVP
+
+LOADTEST_EMAIL_DOMAIN = "rsvp-loadtest.invalid"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent RSVPs, duplicate retries included, at a single event "
+        "and check it never hands out more seats than its capacity."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=500,
+            help="Number of users competing for seats (default: 500).",
+        )
+        parser.add_argument(
+            "--capacity", type=int, default=100,
+            help="Seats available at the event (default: 100).",
+        )
+        parser.add_argument(
+            "--threads", type=int, default=32,
+            help="Requests in flight at once, each on its own connection (default: 32).",
+        )
+        parser.add_argument(
+            "--retries", type=int, default=1,
+            help="Extra times each user repeats their RSVP, as a flaky client would (default: 1).",
+        )
+        parser.add_argument(
+            "--cancel-every", type=int, default=0,
+            help="Every Nth user cancels straight after reserving, freeing the seat again (default: never).",
+        )
+        parser.add_argument(
+            "--keep", action="store_true",
+            help="Leave the generated users and event in place.",
+        )
+
+    def handle(self, *args, **options):
+        users, event = self.setup(options["users"], options["capacity"])
+        start_line = threading.Barrier(min(options["threads"], len(users)))
+        outcomes = {EventRSVP.RESERVED: 0, EventRSVP.ALREADY_RESERVED: 0, EventRSVP.FULL: 0}
+        lock = threading.Lock()
+        timings = []
+
+        def attend(index_user):
+            index, user_obj = index_user
+            try:
+                if index < start_line.parties:
+                    # Release the first wave together so the opening requests collide
+                    start_line.wait()
+                for _ in range(1 + options["retries"]):
+                    started = time.perf_counter()
+                    outcome = EventRSVP.reserve(event.pk, user_obj)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        outcomes[outcome] += 1
+                        timings.append(elapsed)
+                if options["cancel_every"] and index % options["cancel_every"] == 0:
+                    EventRSVP.cancel(event.pk, user_obj)
+            finally:
+                close_old_connections()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                # list() re-raises anything a worker hit
+                list(pool.map(attend, enumerate(users)))
+            wall = time.perf_counter() - started
+
+            event.refresh_from_db()
+            rsvps = EventRSVP.objects.filter(event=event).count()
+            self.stdout.write(
+                f"{len(timings)} requests in {wall:.2f}s: "
+                f"{outcomes[EventRSVP.RESERVED]} reserved, "
+                f"{outcomes[EventRSVP.ALREADY_RESERVED]} repeats, "
+                f"{outcomes[EventRSVP.FULL]} turned away"
+            )
+            if timings:
+                timings.sort()
+                self.stdout.write(
+                    f"latency median {statistics.median(timings) * 1000:.1f}ms, "
+                    f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:.1f}ms"
+                )
+            self.stdout.write(f"capacity {event.capacity}, seats_taken {event.seats_taken}, rsvps {rsvps}")
+
+            if event.seats_taken != rsvps:
+                raise CommandError(f"Seat counter drifted: {event.seats_taken} taken but {rsvps} RSVPs")
+            if event.seats_taken > event.capacity:
+                raise CommandError(f"Oversold: {event.seats_taken} seats taken of {event.capacity}")
+            if not options["cancel_every"] and event.seats_taken != min(event.capacity, len(users)):
+                raise CommandError(f"Only {event.seats_taken} seats were handed out")
+            self.stdout.write(self.style.SUCCESS("No overselling"))
+        finally:
+            if not options["keep"]:
+                event.delete()
+                get_user_model().objects.filter(email__endswith=f"@{LOADTEST_EMAIL_DOMAIN}").delete()
+
+    def setup(self, count, capacity):
+        User = get_user_model()
+        run = uuid.uuid4().hex[:8]
+        users = [
+            User.objects.create(
+                email=f"{run}-{index}@{LOADTEST_EMAIL_DOMAIN}",
+                first_name="Load",
+                last_name=f"Test {index}",
+            )
+            for index in range(count)
+        ]
+        event = Event.objects.create(
+            user=users[0],
+            event_name=f"RSVP load test {run}",
+            event_description="Generated by loadtest_event_rsvp",
+            event_date=timezone.now() + timedelta(days=1),
+            capacity=capacity,
+        )
+        return users, event
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from talkcontent.models import PostComments, PostContent, PostLikes, RePostContent, SharePost
+
+
+def _count_of(queryset, post_field):
+    """Correlated COUNT(*) of ``queryset`` rows pointing at the outer post."""
+    counts = (
+        queryset.filter(**{post_field: OuterRef("pk")})
+        .order_by()
+        .values(post_field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like/comment/repost/share counters on posts to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of posts updated per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        counters = {
+            "like_count": _count_of(PostLikes.likes.through.objects.all(), "postlikes__post"),
+            "comment_count": _count_of(PostComments.objects.all(), "post"),
+            "repost_count": _count_of(RePostContent.objects.non_polymorphic(), "original_post"),
+            "share_count": _count_of(SharePost.objects.all(), "post"),
+        }
+
+        post_ids = list(PostContent.objects.non_polymorphic().order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(post_ids), batch_size):
+            # Short transactions keep row locks brief on a live table
+            with transaction.atomic():
+                PostContent.objects.filter(pk__in=post_ids[start:start + batch_size]).update(**counters)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {len(post_ids)} posts"))
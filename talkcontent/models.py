@@ -1,15 +1,31 @@
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import Greatest, RowNumber
 from utils.models import ModelUtilsMixin
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.utils import timezone
 from django.utils.text import slugify
 from polymorphic.models import PolymorphicModel
-from polymorphic.managers import PolymorphicManager
+from utils.polymorphic import FastPathManager
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from utils.images import register_image_variants, variant_url
+from utils.uploads import register_upload_target
+from .fragments import invalidate_fragments
 
 user = settings.AUTH_USER_MODEL
 
+# Number of likers embedded in a post payload, the rest are paged through
+# the likers endpoint
+LIKER_PREVIEW_SIZE = 3
+# Replies embedded under each top-level comment in threaded mode, the rest are
+# paged through the thread
+REPLY_PREVIEW_SIZE = 3
+
 def post_image_upload_path(instance, filename):
     return f"post/imgs/{instance.post.user.talk_id}/{slugify(instance.post.title)}-{filename}"
 
@@ -37,22 +53,48 @@ class CommonFields(models.Model):
         abstract = True
 
 class PostContent(PolymorphicModel, ModelUtilsMixin, CommonFields):
-    objects = PolymorphicManager()
+    objects = FastPathManager()
     title = models.CharField(max_length=500)
     slug = models.SlugField(unique=True, null=False, blank=True)
     summary = models.TextField(null=True, blank=True)
     content = models.TextField(null=True, blank=True)
     tags = models.JSONField(null=True, blank=True)
     is_sponsored = models.BooleanField(default=False)
+    # Denormalized counters, kept current by the interaction views through
+    # adjust_counters() and rebuilt by `manage.py rebuild_post_counters`
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    repost_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
+    # Kept current by Postgres on every write, weighted title > summary > content
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config="english")
+            + SearchVector("summary", weight="B", config="english")
+            + SearchVector("content", weight="C", config="english")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    POPULAR_ORDERING = ["-like_count", "-created", "-updated", "id"]
 
     class Meta:
-        ordering = ["-created", "-updated"]
+        ordering = ["-created", "-updated", "id"]
+        indexes = [
+            # Serves the keyset-paginated feed, keep in step with ordering
+            models.Index(fields=["-created", "-updated", "id"], name="post_feed_order_idx"),
+            # Serves the feed sorted by popularity, see POPULAR_ORDERING
+            models.Index(fields=["-like_count", "-created", "-updated", "id"], name="post_popular_order_idx"),
+            GinIndex(fields=["search_vector"], name="post_search_idx"),
+            # Answers `tags @> '["job"]'` lookups from the search filters
+            GinIndex(fields=["tags"], name="post_tags_idx", opclasses=["jsonb_path_ops"]),
+        ]
 
     def __str__(self):
         return str(self.title)
     
     def post_profile(self):
-        likes = self.get_likes() if hasattr(self, 'post_likes') else []
         return {
             "id": self.id,
             "title": self.title,
@@ -60,9 +102,9 @@ class PostContent(PolymorphicModel, ModelUtilsMixin, CommonFields):
             "summary": self.summary,
             "content": self.content,
             "tags": self.tags,
-            "liked_by": likes,
-            "comment_count": self.comments_count(),
-            "like_count": len(likes),
+            "liked_by": self.get_likes(),
+            "comment_count": self.comment_count,
+            "like_count": self.like_count,
             "images": self.get_images() if self.post_images.exists() else None,
             "videos": self.get_videos() if hasattr(self, 'post_videos') and self.post_videos.exists() else None,
             "created_by": f"{self.user.first_name} {self.user.last_name}",
@@ -79,15 +121,35 @@ class PostContent(PolymorphicModel, ModelUtilsMixin, CommonFields):
             self.slug = f"{slugify(self.title)}-{self.id}"
         super().save(*args, **kwargs)
 
+    @classmethod
+    def adjust_counters(cls, post_id, **deltas):
+        """
+        Shifts the denormalized counters of a post in a single UPDATE, e.g.
+        ``PostContent.adjust_counters(post.id, like_count=1)``. The arithmetic
+        runs in the database so concurrent requests never lose an increment.
+        """
+        updates = {
+            field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items() if delta
+        }
+        if updates:
+            PostContent.objects.filter(pk=post_id).update(**updates)
+            # Queryset updates skip signals, so drop the cached payload here
+            invalidate_fragments(post_id)
+
     def comments_count(self):
-        return self.post_comments.count()
+        return self.comment_count
 
     def get_likes(self):
-        likes = self.post_likes.get_likes()
-        return likes if likes else []
-
-    def get_images(self):
-        return [image.image.url for image in self.post_images.all() if image.image]
+        # Batched renderers attach the preview up front, see talkcontent.feed
+        if hasattr(self, "liker_preview"):
+            return self.liker_preview
+        if not hasattr(self, "post_likes"):
+            return []
+        return self.post_likes.get_likes(limit=LIKER_PREVIEW_SIZE)
+
+    def get_images(self, size="medium"):
+        return [variant_url(image.image, image.image_variants, size) for image in self.post_images.all() if image.image]
     
     def get_videos(self):
         return [video.video.url for video in self.post_videos.all() if video.video]
@@ -114,27 +176,26 @@ class RePostContent(PostContent):
         super().save(*args, **kwargs)
 
     def post_profile(self):
-            """
-            Returns the feed-friendly representation of the repost.
-            """
-            if not self.original_post:
-                return {
-                    "id": self.id,
-                    "is_repost": True,
-                    "reposted_by": f"{self.user.first_name} {self.user.last_name}",
-                    "repost_note": self.additional_content,
-                    "repost_date": self.created.strftime("%Y-%m-%d %H:%M:%S"),
-                    "original_post": None,
-                }
-
-            return {
-                "id": self.id,
-                "is_repost": True,
-                "reposted_by": f"{self.user.first_name} {self.user.last_name}",
-                "repost_note": self.additional_content,
-                "repost_date": self.created.strftime("%Y-%m-%d %H:%M:%S"),
-                "original_post": self.original_post.post_profile(),
-            }
+        """
+        Returns the feed-friendly representation of the repost. The chain of
+        originals is loaded and rendered in bulk, see talkcontent.feed.
+        """
+        from .feed import render_feed
+        return render_feed([self])[0]
+
+    def repost_profile(self, original_profile):
+        """
+        Builds the repost payload around an already rendered original post,
+        so batched renderers can reuse one original for many reposts.
+        """
+        return {
+            "id": self.id,
+            "is_repost": True,
+            "reposted_by": f"{self.user.first_name} {self.user.last_name}",
+            "repost_note": self.additional_content,
+            "repost_date": self.created.strftime("%Y-%m-%d %H:%M:%S"),
+            "original_post": original_profile,
+        }
 
 
 class PostLikes(ModelUtilsMixin):
@@ -150,28 +211,263 @@ class PostLikes(ModelUtilsMixin):
     def remove_like(self, user_obj):
         self.likes.remove(user_obj)
 
-    def get_likes(self):
-        return [
-            {
-                "id": u.id,
-                "full_name": f"{u.first_name} {u.last_name}".strip()
-            }
-            for u in self.likes.all()
+    def _like_rows(self, user_obj):
+        field = PostLikes.likes.field
+        return self.likes.through.objects.filter(**{
+            field.m2m_field_name(): self,
+            field.m2m_reverse_field_name(): user_obj,
+        })
+
+    def has_liked(self, user_obj):
+        # Probes the unique (post likes, user) index instead of loading likers
+        return self._like_rows(user_obj).exists()
+
+    def toggle_like(self, user_obj):
+        """
+        Flips ``user_obj``'s like on the post with a single DELETE, or an
+        INSERT when there was nothing to delete.
+
+        Returns ``(liked, changed)``: whether the post ends up liked, and
+        whether this call actually changed a row. Concurrent double-taps stay
+        consistent because only the request whose INSERT or DELETE hit a row
+        reports a change, so counters move once per real like.
+        """
+        deleted, _ = self._like_rows(user_obj).delete()
+        if deleted:
+            return False, True
+        field = PostLikes.likes.field
+        try:
+            with transaction.atomic():
+                self.likes.through.objects.create(**{
+                    field.m2m_field_name(): self,
+                    field.m2m_reverse_field_name(): user_obj,
+                })
+        except IntegrityError:
+            # Another request inserted the same like first and counted it
+            return True, False
+        return True, True
+
+    @classmethod
+    def liked_post_ids(cls, user_obj, post_ids):
+        """Returns which of ``post_ids`` ``user_obj`` has liked, in one query."""
+        field = cls.likes.field
+        return set(
+            cls.likes.through.objects.filter(**{
+                field.m2m_reverse_field_name(): user_obj,
+                f"{field.m2m_field_name()}__post_id__in": list(post_ids),
+            }).values_list(f"{field.m2m_field_name()}__post_id", flat=True)
+        )
+
+    @staticmethod
+    def liker_profile(user_obj):
+        return {
+            "id": user_obj.id,
+            "full_name": f"{user_obj.first_name} {user_obj.last_name}".strip()
+        }
+
+    @classmethod
+    def likers_of(cls, post_id):
+        """
+        The like rows of a post joined to their users, ordered by user id so
+        the unique (post likes, user) index serves both the filter and the
+        order.
+        """
+        field = cls.likes.field
+        user_field = field.m2m_reverse_field_name()
+        return (
+            cls.likes.through.objects
+            .filter(**{f"{field.m2m_field_name()}__post_id": post_id})
+            .select_related(user_field)
+            .order_by(f"{user_field}_id")
+        )
+
+    def get_likes(self, limit=None):
+        user_field = PostLikes.likes.field.m2m_reverse_field_name()
+        rows = PostLikes.likers_of(self.post_id)
+        if limit is not None:
+            rows = rows[:limit]
+        return [self.liker_profile(getattr(row, user_field)) for row in rows]
+
+    @classmethod
+    def liker_previews(cls, post_ids, limit=LIKER_PREVIEW_SIZE):
+        """
+        Returns ``{post_id: [liker, ...]}`` holding at most ``limit`` likers
+        per post, for a whole page of posts in one windowed query.
+        """
+        field = cls.likes.field
+        post_lookup = f"{field.m2m_field_name()}__post_id"
+        user_field = field.m2m_reverse_field_name()
+        rows = (
+            cls.likes.through.objects
+            .filter(**{f"{post_lookup}__in": list(post_ids)})
+            .annotate(position=Window(
+                RowNumber(),
+                partition_by=F(field.m2m_field_name()),
+                order_by=F(f"{user_field}_id").asc(),
+            ))
+            .filter(position__lte=limit)
+            .order_by(post_lookup, "position")
+            .values_list(post_lookup, f"{user_field}__id", f"{user_field}__first_name", f"{user_field}__last_name")
+        )
+        previews = {}
+        for post_id, user_id, first_name, last_name in rows:
+            previews.setdefault(post_id, []).append({
+                "id": user_id,
+                "full_name": f"{first_name} {last_name}".strip()
+            })
+        return previews
+
+class TimelineEntry(ModelUtilsMixin):
+    """
+    One post on a user's materialized home timeline, written by the fan-out in
+    talkcontent.timelines. Entries go away with their post through the
+    cascade, so deleting a post trims every timeline holding it.
+    """
+    owner = models.ForeignKey(user, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(PostContent, on_delete=models.CASCADE, related_name="timeline_entries")
+    # Copy of post.created so a timeline page is a range read on one index
+    posted = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-posted", "post"]
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "post"], name="unique_timeline_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "-posted", "post"], name="timeline_read_idx"),
         ]
 
+    def __str__(self):
+        return f"{self.post_id} on {self.owner_id}'s timeline"
+
 class PostComments(ModelUtilsMixin):
     post = models.ForeignKey(PostContent, on_delete=models.CASCADE, related_name="post_comments")
     commented_by = models.ForeignKey(user, on_delete=models.CASCADE, related_name="comments_made")
     comment = models.TextField()
     parent_comment = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name="replies")
+    # Materialized path, set once in save() and repaired by
+    # `manage.py backfill_comment_paths`. ``thread`` is the top-level comment
+    # a reply hangs under (null on top-level comments) and ``path`` is the
+    # concatenated fixed-width segments of every ancestor and the comment
+    # itself, so sorting a thread by path lists it depth-first, oldest first.
+    thread = models.ForeignKey('self', null=True, blank=True, editable=False, on_delete=models.CASCADE, related_name="thread_replies")
+    path = models.TextField(default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    TOP_LEVEL_ORDERING = ("created", "id")
+    THREAD_ORDERING = ("path", "id")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "created", "id"],
+                condition=Q(parent_comment__isnull=True),
+                name="comment_top_level_idx",
+            ),
+            models.Index(fields=["thread", "path"], name="comment_thread_path_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.commented_by.talk_id} on {self.post.title}"
-    
+
+    @staticmethod
+    def path_segment(created, comment_id):
+        """Creation time in microseconds then the id, both fixed-width hex."""
+        return f"{int(created.timestamp() * 1_000_000):014x}{comment_id.hex}"
+
+    def place_under(self, parent):
+        self.path = (parent.path if parent else "") + self.path_segment(self.created or timezone.now(), self.id)
+        self.depth = parent.depth + 1 if parent else 0
+        self.thread_id = (parent.thread_id or parent.id) if parent else None
+
+    def save(self, *args, **kwargs):
+        if not self.path:
+            self.place_under(self.parent_comment)
+        super().save(*args, **kwargs)
+
+    def comment_profile(self):
+        return {
+            "id": self.id,
+            "post": self.post_id,
+            "parent_comment": self.parent_comment_id,
+            "depth": self.depth,
+            "comment": self.comment,
+            "commented_by": PostLikes.liker_profile(self.commented_by),
+            "created": self.created.strftime("%Y-%m-%d %H:%M:%S"),
+            "updated": self.updated.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    @classmethod
+    def reply_previews(cls, thread_ids, limit=REPLY_PREVIEW_SIZE):
+        """
+        Returns ``{thread_id: [reply, ...]}`` holding the first ``limit``
+        replies of each thread in path order, for a whole page of threads in
+        one windowed query.
+        """
+        replies = (
+            cls.objects
+            .filter(thread_id__in=list(thread_ids))
+            .select_related("commented_by")
+            .annotate(position=Window(
+                RowNumber(),
+                partition_by=F("thread"),
+                order_by=[F("path").asc(), F("id").asc()],
+            ))
+            .filter(position__lte=limit)
+            .order_by("thread", "position")
+        )
+        previews = {}
+        for reply in replies:
+            previews.setdefault(reply.thread_id, []).append(reply)
+        return previews
+
+    @classmethod
+    def reply_counts(cls, thread_ids):
+        rows = (
+            cls.objects
+            .filter(thread_id__in=list(thread_ids))
+            .order_by()
+            .values_list("thread")
+            .annotate(total=Count("pk"))
+        )
+        return dict(rows)
+
+    @classmethod
+    def thread_profiles(cls, comments, reply_limit=REPLY_PREVIEW_SIZE):
+        """
+        Renders top-level ``comments`` with their first ``reply_limit``
+        replies nested under their parents and the total reply count of each
+        thread, in two queries whatever the depth of the threads.
+
+        The preview is a prefix of the depth-first order, so the parent of
+        every reply in it is in it too.
+        """
+        comments = list(comments)
+        thread_ids = [comment.pk for comment in comments]
+        previews = cls.reply_previews(thread_ids, reply_limit) if reply_limit > 0 else {}
+        counts = cls.reply_counts(thread_ids)
+
+        profiles = []
+        for comment in comments:
+            profile = comment.comment_profile()
+            profile["reply_count"] = counts.get(comment.pk, 0)
+            profile["replies"] = []
+            nodes = {comment.pk: profile}
+            for reply in previews.get(comment.pk, []):
+                node = reply.comment_profile()
+                node["replies"] = []
+                nodes[reply.pk] = node
+                # Falls back to the thread root for paths not yet backfilled
+                nodes.get(reply.parent_comment_id, profile)["replies"].append(node)
+            profiles.append(profile)
+        return profiles
+
 
 class PostImages(ModelUtilsMixin):
     post = models.ForeignKey(PostContent, on_delete=models.CASCADE, related_name="post_images")
     image = models.ImageField(upload_to=post_image_upload_path, null=True, blank=True)
+    # Resized WebP copies written in the background, see utils.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return str(self.image)
@@ -195,11 +491,104 @@ class Event(ModelUtilsMixin, CommonFields):
     event_name = models.CharField(max_length=255)
     event_description = models.TextField(default="", blank=True, max_length=350)
     event_image = models.ImageField(upload_to=event_image_upload_path, null=True, blank=True)
+    event_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     event_date = models.DateTimeField(default=timezone.now)
     event_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    
+    # Null means unlimited. seats_taken is only ever changed by EventRSVP in
+    # single conditional UPDATEs
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
+
+    UPCOMING_ORDERING = ("event_date", "id")
+    PAST_ORDERING = ("-event_date", "-id")
+
+    class Meta:
+        ordering = ["event_date", "id"]
+        indexes = [
+            # Serves the date filters and both list orders, read backwards
+            # for past events
+            models.Index(fields=["event_date", "id"], name="event_date_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=Q(capacity__isnull=True) | Q(seats_taken__lte=F("capacity")),
+                name="event_not_oversold",
+            ),
+        ]
+
     def __str__(self):
         return str(self.event_name)
+
+    @property
+    def seats_left(self):
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.seats_taken, 0)
+
+    def rsvp_profile(self, attending):
+        return {
+            "event_id": self.id,
+            "attending": attending,
+            "capacity": self.capacity,
+            "seats_taken": self.seats_taken,
+            "seats_left": self.seats_left,
+        }
+
+class EventRSVP(ModelUtilsMixin):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="rsvps")
+    user = models.ForeignKey(user, on_delete=models.CASCADE, related_name="event_rsvps")
+
+    RESERVED = "reserved"
+    ALREADY_RESERVED = "already_reserved"
+    FULL = "full"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["event", "user"], name="unique_event_rsvp"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} attending {self.event_id}"
+
+    @classmethod
+    def reserve(cls, event_id, user_obj):
+        """
+        Takes a seat at an event for ``user_obj`` and returns RESERVED,
+        ALREADY_RESERVED or FULL. Safe to retry: a user holds at most one
+        seat per event however many times this runs.
+
+        The RSVP row is inserted first, so the unique index turns a retry
+        into a no-op before any seat is touched. The seat is then taken by a
+        single UPDATE that only matches while seats are left; Postgres
+        re-checks that condition after waiting on the row lock, so
+        concurrent reservations can never push seats_taken past capacity.
+        """
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    cls.objects.create(event_id=event_id, user=user_obj)
+            except IntegrityError:
+                return cls.ALREADY_RESERVED
+
+            taken = (
+                Event.objects
+                .filter(Q(capacity__isnull=True) | Q(seats_taken__lt=F("capacity")), pk=event_id)
+                .update(seats_taken=F("seats_taken") + 1)
+            )
+            if not taken:
+                # Undo the RSVP row, the event is full
+                transaction.set_rollback(True)
+                return cls.FULL
+        return cls.RESERVED
+
+    @classmethod
+    def cancel(cls, event_id, user_obj):
+        """Gives up ``user_obj``'s seat. Returns False if there was none."""
+        with transaction.atomic():
+            deleted, _ = cls.objects.filter(event_id=event_id, user=user_obj).delete()
+            if deleted:
+                Event.objects.filter(pk=event_id).update(seats_taken=Greatest(F("seats_taken") - 1, 0))
+        return bool(deleted)
     
 class News(ModelUtilsMixin, CommonFields):
     title = models.CharField(max_length=255, default="", blank=False)
@@ -220,3 +609,30 @@ class NewsImage(ModelUtilsMixin):
 
     def __str__(self):
         return f"Image for {self.news.title}"
+
+
+@receiver([post_save, post_delete], sender=PostContent)
+@receiver([post_save, post_delete], sender=RePostContent)
+def invalidate_post_fragment(sender, instance, **kwargs):
+    invalidate_fragments(instance.pk)
+
+@receiver([post_save, post_delete], sender=PostLikes)
+@receiver([post_save, post_delete], sender=PostComments)
+@receiver([post_save, post_delete], sender=PostImages)
+@receiver([post_save, post_delete], sender=PostVideos)
+def invalidate_parent_post_fragment(sender, instance, **kwargs):
+    invalidate_fragments(instance.post_id)
+
+@receiver(m2m_changed, sender=PostLikes.likes.through)
+def invalidate_liked_post_fragment(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, PostLikes):
+        invalidate_fragments(instance.post_id)
+    else:
+        # Changed from the user side, pk_set holds PostLikes ids
+        invalidate_fragments(*PostLikes.objects.filter(pk__in=pk_set or []).values_list("post_id", flat=True))
+
+register_image_variants(PostImages, "image", on_ready=lambda image: invalidate_fragments(image.post_id))
+register_image_variants(Event, "event_image")
+register_upload_target("post_video", PostVideos, "post", "video")
@@ -1,13 +1,24 @@
 from .models import News, NewsImage, Event, PostContent, PostImages, PostVideos, PostLikes, PostComments, SharePost, RePostContent
 from rest_framework import serializers
 from utils.helpers import FormattedDateTimeField
+from utils.images import variant_urls
 
 
 class EventSerializer(serializers.ModelSerializer):
+    event_image_sizes = serializers.SerializerMethodField()
+
     class Meta:
         model = Event
-        fields = ['id', 'user', 'event_name', 'event_description', 'event_image', 'event_date', 'event_fees', 'created', 'updated']
-        read_only_fields = ['id', 'user', 'created', 'updated']
+        fields = ['id', 'user', 'event_name', 'event_description', 'event_image', 'event_image_sizes', 'event_date', 'event_fees', 'capacity', 'seats_taken', 'created', 'updated']
+        read_only_fields = ['id', 'user', 'seats_taken', 'created', 'updated']
+
+    def get_event_image_sizes(self, obj):
+        return variant_urls(obj.event_image, obj.event_image_variants)
+
+    def validate_capacity(self, value):
+        if value is not None and self.instance is not None and value < self.instance.seats_taken:
+            raise serializers.ValidationError(f"{self.instance.seats_taken} seats are already taken.")
+        return value
 
 
 class NewsImageSerializer(serializers.ModelSerializer):
@@ -126,6 +137,21 @@ class PostCommentsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "commented_by",]
 
+    def validate(self, attrs):
+        if self.instance is not None:
+            # The materialized path is fixed when the comment is created
+            if "parent_comment" in attrs and attrs["parent_comment"] != self.instance.parent_comment:
+                raise serializers.ValidationError({"parent_comment": "A comment cannot be moved."})
+            if "post" in attrs and attrs["post"] != self.instance.post:
+                raise serializers.ValidationError({"post": "A comment cannot be moved."})
+            return attrs
+
+        parent = attrs.get("parent_comment")
+        post = attrs.get("post")
+        if parent is not None and post is not None and parent.post_id != post.pk:
+            raise serializers.ValidationError({"parent_comment": "Replies must be on the same post as their parent."})
+        return attrs
+
 class RePostContentSerializer(serializers.ModelSerializer):
     class Meta:
         model=RePostContent
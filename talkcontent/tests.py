@@ -1,3 +1,397 @@
-from django.test import TestCase
+import datetime
+import threading
+from io import StringIO
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from utils.pagination import encode_cursor
+from utils.testing import APIViewTestCase, make_user
+from .feed import attach_original_posts, compose_profile, feed_queryset, render_feed, render_posts
+from .fragments import fragment_cache
+from .models import (
+    Event, EventRSVP, PostComments, PostContent, PostImages, PostLikes, PostVideos, RePostContent, TimelineEntry,
+)
+from .views import (
+    CommentPostContentView, DeleteCommentView, EventListAPIView, LikePostContentView, RepostContentView,
+    RetrievePostCommentsView, RetrievePostContentView, RetrievePostLikersView, RetrieveTimelineView,
+    SearchPostContentView,
+)
+
+# The page, then one query each for images, videos, liker previews and the
+# viewer's likes
+FEED_QUERY_BUDGET = 5
+# The post, the top-level page, the reply previews and the reply counts
+THREAD_QUERY_BUDGET = 4
+
+
+class FeedFixtures:
+    """Posts with media and likes, rendered cold."""
+
+    def setUp(self):
+        # Cached fragments would hide the queries of a cold render
+        fragment_cache().clear()
+
+    def add_posts(self, count):
+        posts = []
+        for index in range(count):
+            post = PostContent.objects.create(user=self.provider, title=f"Post {index}", content="Hello")
+            PostImages.objects.create(post=post, image=f"posts/post-{index}.jpg")
+            PostVideos.objects.create(post=post, video=f"posts/post-{index}.mp4")
+            PostLikes.objects.create(post=post).likes.add(self.buyer)
+            posts.append(post)
+        return posts
+
+    def add_chains(self, count, depth):
+        """Reposts ``depth`` levels above ``count`` new posts, returns the outermost ones."""
+        reposts = []
+        for post in self.add_posts(count):
+            for level in range(depth):
+                post = RePostContent.objects.create(user=self.buyer, title=f"Repost {level}", original_post=post)
+            reposts.append(post)
+        return reposts
+
+
+class FeedQueryBudgetTestCase(FeedFixtures, APIViewTestCase):
+    """Rendering a feed page costs the same number of queries however many posts it holds."""
+
+    def assert_feed_budget(self, posts):
+        fragment_cache().clear()
+        with self.assertNumQueries(FEED_QUERY_BUDGET):
+            response = self.call(RetrievePostContentView, data={"cursor": "", "page_size": 100}, user=self.buyer)
+        self.assertEqual(response.status_code, 200)
+        data = response.data["results"]["data"]
+        self.assertEqual(len(data), posts)
+        self.assertTrue(all(item["images"] and item["videos"] and item["liked_by"] for item in data))
+
+    def test_feed_queries_do_not_grow_with_the_page(self):
+        self.add_posts(2)
+        self.assert_feed_budget(2)
+        self.add_posts(10)
+        self.assert_feed_budget(12)
+
+
+class RepostChainTestCase(FeedFixtures, APIViewTestCase):
+
+    def assert_chain_budget(self, reposts, depth):
+        fragment_cache().clear()
+        # One more query per level of the chains
+        with self.assertNumQueries(FEED_QUERY_BUDGET + depth):
+            profiles = render_feed(
+                feed_queryset(PostContent.objects.filter(pk__in=[repost.pk for repost in reposts])), user=self.buyer
+            )
+        self.assertEqual(len(profiles), len(reposts))
+        for profile in profiles:
+            for _ in range(depth):
+                self.assertTrue(profile["is_repost"])
+                profile = profile["original_post"]
+            self.assertEqual(profile["content"], "Hello")
+
+    def test_repost_chain_queries_do_not_grow_with_the_page(self):
+        reposts = self.add_chains(2, depth=2)
+        self.assert_chain_budget(reposts, depth=2)
+        reposts += self.add_chains(10, depth=2)
+        self.assert_chain_budget(reposts, depth=2)
+
+    def test_repost_chains_are_cut_at_the_depth_cap(self):
+        (repost,) = self.add_chains(1, depth=3)
+        posts = list(feed_queryset(PostContent.objects.filter(pk=repost.pk)))
+        (profile,) = render_feed(posts)
+        self.assertEqual(profile["original_post"]["original_post"]["original_post"]["content"], "Hello")
+
+        loaded = attach_original_posts(posts, max_depth=2)
+        capped = compose_profile(posts[0], render_posts(loaded), max_depth=2)
+        self.assertIsNone(capped["original_post"]["original_post"])
+
+    def test_likes_are_flagged_on_every_level_of_a_chain(self):
+        (repost,) = self.add_chains(1, depth=2)
+        middle = repost.original_post
+        PostLikes.objects.create(post=repost).likes.add(self.buyer)
+        PostLikes.objects.filter(post=middle.original_post_id).delete()
+
+        (profile,) = render_feed(feed_queryset(PostContent.objects.filter(pk=repost.pk)), user=self.buyer)
+        flags = []
+        while profile is not None:
+            flags.append(profile["liked_by_me"])
+            profile = profile.get("original_post")
+        self.assertEqual(flags, [True, False, False])
+
+
+class PostLikersTestCase(APIViewTestCase):
+
+    def test_likers_are_listed(self):
+        post = PostContent.objects.create(user=self.provider, title="Liked", content="Hello")
+        PostLikes.objects.create(post=post).likes.add(self.buyer)
+        response = self.call(RetrievePostLikersView, post_id=post.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]["data"]), 1)
+
+    def test_malformed_post_ids_are_not_found(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        self.assertEqual(client.get("/api/v1/post/likers/not-a-uuid/").status_code, 404)
+
+
+class CommentThreadTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = PostContent.objects.create(user=cls.provider, title="Thread", content="Discuss")
+
+    def add_threads(self, count):
+        for index in range(count):
+            top = PostComments.objects.create(post=self.post, commented_by=self.buyer, comment=f"Top {index}")
+            reply = PostComments.objects.create(
+                post=self.post, commented_by=self.provider, comment="Reply", parent_comment=top
+            )
+            PostComments.objects.create(post=self.post, commented_by=self.buyer, comment="Nested", parent_comment=reply)
+
+    def assert_thread_budget(self, threads):
+        with self.assertNumQueries(THREAD_QUERY_BUDGET):
+            response = self.call(
+                RetrievePostCommentsView, data={"threaded": "true", "page_size": 100}, post_id=self.post.pk
+            )
+        data = response.data["results"]["data"]
+        self.assertEqual(len(data), threads)
+        for thread in data:
+            self.assertEqual(thread["reply_count"], 2)
+            self.assertEqual(thread["replies"][0]["replies"][0]["comment"], "Nested")
+
+    def test_threaded_queries_do_not_grow_with_the_page(self):
+        self.add_threads(2)
+        self.assert_thread_budget(2)
+        self.add_threads(10)
+        self.assert_thread_budget(12)
+
+    def test_thread_pages_replies_depth_first(self):
+        self.add_threads(1)
+        top = PostComments.objects.get(parent_comment__isnull=True)
+        response = self.call(RetrievePostCommentsView, data={"thread": top.pk}, post_id=self.post.pk)
+        self.assertEqual([reply["comment"] for reply in response.data["results"]["data"]], ["Reply", "Nested"])
+
+    def test_malformed_thread_ids_are_rejected(self):
+        response = self.call(RetrievePostCommentsView, data={"thread": "not-a-uuid"}, post_id=self.post.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("thread", response.data)
+
+
+class PostCountersTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = PostContent.objects.create(user=cls.provider, title="Counted", content="Hello")
+
+    def counters(self):
+        self.post.refresh_from_db()
+        return self.post.like_count, self.post.comment_count, self.post.repost_count
+
+    def test_interactions_move_the_counters(self):
+        like = {"post": str(self.post.pk)}
+        self.assertEqual(self.call(LikePostContentView, "post", like, format="json").data["data"]["likes_count"], 1)
+        self.call(LikePostContentView, "post", like, user=self.buyer, format="json")
+        self.assertEqual(self.counters(), (2, 0, 0))
+        self.call(LikePostContentView, "post", like, format="json")
+        self.assertEqual(self.counters(), (1, 0, 0))
+
+        comment = self.call(
+            CommentPostContentView, "post", {"post": str(self.post.pk), "comment": "First"}, format="json"
+        ).data["data"]
+        self.call(
+            CommentPostContentView, "post",
+            {"post": str(self.post.pk), "comment": "Reply", "parent_comment": str(comment["id"])}, format="json",
+        )
+        self.call(RepostContentView, "post", {"original_post": str(self.post.pk)}, user=self.buyer, format="json")
+        self.assertEqual(self.counters(), (1, 2, 1))
+
+        # The reply goes with its parent and is counted off too
+        self.call(DeleteCommentView, "delete", comment_id=comment["id"])
+        self.assertEqual(self.counters(), (1, 0, 1))
+
+    def test_rebuild_repairs_drift(self):
+        PostLikes.objects.create(post=self.post).likes.add(self.buyer, self.provider)
+        PostComments.objects.create(post=self.post, commented_by=self.buyer, comment="Hi")
+        RePostContent.objects.create(user=self.buyer, title="Again", original_post=self.post)
+        PostContent.objects.filter(pk=self.post.pk).update(like_count=40, comment_count=0, repost_count=7)
+
+        call_command("rebuild_post_counters", stdout=StringIO())
+        self.assertEqual(self.counters(), (2, 1, 1))
+
+
+class PostSearchTestCase(APIViewTestCase):
+
+    def search(self, **params):
+        response = self.call(SearchPostContentView, data=params)
+        return [post["title"] for post in response.data["results"]["data"]]
+
+    def test_title_matches_rank_first(self):
+        PostContent.objects.create(user=self.provider, title="Notes", content="Our chemistry exam is on Monday")
+        PostContent.objects.create(user=self.provider, title="Chemistry", content="Bring a calculator")
+        PostContent.objects.create(user=self.provider, title="Notes", summary="Chemistry revision", content="-")
+        PostContent.objects.create(user=self.provider, title="Physics", content="Nothing to see")
+
+        self.assertEqual(self.search(q="chemistry"), ["Chemistry", "Notes", "Notes"])
+        self.assertEqual(self.search(q="chemistry -calculator")[0], "Notes")
+
+    def test_tags_narrow_the_results(self):
+        PostContent.objects.create(user=self.provider, title="Tutor", content="Chemistry tutor wanted", tags=["job"])
+        PostContent.objects.create(user=self.provider, title="Party", content="Chemistry party", tags=["event"])
+        self.assertEqual(self.search(q="chemistry", tag="job"), ["Tutor"])
+
+    def test_pages_follow_the_ranking(self):
+        for index in range(3):
+            PostContent.objects.create(user=self.provider, title=f"Chemistry {index}", content="chemistry " * index)
+        first = self.call(SearchPostContentView, data={"q": "chemistry", "page_size": 2}).data
+        cursor = parse_qs(urlsplit(first["next"]).query)["cursor"][0]
+        rest = self.search(q="chemistry", page_size=2, cursor=cursor)
+        self.assertEqual(len(first["results"]["data"]) + len(rest), 3)
+        self.assertFalse({post["title"] for post in first["results"]["data"]} & set(rest))
+
+
+class TimelineBackfillTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = make_user("author@example.com", university="Lagos")
+        cls.reader = make_user("reader@example.com", university="Lagos")
+
+    def timeline(self):
+        response = self.call(RetrieveTimelineView, user=self.reader)
+        return [post["title"] for post in response.data["results"]["data"]]
+
+    def test_lost_fan_outs_are_recovered(self):
+        # Created without schedule_fan_out(), as if the worker died first
+        old = PostContent.objects.create(user=self.author, title="Old")
+        PostContent.objects.filter(pk=old.pk).update(created=timezone.now() - datetime.timedelta(days=2))
+        PostContent.objects.create(user=self.author, title="New")
+        PostContent.objects.create(user=self.provider, title="Elsewhere")
+        self.assertEqual(self.timeline(), [])
+
+        call_command("backfill_timelines", stdout=StringIO())
+        self.assertEqual(self.timeline(), ["New"])
+        call_command("backfill_timelines", "--all", stdout=StringIO())
+        call_command("backfill_timelines", "--all", stdout=StringIO())
+        self.assertEqual(self.timeline(), ["New", "Old"])
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.reader).count(), 2)
+
+
+class CursorTestCase(APIViewTestCase):
+
+    def test_tampered_cursors_are_not_found(self):
+        for view, params in (
+            (SearchPostContentView, {"q": "chemistry"}), (RetrievePostContentView, {}), (RetrieveTimelineView, {}),
+        ):
+            for cursor in (encode_cursor(["x", "y"]), encode_cursor([1, 2, 3]), encode_cursor([None, None])):
+                with self.subTest(view=view.__name__, cursor=cursor):
+                    response = self.call(view, data={**params, "cursor": cursor})
+                    self.assertEqual(response.status_code, 404)
+
+
+class FeedPaginationTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index in range(3):
+            PostContent.objects.create(user=cls.provider, title=f"Post {index}", content="Hello")
+
+    def titles(self, page):
+        return [post["title"] for post in page["results"]["data"]]
+
+    def test_pages_by_number_by_default(self):
+        response = self.call(RetrievePostContentView)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {"count", "next", "previous", "results"})
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(self.titles(response.data), ["Post 2", "Post 1", "Post 0"])
+
+    def test_cursor_pages_are_opt_in(self):
+        first = self.call(RetrievePostContentView, data={"cursor": "", "page_size": 2}).data
+        self.assertEqual(set(first), {"next", "results"})
+        self.assertEqual(self.titles(first), ["Post 2", "Post 1"])
+
+        cursor = parse_qs(urlsplit(first["next"]).query)["cursor"][0]
+        second = self.call(RetrievePostContentView, data={"cursor": cursor, "page_size": 2}).data
+        self.assertEqual(self.titles(second), ["Post 0"])
+        self.assertIsNone(second["next"])
+
+
+class EventListPaginationTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.now() + datetime.timedelta(days=1)
+        Event.objects.bulk_create([
+            Event(user=cls.provider, event_name=f"Event {i}", event_date=start + datetime.timedelta(hours=i))
+            for i in range(3)
+        ])
+
+    def test_pages_by_number_by_default(self):
+        response = self.call(EventListAPIView)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertIn("previous", response.data)
+        self.assertEqual([event["event_name"] for event in response.data["results"]], ["Event 0", "Event 1", "Event 2"])
+
+    def test_cursor_pages_are_opt_in(self):
+        first = self.call(EventListAPIView, data={"cursor": "", "page_size": 2}).data
+        self.assertEqual(set(first), {"next", "results"})
+        self.assertEqual([event["event_name"] for event in first["results"]], ["Event 0", "Event 1"])
+
+        cursor = parse_qs(urlsplit(first["next"]).query)["cursor"][0]
+        second = self.call(EventListAPIView, data={"cursor": cursor, "page_size": 2}).data
+        self.assertEqual([event["event_name"] for event in second["results"]], ["Event 2"])
+        self.assertIsNone(second["next"])
+
+
+class EventRSVPTestCase(APIViewTestCase):
+
+    def test_reserve_stops_at_capacity(self):
+        event = Event.objects.create(user=self.provider, event_name="Workshop", capacity=1)
+        self.assertEqual(EventRSVP.reserve(event.pk, self.buyer), EventRSVP.RESERVED)
+        self.assertEqual(EventRSVP.reserve(event.pk, self.buyer), EventRSVP.ALREADY_RESERVED)
+        self.assertEqual(EventRSVP.reserve(event.pk, self.provider), EventRSVP.FULL)
+        self.assertFalse(EventRSVP.objects.filter(event=event, user=self.provider).exists())
+
+        self.assertTrue(EventRSVP.cancel(event.pk, self.buyer))
+        self.assertEqual(EventRSVP.reserve(event.pk, self.provider), EventRSVP.RESERVED)
+        event.refresh_from_db()
+        self.assertEqual(event.seats_taken, 1)
+
+
+class EventRSVPConcurrencyTestCase(TransactionTestCase):
+    """Reservations racing on their own connections never oversell an event."""
+
+    def test_concurrent_reservations_do_not_oversell(self):
+        users = [make_user(f"attendee{index}@example.com") for index in range(12)]
+        event = Event.objects.create(user=users[0], event_name="Concert", capacity=5)
+        start_line = threading.Barrier(len(users))
+        outcomes = []
+
+        def attend(user_obj):
+            try:
+                start_line.wait()
+                # Every user retries once, as a flaky client would
+                outcomes.extend(EventRSVP.reserve(event.pk, user_obj) for _ in range(2))
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=attend, args=(user_obj,)) for user_obj in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        self.assertEqual(event.seats_taken, 5)
+        self.assertEqual(EventRSVP.objects.filter(event=event).count(), 5)
+        self.assertEqual(outcomes.count(EventRSVP.RESERVED), 5)
+        self.assertEqual(outcomes.count(EventRSVP.ALREADY_RESERVED), 5)
+        self.assertEqual(outcomes.count(EventRSVP.FULL), 14)
@@ -0,0 +1,180 @@
+"""
+Materialized home timelines.
+
+A post is pushed onto the timelines of its author's audience when it is
+created (fan-out-on-write), so reading a timeline is a single range read on
+``TimelineEntry``. Authors whose audience is too large to copy a post to, and
+sponsored posts that go to everyone, are instead merged in at read time
+(fan-out-on-read).
+
+A user's audience is everyone at the same university, the author included.
+
+The fan-out runs on an in-process thread pool once the post's transaction
+commits, so whatever a worker still had queued when it restarted or
+crashed is lost and those posts never reach the timelines. Run
+``manage.py backfill_timelines`` on a schedule, with a window longer than
+the interval, to copy them over; writing an entry twice is a no-op.
+"""
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from utils.pagination import keyset_filter
+from .models import PostContent, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+# Entries kept per timeline, older ones are trimmed away
+TIMELINE_LENGTH = getattr(settings, "TIMELINE_LENGTH", 800)
+# Audiences larger than this are served fan-out-on-read
+TIMELINE_FANOUT_LIMIT = getattr(settings, "TIMELINE_FANOUT_LIMIT", 5000)
+# Each timeline written to is trimmed with this probability, which amortizes
+# the trim to a few rows per insert while keeping the length bounded
+TIMELINE_TRIM_RATE = getattr(settings, "TIMELINE_TRIM_RATE", 0.05)
+FANOUT_BATCH_SIZE = 1000
+
+ENTRY_ORDERING = ("-posted", "post_id")
+POST_ORDERING = ("-created", "id")
+
+_fanout_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="timeline-fanout")
+
+
+def audience_size(university):
+    """Number of users sharing ``university``, cached for a few minutes."""
+    if not university:
+        return 1
+    return cache.get_or_set(
+        f"timeline:audience:{university}",
+        lambda: get_user_model().objects.filter(university=university).count(),
+        timeout=600,
+    )
+
+
+def reads_on_demand(university):
+    return audience_size(university) > TIMELINE_FANOUT_LIMIT
+
+
+def audience_ids(author):
+    users = get_user_model().objects
+    if not author.university:
+        users = users.filter(pk=author.pk)
+    else:
+        users = users.filter(university=author.university)
+    return users.values_list("pk", flat=True)
+
+
+def trim_timelines(owner_ids):
+    """Deletes the entries past ``TIMELINE_LENGTH`` on each owner's timeline."""
+    if not owner_ids:
+        return
+    overflow = (
+        TimelineEntry.objects
+        .filter(owner_id__in=owner_ids)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=F("owner"),
+            order_by=[F("posted").desc(), F("post_id").asc()],
+        ))
+        .filter(position__gt=TIMELINE_LENGTH)
+        .values_list("pk", flat=True)
+    )
+    TimelineEntry.objects.filter(pk__in=list(overflow)).delete()
+
+
+def fan_out_post(post_id):
+    """Copies a post onto the timelines of its author's audience."""
+    try:
+        post = PostContent.objects.non_polymorphic().select_related("user").get(pk=post_id)
+    except PostContent.DoesNotExist:
+        # Deleted before the worker got to it
+        return
+    author = post.user
+    if author is None or post.is_sponsored or reads_on_demand(author.university):
+        return
+
+    batch = []
+    for owner_id in audience_ids(author).iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(owner_id)
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            _write_entries(post, batch)
+            batch = []
+    _write_entries(post, batch)
+
+
+def _write_entries(post, owner_ids):
+    if not owner_ids:
+        return
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=owner_id, post_id=post.pk, posted=post.created) for owner_id in owner_ids],
+            ignore_conflicts=True,
+        )
+    trim_timelines([owner_id for owner_id in owner_ids if random.random() < TIMELINE_TRIM_RATE])
+
+
+def _run_fan_out(post_id):
+    try:
+        fan_out_post(post_id)
+    except DatabaseError:
+        # The post may have been deleted mid fan-out, its entries cascade away
+        logger.exception("Timeline fan-out failed for post %s", post_id)
+    finally:
+        close_old_connections()
+
+
+def backfill_timelines(since=None):
+    """
+    Re-runs the fan-out of every post created since ``since`` (every post
+    when None), oldest first, to recover fan-outs a worker lost. Returns the
+    number of posts fanned out.
+    """
+    posts = PostContent.objects.non_polymorphic().filter(is_sponsored=False, user__isnull=False)
+    if since is not None:
+        posts = posts.filter(created__gte=since)
+    fanned = 0
+    for post_id in posts.order_by("created", "id").values_list("pk", flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE):
+        fan_out_post(post_id)
+        fanned += 1
+    return fanned
+
+
+def schedule_fan_out(post):
+    """Queues the fan-out of ``post`` once the current transaction commits."""
+    transaction.on_commit(lambda: _fanout_pool.submit(_run_fan_out, post.pk))
+
+
+def read_timeline(user_obj, position=None, limit=50):
+    """
+    Returns ``(post_ids, next_position)`` for one page of ``user_obj``'s home
+    timeline, newest first. ``position`` is the ``next_position`` of the
+    previous page and ``next_position`` is None on the last page.
+    """
+    if reads_on_demand(user_obj.university):
+        # Too big to materialize, read straight from the posts
+        pulled = Q(user__university=user_obj.university) | Q(is_sponsored=True)
+        stored = []
+    else:
+        pulled = Q(is_sponsored=True)
+        entries = TimelineEntry.objects.filter(owner=user_obj)
+        if position is not None:
+            entries = entries.filter(keyset_filter(ENTRY_ORDERING, position))
+        stored = list(entries.order_by(*ENTRY_ORDERING).values_list("posted", "post_id")[:limit + 1])
+
+    posts = PostContent.objects.non_polymorphic().filter(pulled)
+    if position is not None:
+        posts = posts.filter(keyset_filter(POST_ORDERING, position))
+    merged = set(stored)
+    merged.update(posts.order_by(*POST_ORDERING).values_list("created", "id")[:limit + 1])
+
+    # Newest first, ties broken by ascending id like the SQL ordering
+    rows = sorted(sorted(merged, key=lambda row: row[1]), key=lambda row: row[0], reverse=True)
+    page = rows[:limit]
+    next_position = list(page[-1]) if len(rows) > limit else None
+    return [post_id for _, post_id in page], next_position
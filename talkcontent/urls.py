@@ -1,18 +1,22 @@
 from django.urls import path, include
 from .views import (
     EventCreateAPIView, EventListAPIView, EventDetailAPIView,
-    EventUpdateAPIView, EventDeleteAPIView,
+    EventUpdateAPIView, EventDeleteAPIView, EventCalendarAPIView,
+    EventRSVPAPIView,
     CreatePostContentView, RetrievePostContentView,
     RetrieveDetailedPostContent, DeletePostContentView,
     UpdatePostContentView, LikePostContentView,
     CommentPostContentView, RetrievePostCommentsView, DeleteCommentView,
-    UpdateCommentView, RepostContentView
+    UpdateCommentView, RepostContentView, RetrievePostLikersView,
+    RetrieveTimelineView, SearchPostContentView
 )
 
 # Events
 events_urlpatterns = [
     path('', EventListAPIView.as_view(), name='event-list'),
+    path('calendar/', EventCalendarAPIView.as_view(), name='event-calendar'),
     path('<uuid:id>/', EventDetailAPIView.as_view(), name='event-detail'),
+    path('<uuid:id>/rsvp/', EventRSVPAPIView.as_view(), name='event-rsvp'),
     path('create/', EventCreateAPIView.as_view(), name='event-create'),
     path("update/<uuid:pk>/",
          EventUpdateAPIView.as_view(), name="event-update"),
@@ -25,8 +29,11 @@ post_urlpatterns = [
     path('update/<str:pk>/', UpdatePostContentView.as_view()),
     path('delete/<str:pk>/', DeletePostContentView.as_view()),
     path('retrieve/', RetrievePostContentView.as_view()),
+    path('timeline/', RetrieveTimelineView.as_view()),
+    path('search/', SearchPostContentView.as_view()),
     path('retrieve/<str:pk>/', RetrieveDetailedPostContent.as_view()),
     path('like/', LikePostContentView.as_view()),
+    path('likers/<uuid:post_id>/', RetrievePostLikersView.as_view()),
     path('repost/', RepostContentView.as_view())
     # path('share/', SharePostContentView.as_view()),
 ]
@@ -1,10 +1,29 @@
 from rest_framework import status, generics
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
-from drf_spectacular.utils import extend_schema
+from rest_framework.pagination import PageNumberPagination
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from utils.helpers import custom_response
-from .models import Event, PostContent, PostLikes, PostComments
+from utils.pagination import KeysetPagination
+from utils.search import search_rank
+from utils.viewcounts import count_view
+from rest_framework.utils.urls import replace_query_param
+from .models import (
+    Event, EventRSVP, PostContent, PostLikes, PostComments, RePostContent, TimelineEntry, REPLY_PREVIEW_SIZE,
+)
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+import uuid
+from decimal import Decimal, InvalidOperation
+from .feed import feed_queryset, render_feed
+from .timelines import ENTRY_ORDERING, read_timeline, schedule_fan_out
+from utils.pagination import cursor_position, encode_cursor, decode_cursor
 from talkproject.permissions import IsEventCreatorOrReadOnly
 from .serializers import (
     EventSerializer, 
@@ -51,17 +70,138 @@ class EventCreateAPIView(generics.CreateAPIView):
             )
         )
 
+def parse_event_bound(value, name, end=False):
+    """
+    Reads a ``from``/``to`` query value as an aware datetime. A bare date
+    covers the whole day, so with ``end`` it returns the start of the next
+    day as an exclusive bound. Returns ``(moment, inclusive)``.
+    """
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment, True
+    if day is None:
+        raise ValidationError({name: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+    if end:
+        return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)), False
+    return timezone.make_aware(datetime.combine(day, time.min)), True
+
+def parse_fee(value, name):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a number."})
+
 class EventListAPIView(generics.ListAPIView):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    pagination_class = PageNumberPagination
+    keyset_ordering = Event.UPCOMING_ORDERING
 
     @extend_schema(
         tags=[tag_names["event"]],
         operation_id="List_Events",
+        description="Lists events soonest first, or most recent first with `when=past`. "
+                    "Pages are numbered by default. Pass `cursor` (empty for the first page) to page by cursor instead, "
+                    "which stays fast however deep the page: follow the `next` link.",
+        parameters=[
+            OpenApiParameter("when", str, enum=["upcoming", "past"], description="Only events that have not started yet, or that already have."),
+            OpenApiParameter("from", str, description="Events on or after this date (YYYY-MM-DD) or datetime."),
+            OpenApiParameter("to", str, description="Events on or before this date (YYYY-MM-DD) or datetime."),
+            OpenApiParameter("min_fee", float, description="Lowest event fee."),
+            OpenApiParameter("max_fee", float, description="Highest event fee."),
+            OpenApiParameter("cursor", str, description="Opts in to cursor pages: empty for the first page, then the cursor from the previous page's `next` link."),
+            OpenApiParameter("page", int, description="Page number, when not paging by cursor. Deep pages are slower."),
+        ]
     )
     def get(self, request, *args, **kwargs):
+        if "cursor" in request.query_params:
+            # Cursor pages are opt-in, existing clients keep count/previous
+            self.pagination_class = KeysetPagination
         return super().get(request, *args, **kwargs)
 
+    def get_queryset(self):
+        params = self.request.query_params
+        events = super().get_queryset()
+
+        when = params.get("when")
+        if when == "upcoming":
+            events = events.filter(event_date__gte=timezone.now())
+        elif when == "past":
+            events = events.filter(event_date__lt=timezone.now())
+            self.keyset_ordering = Event.PAST_ORDERING
+        elif when:
+            raise ValidationError({"when": "Must be 'upcoming' or 'past'."})
+
+        if params.get("from"):
+            start, _ = parse_event_bound(params["from"], "from")
+            events = events.filter(event_date__gte=start)
+        if params.get("to"):
+            end, inclusive = parse_event_bound(params["to"], "to", end=True)
+            events = events.filter(**{"event_date__lte" if inclusive else "event_date__lt": end})
+        if params.get("min_fee"):
+            events = events.filter(event_fees__gte=parse_fee(params["min_fee"], "min_fee"))
+        if params.get("max_fee"):
+            events = events.filter(event_fees__lte=parse_fee(params["max_fee"], "max_fee"))
+
+        return events.order_by(*self.keyset_ordering)
+
+class EventCalendarAPIView(generics.GenericAPIView):
+    queryset = Event.objects.all()
+    serializer_class = EventSerializer
+
+    @extend_schema(
+        tags=[tag_names["event"]],
+        operation_id="Event_Calendar",
+        description="Number of events on each day of a month, days without events are left out.",
+        parameters=[
+            OpenApiParameter("month", str, description="Month as YYYY-MM, defaults to the current month."),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        month = request.query_params.get("month")
+        today = timezone.localdate()
+        try:
+            first_day = datetime.strptime(month, "%Y-%m").date() if month else today.replace(day=1)
+        except ValueError:
+            return Response(custom_response(
+                status_mthd=status.HTTP_400_BAD_REQUEST,
+                status="error",
+                mssg="month must look like YYYY-MM",
+                data=None
+            ))
+        next_month = (first_day + timedelta(days=32)).replace(day=1)
+
+        # One grouped range scan over the event_date index
+        days = (
+            self.get_queryset()
+            .filter(
+                event_date__gte=timezone.make_aware(datetime.combine(first_day, time.min)),
+                event_date__lt=timezone.make_aware(datetime.combine(next_month, time.min)),
+            )
+            .annotate(day=TruncDate("event_date", tzinfo=timezone.get_current_timezone()))
+            .order_by()
+            .values("day")
+            .annotate(count=Count("id"))
+            .order_by("day")
+        )
+        days = [{"date": row["day"].isoformat(), "count": row["count"]} for row in days]
+        return Response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Event calendar retrieved successfully",
+            data={
+                "month": first_day.strftime("%Y-%m"),
+                "total": sum(day["count"] for day in days),
+                "days": days,
+            }
+        ))
+
 class EventDetailAPIView(generics.RetrieveAPIView):
     serializer_class=EventSerializer
     queryset=Event.objects.all()
@@ -82,7 +222,7 @@ class EventDetailAPIView(generics.RetrieveAPIView):
                 status_mthd=status.HTTP_200_OK,
                 status="success",
                 mssg="Event retrieved successfully",
-                data=serializer.data
+                data={**serializer.data, "views": count_view("event", event.pk)}
             ))
         except Event.DoesNotExist:
             return Response(custom_response(
@@ -131,6 +271,54 @@ class EventDeleteAPIView(generics.DestroyAPIView):
             status=status.HTTP_204_NO_CONTENT
         )
 
+class EventRSVPAPIView(generics.GenericAPIView):
+    queryset = Event.objects.all()
+    permission_classes = [IsAuthenticated]
+    lookup_field = "id"
+
+    def rsvp_response(self, event_id, attending, mssg, status_mthd, state="success"):
+        event = Event.objects.filter(id=event_id).first()
+        return Response(custom_response(
+            status_mthd=status_mthd,
+            status=state,
+            mssg=mssg,
+            data=event.rsvp_profile(attending) if event else None
+        ), status=status_mthd)
+
+    @extend_schema(
+        tags=[tag_names["event"]],
+        operation_id="RSVP_Event",
+        description="Takes a seat at the event. Retrying is safe: a user holds at most one seat, "
+                    "and a repeat request answers 200 instead of 201. Answers 409 once the event is full.",
+        request=None,
+    )
+    def post(self, request, *args, **kwargs):
+        event_id = kwargs.get(self.lookup_field)
+        if not Event.objects.filter(id=event_id).exists():
+            return self.rsvp_response(event_id, False, "Event not found", status.HTTP_404_NOT_FOUND, "error")
+
+        outcome = EventRSVP.reserve(event_id, request.user)
+        if outcome == EventRSVP.FULL:
+            return self.rsvp_response(event_id, False, "Event is full", status.HTTP_409_CONFLICT, "error")
+        if outcome == EventRSVP.ALREADY_RESERVED:
+            return self.rsvp_response(event_id, True, "Already attending", status.HTTP_200_OK)
+        return self.rsvp_response(event_id, True, "Seat reserved", status.HTTP_201_CREATED)
+
+    @extend_schema(
+        tags=[tag_names["event"]],
+        operation_id="Cancel_RSVP_Event",
+        description="Gives the user's seat back. Cancelling without a seat is a no-op.",
+    )
+    def delete(self, request, *args, **kwargs):
+        event_id = kwargs.get(self.lookup_field)
+        if not Event.objects.filter(id=event_id).exists():
+            return self.rsvp_response(event_id, False, "Event not found", status.HTTP_404_NOT_FOUND, "error")
+
+        cancelled = EventRSVP.cancel(event_id, request.user)
+        return self.rsvp_response(
+            event_id, False, "RSVP cancelled" if cancelled else "Not attending", status.HTTP_200_OK
+        )
+
 # =========================
 # POSTS VIEWS
 # =========================
@@ -145,7 +333,8 @@ class CreatePostContentView(generics.GenericAPIView):
         data = request.data
         serializer = self.get_serializer(data=data, context={"request": request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        post = serializer.save()
+        schedule_fan_out(post)
 
         return Response(
             custom_response(
@@ -173,23 +362,41 @@ class RetrievePostContentView(generics.RetrieveAPIView):
     permission_classes=[IsAuthenticated]
     serializer_class = PostContentSerializer
     lookup_field = "pk"
+    pagination_class = PageNumberPagination
+    keyset_ordering = PostContent._meta.ordering
 
     @extend_schema(
             tags=[tag_names['post']], 
             operation_id="Retrieve all Post",
-            description="Retrieve all posts available in the system.\nN.B: Dataset with the `is_repost` field set to _True_ are reposted contents."
+            description="Retrieve all posts available in the system.\nN.B: Dataset with the `is_repost` field set to _True_ are reposted contents.\n"
+                        "Pages are numbered by default. Pass `cursor` (empty for the first page) to page by cursor instead, "
+                        "which stays fast however deep the page: follow the `next` link to load older posts.",
+            parameters=[
+                OpenApiParameter("sort", str, enum=["recent", "popular"], description="Order by recency (default) or by like count."),
+                OpenApiParameter("cursor", str, description="Opts in to cursor pages: empty for the first page, then the cursor from the previous page's `next` link."),
+                OpenApiParameter("page", int, description="Page number, when not paging by cursor. Deep pages are slower."),
+            ]
     )
     def get(self, request, *args, **kwargs):
-        posts = self.get_queryset()
+        queryset = self.get_queryset()
+        if request.query_params.get("sort") == "popular":
+            self.keyset_ordering = PostContent.POPULAR_ORDERING
+            queryset = queryset.order_by(*PostContent.POPULAR_ORDERING)
+        if "cursor" in request.query_params:
+            # Cursor pages are opt-in, existing clients keep count/previous
+            self.pagination_class = KeysetPagination
+        posts = feed_queryset(queryset)
         try:
-            serializer = self.get_serializer(posts, many=True)
-            data = serializer.data
-            return Response(custom_response(
+            page = self.paginate_queryset(posts)
+            return self.get_paginated_response(custom_response(
                 status_mthd=status.HTTP_200_OK,
                 status="success",
                 mssg="Posts retrieved successfully",
-                data=[post.post_profile() for post in posts]
+                data=render_feed(page, user=request.user)
             ))
+        except NotFound:
+            # A bad cursor is a 404 like on every other cursor-paged list
+            raise
         except Exception as e:
             return Response(custom_response(
                 status_mthd=status.HTTP_400_BAD_REQUEST,
@@ -198,8 +405,89 @@ class RetrievePostContentView(generics.RetrieveAPIView):
                 data=None
             ))
 
-class RetrieveDetailedPostContent(generics.RetrieveAPIView):
+class SearchPostContentView(generics.GenericAPIView):
     queryset = PostContent.objects.all()
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-rank", "id")
+
+    @extend_schema(
+        tags=[tag_names['post']],
+        operation_id="Search Posts",
+        description="Full-text search over post titles, summaries and content, best matches first. "
+                    "Follow the `next` link for more results.",
+        parameters=[
+            OpenApiParameter("q", str, required=True, description="Search terms, quoted phrases and `-exclusions` are supported."),
+            OpenApiParameter("tag", str, many=True, description="Only return posts carrying every given tag."),
+            OpenApiParameter("cursor", str, description="Opaque cursor taken from the previous page's `next` link."),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        terms = request.query_params.get("q", "").strip()
+        if not terms:
+            return Response(custom_response(
+                status_mthd=status.HTTP_400_BAD_REQUEST,
+                status="error",
+                mssg="q is required",
+                data=None
+            ))
+
+        query = SearchQuery(terms, search_type="websearch", config="english")
+        posts = (
+            self.get_queryset()
+            .filter(search_vector=query)
+            .annotate(rank=search_rank(query))
+        )
+        tags = request.query_params.getlist("tag")
+        if tags:
+            posts = posts.filter(tags__contains=tags)
+
+        page = self.paginate_queryset(feed_queryset(posts))
+        return self.get_paginated_response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Posts retrieved successfully",
+            data=render_feed(page, user=request.user)
+        ))
+
+class RetrieveTimelineView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    @extend_schema(
+        tags=[tag_names['post']],
+        operation_id="Retrieve home timeline",
+        description="Posts from the user's university plus sponsored posts, newest first. Follow the `next` link to load older posts.",
+        parameters=[OpenApiParameter("cursor", str, description="Opaque cursor taken from the previous page's `next` link.")]
+    )
+    def get(self, request, *args, **kwargs):
+        paginator = self.paginator
+        cursor = request.query_params.get(paginator.cursor_query_param)
+        position = None
+        if cursor:
+            position = cursor_position(TimelineEntry.objects.all(), ENTRY_ORDERING, decode_cursor(cursor))
+        post_ids, next_position = read_timeline(
+            request.user, position=position, limit=paginator.get_page_size(request)
+        )
+
+        posts = {post.pk: post for post in feed_queryset(PostContent.objects.filter(pk__in=post_ids))}
+        next_link = None
+        if next_position is not None:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), paginator.cursor_query_param, encode_cursor(next_position)
+            )
+        return Response({
+            "next": next_link,
+            "results": custom_response(
+                status_mthd=status.HTTP_200_OK,
+                status="success",
+                mssg="Timeline retrieved successfully",
+                data=render_feed([posts[pk] for pk in post_ids if pk in posts], user=request.user)
+            )
+        })
+
+class RetrieveDetailedPostContent(generics.RetrieveAPIView):
+    queryset = feed_queryset()
     permission_classes=[IsAuthenticated]
     serializer_class = PostContentSerializer
     lookup_field = "pk"
@@ -208,13 +496,11 @@ class RetrieveDetailedPostContent(generics.RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         post = self.get_object()
         try:
-            serializer = self.get_serializer(post)
-            data = serializer.data
             return Response(custom_response(
                 status_mthd=status.HTTP_200_OK,
                 status="success",
                 mssg="Post retrieved successfully",
-                data=post.post_profile()
+                data={**render_feed([post], user=request.user)[0], "views": count_view("post", post.pk)}
             ))
         except Exception as e:
             return Response(custom_response(
@@ -233,7 +519,10 @@ class DeletePostContentView(generics.DestroyAPIView):
     @extend_schema(tags=[tag_names['post']], operation_id="Delete a Post")
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
+        # Timeline entries cascade with the post, trimming every home timeline
         self.perform_destroy(instance)
+        if isinstance(instance, RePostContent) and instance.original_post_id:
+            PostContent.adjust_counters(instance.original_post_id, repost_count=-1)
         return Response(
             {"message": "Post deleted successfully"},
             status=status.HTTP_204_NO_CONTENT
@@ -261,9 +550,7 @@ class LikePostContentView(generics.GenericAPIView):
                 )
             )
 
-        try:
-            post = PostContent.objects.get(id=post_id)
-        except PostContent.DoesNotExist:
+        if not PostContent.objects.filter(id=post_id).exists():
             return Response(
                 custom_response(
                     status_mthd=status.HTTP_404_NOT_FOUND,
@@ -273,15 +560,11 @@ class LikePostContentView(generics.GenericAPIView):
                 )
             )
 
-        post_likes, created = PostLikes.objects.get_or_create(post=post)
-        if user in post_likes.likes.all():
-            # If user already liked → unlike
-            post_likes.likes.remove(user)
-            action = "unliked"
-        else:
-            # If user hasn't liked yet → like
-            post_likes.likes.add(user)
-            action = "liked"
+        post_likes, created = PostLikes.objects.get_or_create(post_id=post_id)
+        liked, changed = post_likes.toggle_like(user)
+        if changed:
+            PostContent.adjust_counters(post_id, like_count=1 if liked else -1)
+        action = "liked" if liked else "unliked"
 
         return Response(
             custom_response(
@@ -289,13 +572,49 @@ class LikePostContentView(generics.GenericAPIView):
                 status="success",
                 mssg=f"Post {action} successfully",
                 data={
-                    "post_id": post.id,
-                    "likes_count": post_likes.likes.count(),
-                    "liked_by": [u.id for u in post_likes.likes.all()]
+                    "post_id": post_likes.post_id,
+                    "likes_count": PostContent.objects.filter(id=post_id).values_list("like_count", flat=True).first(),
+                    "liked_by_me": liked
                 }
             )
         )
 
+class RetrievePostLikersView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    lookup_field = "post_id"
+
+    @extend_schema(
+        tags=[tag_names['post']],
+        operation_id="Retrieve the likers of a Post",
+        description="Cursor-paginated list of everyone who liked a post. Feed payloads only carry a short `liked_by` preview.",
+        parameters=[OpenApiParameter("cursor", str, description="Opaque cursor taken from the previous page's `next` link.")]
+    )
+    def get(self, request, *args, **kwargs):
+        post_id = self.kwargs.get(self.lookup_field)
+        if not PostContent.objects.filter(id=post_id).exists():
+            return Response(
+                custom_response(
+                    status_mthd=status.HTTP_404_NOT_FOUND,
+                    status="error",
+                    mssg="Post not found",
+                    data=None
+                )
+            )
+
+        likers = PostLikes.likers_of(post_id)
+        user_field = PostLikes.likes.field.m2m_reverse_field_name()
+        self.keyset_ordering = likers.query.order_by
+        page = self.paginate_queryset(likers)
+        return self.get_paginated_response(
+            custom_response(
+                status_mthd=status.HTTP_200_OK,
+                status="success",
+                mssg="Likers retrieved successfully",
+                data=[PostLikes.liker_profile(getattr(row, user_field)) for row in page]
+            )
+        )
+
 class CommentPostContentView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = PostCommentsSerializer
@@ -330,6 +649,7 @@ class CommentPostContentView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save(commented_by=user, post=post)
+            PostContent.adjust_counters(post.id, comment_count=1)
             return Response(
                 custom_response(
                     status_mthd=status.HTTP_201_CREATED,
@@ -351,8 +671,23 @@ class RetrievePostCommentsView(generics.RetrieveAPIView):
     serializer_class = PostCommentsSerializer
     permission_classes=[IsAuthenticated]
     lookup_field = "post_id"
+    pagination_class = KeysetPagination
+    max_reply_preview = 20
 
-    @extend_schema(tags=[tag_names['comment']], operation_id="Retrieve Comments for a Post")
+    @extend_schema(
+        tags=[tag_names['comment']],
+        operation_id="Retrieve Comments for a Post",
+        description="Returns every comment on the post as a flat list. With `threaded=true`, returns "
+                    "top-level comments a page at a time, each with its first `replies` replies nested "
+                    "under their parents and a `reply_count`. Passing `thread=<comment_id>` pages through "
+                    "all replies of that top-level comment depth-first instead.",
+        parameters=[
+            OpenApiParameter("threaded", bool, description="Return top-level comments with nested reply previews."),
+            OpenApiParameter("replies", int, description=f"Replies previewed per thread (default {REPLY_PREVIEW_SIZE}, max 20)."),
+            OpenApiParameter("thread", str, description="Id of a top-level comment whose replies to page through."),
+            OpenApiParameter("cursor", str, description="Opaque cursor taken from the previous page's `next` link."),
+        ]
+    )
     def get(self, request, *args, **kwargs):
         post_id = self.kwargs.get(self.lookup_field)
 
@@ -368,6 +703,43 @@ class RetrievePostCommentsView(generics.RetrieveAPIView):
                 )
             )
 
+        thread_id = request.query_params.get("thread")
+        if thread_id:
+            try:
+                thread_id = uuid.UUID(thread_id)
+            except ValueError:
+                raise ValidationError({"thread": "Must be a comment id."})
+            self.keyset_ordering = PostComments.THREAD_ORDERING
+            replies = PostComments.objects.filter(post=post, thread_id=thread_id).select_related("commented_by")
+            page = self.paginate_queryset(replies)
+            return self.get_paginated_response(custom_response(
+                status_mthd=status.HTTP_200_OK,
+                status="success",
+                mssg="Replies retrieved successfully",
+                data=[reply.comment_profile() for reply in page]
+            ))
+
+        if request.query_params.get("threaded") in ("true", "1"):
+            self.keyset_ordering = PostComments.TOP_LEVEL_ORDERING
+            try:
+                reply_limit = int(request.query_params.get("replies", REPLY_PREVIEW_SIZE))
+            except ValueError:
+                reply_limit = REPLY_PREVIEW_SIZE
+            reply_limit = max(0, min(reply_limit, self.max_reply_preview))
+
+            top_level = (
+                PostComments.objects
+                .filter(post=post, parent_comment__isnull=True)
+                .select_related("commented_by")
+            )
+            page = self.paginate_queryset(top_level)
+            return self.get_paginated_response(custom_response(
+                status_mthd=status.HTTP_200_OK,
+                status="success",
+                mssg="Comments retrieved successfully",
+                data=PostComments.thread_profiles(page, reply_limit)
+            ))
+
         comments = post.post_comments.all()
         serializer = self.get_serializer(comments, many=True)
         return Response(
@@ -383,7 +755,8 @@ class UpdateCommentView(generics.UpdateAPIView):
     queryset = PostComments.objects.all()
     permission_classes=[IsAuthenticated]
     serializer_class = PostCommentsSerializer
-    lookup_field = "comment_id"
+    lookup_field = "pk"
+    lookup_url_kwarg = "comment_id"
     http_method_names = ['patch']
 
     @extend_schema(tags=[tag_names['comment']], operation_id="Update a Comment", description="Update a comment on a post using the comment's ID.")
@@ -394,12 +767,17 @@ class DeleteCommentView(generics.DestroyAPIView):
     queryset = PostComments.objects.all()
     permission_classes=[IsAuthenticated]
     serializer_class = PostCommentsSerializer
-    lookup_field = "comment_id"
+    lookup_field = "pk"
+    lookup_url_kwarg = "comment_id"
 
     @extend_schema(tags=[tag_names['comment']], operation_id="Delete a Comment", description="Delete a comment on a post using the comment's ID.")
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
-        self.perform_destroy(instance)
+        # Replies cascade with their parent, so count everything that went
+        _, deleted = instance.delete()
+        PostContent.adjust_counters(
+            instance.post_id, comment_count=-deleted.get(PostComments._meta.label, 0)
+        )
         return Response(
             {"message": "Comment deleted successfully"},
             status=status.HTTP_204_NO_CONTENT
@@ -414,7 +792,10 @@ class RepostContentView(generics.GenericAPIView):
         data = request.data
         serializer = self.get_serializer(data=data, context={"request": request})
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        repost = serializer.save(user=request.user)
+        if repost.original_post_id:
+            PostContent.adjust_counters(repost.original_post_id, repost_count=1)
+        schedule_fan_out(repost)
         return Response(custom_response(
             status_mthd=status.HTTP_200_OK,
             status="success",
@@ -431,7 +812,8 @@ class SharePostContentView(generics.CreateAPIView):
         data = request.data
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(shared_by=request.user)
+        share = serializer.save(shared_by=request.user)
+        PostContent.adjust_counters(share.post_id, share_count=1)
 
         return Response(
             custom_response(
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import pre_migrate
+
+
+def create_trigram_extension(sender, using, **kwargs):
+    # The catalog's trigram index needs pg_trgm before its table is created
+    from .models import CATALOG_SEARCH_TRIGRAM
+    connection = connections[using]
+    if CATALOG_SEARCH_TRIGRAM and connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
 
 
 class TalkmarketplaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'talkmarketplace'
+
+    def ready(self):
+        pre_migrate.connect(create_trigram_extension, sender=self)
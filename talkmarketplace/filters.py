@@ -0,0 +1,178 @@
+"""
+Query-string filters, sorts and facets of the listing views.
+
+A view names its ``listing_filter`` class. The filter narrows and orders the
+queryset from ``request.query_params`` and, for the product catalog, counts
+facets over everything that matched in a single grouped query.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, Count, IntegerField, Value, When
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+from .models import RatedModel
+from .ratings import MAX_STARS, MIN_STARS
+
+# Lower bounds of the price facet's bands
+CATALOG_PRICE_BANDS = getattr(settings, "CATALOG_PRICE_BANDS", (0, 1000, 5000, 20000, 100000))
+
+TRUE_VALUES = ("true", "1", "yes")
+FALSE_VALUES = ("false", "0", "no")
+
+
+def parse_decimal(value, name):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a number."})
+    if not number.is_finite() or number < 0:
+        raise ValidationError({name: "Must be a positive number."})
+    return number
+
+
+def parse_bool(value, name):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError({name: "Must be 'true' or 'false'."})
+
+
+class ListingFilter:
+    """Rating filter and sorts shared by every listing."""
+    sorts = {
+        "recent": ("-created", "id"),
+        "rating": RatedModel.RATING_ORDERING,
+    }
+    default_sort = "recent"
+    parameters = [
+        OpenApiParameter("sort", str, enum=list(sorts), description="Newest first (default), or best rated first."),
+        OpenApiParameter("min_rating", float, description=f"Only items whose average rating is at least this ({MIN_STARS}-{MAX_STARS})."),
+    ]
+
+    def __init__(self, params):
+        self.params = params
+
+    def filter(self, queryset):
+        if self.params.get("min_rating"):
+            try:
+                min_rating = float(self.params["min_rating"])
+            except ValueError:
+                min_rating = None
+            if min_rating is None or not MIN_STARS <= min_rating <= MAX_STARS:
+                raise ValidationError({"min_rating": f"Must be a number from {MIN_STARS} to {MAX_STARS}."})
+            queryset = queryset.filter(average_rating__gte=min_rating)
+        return queryset
+
+    def sort(self, queryset):
+        sort = self.params.get("sort", self.default_sort)
+        if sort not in self.sorts:
+            raise ValidationError({"sort": f"Must be one of {', '.join(self.sorts)}."})
+        return queryset.order_by(*self.sorts[sort])
+
+    def facets(self, queryset):
+        return None
+
+
+class CatalogFilter(ListingFilter):
+    """
+    Catalog filters of the marketplace and Taka listings.
+
+    Every product type shares the ``Product`` table, so the filtered queryset
+    is pinned to its own content type: that leads each of the catalog
+    indexes on ``Product`` and lets the category, tag and price conditions
+    and the sort be read from one of them instead of joining every type.
+    """
+    sorts = {
+        **ListingFilter.sorts,
+        "price": ("price", "id"),
+        # Descending on both so the price indexes are read backwards, unsorted
+        "-price": ("-price", "-id"),
+        "effective_price": ("effective_price", "id"),
+        "-effective_price": ("-effective_price", "-id"),
+    }
+    parameters = [
+        OpenApiParameter(
+            "sort", str, enum=list(sorts),
+            description="Newest first (default), best rated first, or by price or price after discount, "
+                        "`-` for most expensive first.",
+        ),
+        ListingFilter.parameters[1],
+        OpenApiParameter("category", str, many=True, description="Only these categories."),
+        OpenApiParameter("tag", str, many=True, description="Only these tags."),
+        OpenApiParameter("min_price", float, description="Lowest price."),
+        OpenApiParameter("max_price", float, description="Highest price."),
+        OpenApiParameter("negotiable", bool, description="Only negotiable, or only fixed price, items."),
+        OpenApiParameter("approved", bool, description="Only approved items."),
+    ]
+
+    def filter(self, queryset):
+        params = self.params
+        queryset = super().filter(queryset).filter(
+            polymorphic_ctype=ContentType.objects.get_for_model(queryset.model, for_concrete_model=False)
+        )
+
+        categories = [value for value in params.getlist("category") if value]
+        if categories:
+            queryset = queryset.filter(category__in=categories)
+        tags = [value for value in params.getlist("tag") if value]
+        if tags:
+            queryset = queryset.filter(tag__in=tags)
+        if params.get("min_price"):
+            queryset = queryset.filter(price__gte=parse_decimal(params["min_price"], "min_price"))
+        if params.get("max_price"):
+            queryset = queryset.filter(price__lte=parse_decimal(params["max_price"], "max_price"))
+        if params.get("negotiable"):
+            queryset = queryset.filter(negotiable=parse_bool(params["negotiable"], "negotiable"))
+        if params.get("approved") and parse_bool(params["approved"], "approved"):
+            queryset = queryset.filter(approved=True)
+        return queryset
+
+    def facets(self, queryset):
+        """
+        Category, tag, negotiable and price band counts of ``queryset``. One
+        query groups the rows by all four at once and the groups are summed
+        into each facet here, there are only as many as distinct combinations.
+        """
+        bands = list(CATALOG_PRICE_BANDS)
+        price_band = Case(
+            *(When(price__gte=low, then=Value(index)) for index, low in reversed(list(enumerate(bands)))),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        groups = (
+            queryset.order_by()
+            .values("category", "tag", "negotiable", band=price_band)
+            .annotate(count=Count("pk"))
+        )
+
+        categories, tags, negotiable, band_counts = {}, {}, {"true": 0, "false": 0}, [0] * len(bands)
+        total = 0
+        for group in groups:
+            count = group["count"]
+            total += count
+            categories[group["category"]] = categories.get(group["category"], 0) + count
+            tags[group["tag"]] = tags.get(group["tag"], 0) + count
+            negotiable["true" if group["negotiable"] else "false"] += count
+            band_counts[group["band"]] += count
+
+        def ranked(counts):
+            return [
+                {"value": value, "count": count}
+                for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            ]
+
+        return {
+            "total": total,
+            "category": ranked(categories),
+            "tag": ranked(tags),
+            "negotiable": negotiable,
+            "price": [
+                {"min": low, "max": bands[index + 1] if index + 1 < len(bands) else None, "count": band_counts[index]}
+                for index, low in enumerate(bands)
+            ],
+        }
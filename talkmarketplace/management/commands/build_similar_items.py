@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from talkmarketplace.similarity import build_similar_items
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the similar items shown on product and service pages from "
+        "the TF-IDF cosine similarity of their catalog text."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--neighbours", type=int, default=10,
+            help="Similar items kept per item (default: 10).",
+        )
+        parser.add_argument(
+            "--features", type=int, default=2 ** 20,
+            help="Columns terms are hashed into (default: 1048576).",
+        )
+        parser.add_argument(
+            "--max-df", type=float, default=0.2,
+            help="Ignore terms found in more than this share of items (default: 0.2).",
+        )
+        parser.add_argument(
+            "--max-df-entries", type=int, default=2000,
+            help="Ignore terms found in more than this many items, which bounds the build time (default: 2000).",
+        )
+        parser.add_argument(
+            "--min-score", type=float, default=0.05,
+            help="Least cosine similarity for an item to count as similar (default: 0.05).",
+        )
+        parser.add_argument(
+            "--memory", type=int, default=512,
+            help="Megabytes the build may allocate, the interpreter aside. The TF-IDF matrices take a "
+                 "share that grows with the catalog, blocks of rows get the rest (default: 512).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            entries, written = build_similar_items(
+                neighbours=options["neighbours"],
+                features=options["features"],
+                max_df=options["max_df"],
+                max_df_entries=options["max_df_entries"],
+                min_score=options["min_score"],
+                memory_mb=options["memory"],
+                log=lambda message: self.stdout.write(f"[{time.perf_counter() - started:.1f}s] {message}"),
+            )
+        except ValueError as error:
+            # The budget cannot hold the matrices
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} similar items for {entries} entries in {time.perf_counter() - started:.1f}s"
+        ))
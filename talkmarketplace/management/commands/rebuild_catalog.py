@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from talkmarketplace.models import CatalogEntry, catalog_sources
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-copy every marketplace product, Taka product and service into the "
+        "catalog search table and drop entries whose source row is gone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of entries written per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for kind, model in catalog_sources.items():
+            batch, indexed = [], 0
+            for instance in model._default_manager.order_by("pk").iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) == batch_size:
+                    indexed += self.index(kind, batch)
+                    batch = []
+            indexed += self.index(kind, batch)
+
+            stale, _ = (
+                CatalogEntry.objects.filter(kind=kind)
+                .exclude(object_id__in=model._default_manager.values("pk"))
+                .delete()
+            )
+            self.stdout.write(f"{kind}: {indexed} entries written, {stale} stale entries removed")
+        self.stdout.write(self.style.SUCCESS("Catalog rebuilt"))
+
+    def index(self, kind, instances):
+        if instances:
+            with transaction.atomic():
+                CatalogEntry.index(kind, instances)
+        return len(instances)
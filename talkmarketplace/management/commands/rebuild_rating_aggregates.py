@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from talkmarketplace.models import (
+    MarketPlaceProduct, MarketPlaceProductReview, Service, ServiceReview, TakaProduct, TakaReview,
+)
+from talkmarketplace.ratings import MAX_STARS, MIN_STARS
+
+# (reviewable model, review model, review field pointing at it)
+REVIEWED = (
+    (MarketPlaceProduct, MarketPlaceProductReview, "product"),
+    (TakaProduct, TakaReview, "product"),
+    (Service, ServiceReview, "service"),
+)
+
+
+def _aggregate_of(reviews, parent_field, aggregate):
+    """Correlated ``aggregate`` over the reviews of the outer row."""
+    value = (
+        reviews.filter(**{parent_field: OuterRef("pk")})
+        .order_by()
+        .values(parent_field)
+        .annotate(total=aggregate)
+        .values("total")
+    )
+    return Coalesce(Subquery(value, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute the rating sums, counts and star histograms of products and services to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of rows updated per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model, review_model, parent_field in REVIEWED:
+            # Out of range ratings from before the validator count as the
+            # nearest star, as the review signals count them
+            reviews = review_model.objects.annotate(stars=Least(Greatest("rating", MIN_STARS), MAX_STARS))
+            aggregates = {
+                "rating_sum": _aggregate_of(reviews, parent_field, Sum("stars")),
+                "rating_count": _aggregate_of(reviews, parent_field, Count("pk")),
+            }
+            for stars in range(MIN_STARS, MAX_STARS + 1):
+                aggregates[f"stars_{stars}"] = _aggregate_of(
+                    reviews, parent_field, Count("pk", filter=Q(stars=stars))
+                )
+
+            ids = list(model._default_manager.order_by("pk").values_list("pk", flat=True))
+            for start in range(0, len(ids), batch_size):
+                # Short transactions keep row locks brief on a live table
+                with transaction.atomic():
+                    model._default_manager.filter(pk__in=ids[start:start + batch_size]).update(**aggregates)
+
+            self.stdout.write(f"{model._meta.label}: rebuilt ratings of {len(ids)} rows")
+        self.stdout.write(self.style.SUCCESS("Rating aggregates rebuilt"))
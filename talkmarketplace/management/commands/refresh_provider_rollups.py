@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from talkmarketplace.rollups import refresh_provider_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the provider dashboard's daily rollups for the providers and "
+        "days that changed since the last run. Meant to run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Recompute every day of every provider, e.g. to account for deletions.",
+        )
+
+    def handle(self, *args, **options):
+        written = refresh_provider_rollups(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"{written} provider days refreshed"))
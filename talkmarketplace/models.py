@@ -1,13 +1,27 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf
+from django.db.models.signals import post_delete, post_save
 from django.conf import settings
-from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
 from utils.models import ModelUtilsMixin
+from utils.polymorphic import FastPathManager
+from utils.images import register_image_variants, variant_url
+from utils.uploads import register_upload_target
+from .ratings import MAX_STARS, MIN_STARS, register_rating_aggregates
+from utils.custom_enums import UserRole
 # from utils.custom_enums import ProductSize, ProductTags, StockId
 from polymorphic.models import PolymorphicModel
 
+# Rank catalog search by trigram similarity of titles too, which needs the
+# pg_trgm extension (created before migrating, see apps.py)
+CATALOG_SEARCH_TRIGRAM = getattr(settings, "CATALOG_SEARCH_TRIGRAM", True)
+
 def marketplace_image_upload_path(instance, filename):
     return f"products/marketplace/imgs/{instance.product.user.talk_id}/{slugify(instance.product.name)}-{filename}"
 
@@ -26,6 +40,47 @@ def services_image_upload_path(instance, filename):
 def services_video_upload_path(instance, filename):
     return f"services/vids/{instance.service.user.talk_id}/{slugify(instance.service.title)}-{filename}"
 
+class RatedModel(models.Model):
+    """
+    Review aggregates kept by ``register_rating_aggregates()``. The average is
+    computed by Postgres on write, so rating sorts and filters use an index.
+    """
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+    # 0 until the first review
+    average_rating = models.GeneratedField(
+        expression=Coalesce(
+            Cast("rating_sum", models.FloatField()) / NullIf(F("rating_count"), 0),
+            Value(0.0),
+        ),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
+
+    # Each model indexes ("-average_rating", <its pk>) to serve this
+    RATING_ORDERING = ("-average_rating", "id")
+
+    class Meta:
+        abstract = True
+
+    def get_average_rating(self):
+        return self.average_rating
+
+    def get_review_count(self):
+        return self.rating_count
+
+    def rating_profile(self):
+        return {
+            "average": round(self.average_rating or 0, 2),
+            "count": self.rating_count,
+            "stars": {stars: getattr(self, f"stars_{stars}") for stars in range(MIN_STARS, MAX_STARS + 1)},
+        }
+
 class Product(ModelUtilsMixin, PolymorphicModel):
     """
     Base model for products in the marketplace.
@@ -40,27 +95,82 @@ class Product(ModelUtilsMixin, PolymorphicModel):
     discount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], null=False,  default=0.00)
     negotiable = models.BooleanField(default=False)
     approved = models.BooleanField(default=False)
+    # What the buyer pays, never below zero. Stored so price sorts read an index
+    effective_price = models.GeneratedField(
+        expression=Greatest(F("price") - F("discount"), Value(0)),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
 
+    objects = FastPathManager()
 
-
-class MarketPlaceProduct(Product):
+    class Meta:
+        # Catalog browsing, see filters.CatalogFilter. Each product type's
+        # listing is pinned to its content type, which leads every index
+        indexes = [
+            models.Index(fields=["polymorphic_ctype", "-created", "id"], name="product_recent_idx"),
+            models.Index(fields=["polymorphic_ctype", "price", "id"], name="product_price_idx"),
+            models.Index(fields=["polymorphic_ctype", "category", "-created", "id"], name="product_category_recent_idx"),
+            models.Index(fields=["polymorphic_ctype", "category", "price", "id"], name="product_category_price_idx"),
+            # Read forwards for cheapest first, backwards for most expensive
+            models.Index(fields=["polymorphic_ctype", "effective_price", "id"], name="product_eff_price_idx"),
+            models.Index(
+                fields=["polymorphic_ctype", "category", "effective_price", "id"], name="product_category_eff_price_idx"
+            ),
+            models.Index(fields=["polymorphic_ctype", "tag", "-created", "id"], name="product_tag_recent_idx"),
+        ]
+
+    # Reverse relations product_profile() reads, set by each subclass
+    PROFILE_PREFETCH = ()
+
+    @classmethod
+    def profile_queryset(cls, queryset=None):
+        """
+        ``queryset`` with everything ``product_profile()`` reads loaded up
+        front: the owner joined in, and images, videos and reviews fetched
+        with one query each for the whole page rather than per product.
+        """
+        if queryset is None:
+            queryset = cls.objects.fast_path()
+        return queryset.select_related("user").prefetch_related(*cls.PROFILE_PREFETCH)
+
+    @staticmethod
+    def profiles(product_ids, image_size="medium"):
+        """
+        Profiles of the products in ``product_ids`` whatever their type, in
+        that order, at a fixed number of queries per product type.
+        """
+        found = {}
+        for model in (MarketPlaceProduct, TakaProduct):
+            for product in model.profile_queryset().filter(pk__in=product_ids):
+                found[product.pk] = product.product_profile(image_size=image_size)
+        return [found[pk] for pk in product_ids if pk in found]
+
+
+class MarketPlaceProduct(RatedModel, Product):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=False, related_name='marketplace_products')
 
+    PROFILE_PREFETCH = ("marketplace_images", "marketplace_videos", "marketplace_reviews")
+
     class Meta:
         ordering = ["-created", "-updated"]
+        indexes = [
+            # product_ptr is the id, child tables have no id column of their own
+            models.Index(fields=["-average_rating", "product_ptr"], name="marketplace_rating_idx"),
+        ]
 
     def __str__(self):
         return str(self.name)
 
     def save(self, *args, **kwargs):
-        if eval(self.user.user_role)[0] != 'service providers':
+        if self.user.user_role != UserRole.SERVICE_PROVIDERS[0]:
             raise ValueError("Only service providers can create products.")
         if not self.slug and self.id:  # id exists
             self.slug = f"{slugify(self.name)}-{self.id}"
         super().save(*args, **kwargs)
 
 
-    def product_profile(self):
+    def product_profile(self, image_size="medium"):
             return {
                 "id": self.id,
                 "name": self.name,
@@ -70,9 +180,11 @@ class MarketPlaceProduct(Product):
                 "tag": self.tag,
                 "price": str(self.price),
                 "discount": str(self.discount),
-                "images": self.get_images(),
+                "effective_price": str(self.effective_price),
+                "images": self.get_images(image_size),
                 "videos": self.get_videos(),
                 "reviews": self.get_reviews(),
+                "rating": self.rating_profile(),
                 "created_by": str(self.user.first_name) + " " + str(self.user.last_name),
                 "created": self.created.strftime("%Y-%m-%d %H:%M:%S"),
                 "updated": self.updated.strftime("%Y-%m-%d %H:%M:%S"),
@@ -81,10 +193,21 @@ class MarketPlaceProduct(Product):
 
     def get_absolute_url(self):
         return reverse('marketplace_product_detail', kwargs={'slug': self.slug})
+
+    def catalog_document(self):
+        return {
+            "user_id": self.user_id,
+            "slug": self.slug,
+            "title": self.name,
+            "description": self.description,
+            "category": self.category,
+            "tag": self.tag,
+            "price": self.price,
+        }
     
 
-    def get_images(self):
-        return [image.image.url for image in self.marketplace_images.all() if image.image]
+    def get_images(self, size="medium"):
+        return [variant_url(image.image, image.image_variants, size) for image in self.marketplace_images.all() if image.image]
 
     def get_videos(self):
         return [video.video_path.url for video in self.marketplace_videos.all() if video.video_path]
@@ -92,19 +215,10 @@ class MarketPlaceProduct(Product):
     def get_reviews(self):
         return [review.comment for review in self.marketplace_reviews.all() if review.comment]
 
-    def get_average_rating(self):
-        if self.marketplace_reviews.exists():
-            total_rating = sum(review.rating for review in self.marketplace_reviews.all())
-            return total_rating / self.get_review_count()
-        return 0
-
-    def get_review_count(self):
-        return self.marketplace_reviews.count()
-
-
 class MarketPlaceProductImage(ModelUtilsMixin):
     product = models.ForeignKey(MarketPlaceProduct, on_delete=models.CASCADE, related_name='marketplace_images')
     image = models.ImageField(upload_to=marketplace_image_upload_path, null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.name}"
@@ -120,16 +234,21 @@ class MarketPlaceProductVideo(ModelUtilsMixin):
 class MarketPlaceProductReview(ModelUtilsMixin):
     product = models.ForeignKey(MarketPlaceProduct, on_delete=models.CASCADE, related_name='marketplace_reviews')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    rating = models.IntegerField(validators=[MinValueValidator(1)])
+    rating = models.IntegerField(validators=[MinValueValidator(MIN_STARS), MaxValueValidator(MAX_STARS)])
     comment = models.TextField(null=True, blank=True)
 
 # Everything TAKA...
 
-class TakaProduct(Product):
+class TakaProduct(RatedModel, Product):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=False, related_name='taka_products')
 
+    PROFILE_PREFETCH = ("taka_images", "taka_videos", "taka_reviews")
+
     class Meta:
         ordering = ["-created", "-updated"]
+        indexes = [
+            models.Index(fields=["-average_rating", "product_ptr"], name="taka_rating_idx"),
+        ]
 
     def __str__(self):
         return str(self.name)
@@ -141,7 +260,7 @@ class TakaProduct(Product):
 
     
 
-    def product_profile(self):
+    def product_profile(self, image_size="medium"):
             return {
                 "id": self.id,
                 "name": self.name,
@@ -150,9 +269,11 @@ class TakaProduct(Product):
                 "tag": self.tag,
                 "price": str(self.price),
                 "discount": str(self.discount),
-                "images": self.get_images(),
+                "effective_price": str(self.effective_price),
+                "images": self.get_images(image_size),
                 "videos": self.get_videos(),
                 "reviews": self.get_reviews(),
+                "rating": self.rating_profile(),
                 "created_by": str(self.user.first_name) + " " + str(self.user.last_name),
                 "created": self.created.strftime("%Y-%m-%d %H:%M:%S"),
                 "updated": self.updated.strftime("%Y-%m-%d %H:%M:%S"),
@@ -161,10 +282,21 @@ class TakaProduct(Product):
 
     def get_absolute_url(self):
         return reverse('product_detail', kwargs={'slug': self.slug})
+
+    def catalog_document(self):
+        return {
+            "user_id": self.user_id,
+            "slug": self.slug,
+            "title": self.name,
+            "description": self.description,
+            "category": self.category,
+            "tag": self.tag,
+            "price": self.price,
+        }
     
 
-    def get_images(self):
-        return [image.image.url for image in self.taka_images.all() if image.image]
+    def get_images(self, size="medium"):
+        return [variant_url(image.image, image.image_variants, size) for image in self.taka_images.all() if image.image]
 
     def get_videos(self):
         return [video.video_path.url for video in self.taka_videos.all() if video.video_path]
@@ -172,18 +304,10 @@ class TakaProduct(Product):
     def get_reviews(self):
         return [review.comment for review in self.taka_reviews.all() if review.comment]
 
-    def get_average_rating(self):
-        if self.taka_reviews.exists():
-            total_rating = sum(review.rating for review in self.taka_reviews.all())
-            return total_rating / self.get_review_count()
-        return 0
-
-    def get_review_count(self):
-        return self.taka_reviews.count()
-
 class TakaProductImage(ModelUtilsMixin):
     product = models.ForeignKey(TakaProduct, on_delete=models.CASCADE, related_name='taka_images')
     image = models.ImageField(upload_to=taka_image_upload_path, null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.name}"
@@ -199,13 +323,13 @@ class TakaProductVideo(ModelUtilsMixin):
 class TakaReview(ModelUtilsMixin):
     product = models.ForeignKey(TakaProduct, on_delete=models.CASCADE, related_name='taka_reviews')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    rating = models.IntegerField(validators=[MinValueValidator(1)])
+    rating = models.IntegerField(validators=[MinValueValidator(MIN_STARS), MaxValueValidator(MAX_STARS)])
     comment = models.TextField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created", "-updated"]
 
-class Service(ModelUtilsMixin):
+class Service(RatedModel, ModelUtilsMixin):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='services')
     slug = models.SlugField(unique=True, null=False, blank=True)
     title = models.CharField(max_length=255, null=False)
@@ -213,18 +337,30 @@ class Service(ModelUtilsMixin):
     flat_rate = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], null=False,  default=0.00)
     negotiable = models.BooleanField(default=False)
 
+    PROFILE_PREFETCH = ("service_images", "service_videos", "service_reviews")
+
     class Meta:
         ordering = ["-created", "-updated"]
+        indexes = [
+            models.Index(fields=["-average_rating", "id"], name="service_rating_idx"),
+        ]
 
     def __str__(self):
         return str(self.title)
+
+    @classmethod
+    def profile_queryset(cls, queryset=None):
+        """``queryset`` with everything ``service_profile()`` reads loaded up front."""
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.select_related("user").prefetch_related(*cls.PROFILE_PREFETCH)
     
     def save(self, *args, **kwargs):
         if not self.slug and self.id:  # id exists
             self.slug = f"{slugify(self.title)}-{self.id}"
         super().save(*args, **kwargs)
 
-    def service_profile(self):
+    def service_profile(self, image_size="medium"):
         return {
             "id": self.id,
             "title": self.title,
@@ -232,16 +368,28 @@ class Service(ModelUtilsMixin):
             "description": self.description,
             "flat_rate": str(self.flat_rate),
             "negotiable": str(self.negotiable),
-            "images": self.get_images(),
+            "images": self.get_images(image_size),
             "videos": self.get_videos(),
             "reviews": self.get_reviews(),
+            "rating": self.rating_profile(),
             "created_by": str(self.user.first_name) + " " + str(self.user.last_name),
             "created": self.created.strftime("%Y-%m-%d %H:%M:%S"),
             "updated": self.updated.strftime("%Y-%m-%d %H:%M:%S"),
-        }    
+        }
 
-    def get_images(self):
-        return [image.image.url for image in self.service_images.all() if image.image]
+    def catalog_document(self):
+        return {
+            "user_id": self.user_id,
+            "slug": self.slug,
+            "title": self.title,
+            "description": self.description,
+            "category": "",
+            "tag": "",
+            "price": self.flat_rate,
+        }
+
+    def get_images(self, size="medium"):
+        return [variant_url(image.image, image.image_variants, size) for image in self.service_images.all() if image.image]
 
     def get_videos(self):
         return [video.video_path.url for video in self.service_videos.all() if video.video_path]
@@ -249,18 +397,10 @@ class Service(ModelUtilsMixin):
     def get_reviews(self):
         return [review.comment for review in self.service_reviews.all() if review.comment]
 
-    def get_average_rating(self):
-        if self.service_reviews.exists():
-            total_rating = sum(review.rating for review in self.service_reviews.all())
-            return total_rating / self.get_review_count()
-        return 0
-
-    def get_review_count(self):
-        return self.service_reviews.count()
-
 class ServicesImage(ModelUtilsMixin):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='service_images')
     image = models.ImageField(upload_to=services_image_upload_path, null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.service.title}"
@@ -277,22 +417,60 @@ class ServicesVideo(ModelUtilsMixin):
 class ServiceReview(ModelUtilsMixin):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='service_reviews')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    rating = models.IntegerField(validators=[MinValueValidator(1)])
+    rating = models.IntegerField(validators=[MinValueValidator(MIN_STARS), MaxValueValidator(MAX_STARS)])
     comment = models.TextField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created", "-updated"]
 
 class SavedItem(ModelUtilsMixin):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    product = models.ManyToManyField(Product, related_name='saved_items')
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    product = models.ManyToManyField(Product, related_name='saved_items', through="SavedProduct")
+
+    # Newest saves first, backed by saved_product_list_idx
+    LIST_ORDERING = ("-created", "-id")
 
     class Meta:
         ordering = ["-created", "-updated"]
 
     def __str__(self):
         return f"{self.user.username}'s saved items"
-    
+
+    @classmethod
+    def for_user(cls, user_obj):
+        """
+        The user's saved list, created on first use. Created with INSERT ...
+        ON CONFLICT DO NOTHING, so two first saves at once do not both try to
+        create it the way get_or_create() would.
+        """
+        saved_item = cls.objects.filter(user=user_obj).first()
+        if saved_item is None:
+            cls.objects.bulk_create([cls(user=user_obj)], ignore_conflicts=True)
+            saved_item = cls.objects.get(user=user_obj)
+        return saved_item
+
+    @staticmethod
+    def entries_of(user_obj):
+        return SavedProduct.objects.filter(saveditem__user=user_obj)
+
+    @classmethod
+    def save_for(cls, user_obj, product_id):
+        """Saves a product for the user. Saving it again changes nothing."""
+        SavedProduct.objects.bulk_create(
+            [SavedProduct(saveditem=cls.for_user(user_obj), product_id=product_id)], ignore_conflicts=True
+        )
+
+    @classmethod
+    def unsave_for(cls, user_obj, product_id):
+        """Removes a product from the user's saved list. Returns False if it was not there."""
+        deleted, _ = cls.entries_of(user_obj).filter(product_id=product_id).delete()
+        return bool(deleted)
+
+    @classmethod
+    def saved_among(cls, user_obj, product_ids):
+        """Which of ``product_ids`` the user has saved, in one query."""
+        return set(cls.entries_of(user_obj).filter(product_id__in=product_ids).values_list("product_id", flat=True))
+
     def save_item(self, product):
         self.product.add(product)
     
@@ -309,7 +487,8 @@ class SavedItem(ModelUtilsMixin):
         return self.product.filter(id=product.id).exists()
     
     def get_user_saved_items(self):
-        return self.product.filter(saved_items__user=self.user)
+        # Every product on this list belongs to this user already
+        return self.product.all()
 
     def get_saved_item_count(self):
         return self.product.count()
@@ -318,4 +497,203 @@ class SavedItem(ModelUtilsMixin):
         return [item.product_profile() for item in self.product.all()]
     
     def get_saved_item_by_id(self, product_id):
-        return self.product.filter(id=product_id).first().product_profile() if self.product.filter(id=product_id).exists() else None
+        product = self.product.filter(id=product_id).first()
+        return product.product_profile() if product is not None else None
+
+class SavedProduct(models.Model):
+    """
+    A product on a saved list, and when it was saved. Keeps the table and
+    columns of the plain many-to-many it replaced, plus the timestamp.
+    """
+    saveditem = models.ForeignKey(SavedItem, on_delete=models.CASCADE, related_name="entries")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="saves")
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "talkmarketplace_saveditem_product"
+        constraints = [
+            models.UniqueConstraint(fields=["saveditem", "product"], name="unique_saved_product"),
+        ]
+        indexes = [
+            models.Index(fields=["saveditem", "-created", "-id"], name="saved_product_list_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} saved on {self.saveditem_id}"
+
+
+class CatalogEntry(ModelUtilsMixin):
+    """
+    One row per marketplace product, Taka product and service, copied from
+    the source row on every save so the three can be searched and paged
+    through together. Kept in step by ``register_catalog()``, rebuilt by the
+    ``rebuild_catalog`` command.
+    """
+    class Kind(models.TextChoices):
+        MARKETPLACE = "marketplace", "Marketplace"
+        TAKA = "taka", "Taka"
+        SERVICE = "service", "Service"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.UUIDField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="catalog_entries")
+    slug = models.SlugField(max_length=255, blank=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    category = models.CharField(max_length=225, blank=True)
+    tag = models.CharField(max_length=225, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config="english")
+            + SearchVector("category", "tag", weight="B", config="english")
+            + SearchVector("description", weight="C", config="english")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    DOCUMENT_FIELDS = ("user", "slug", "title", "description", "category", "tag", "price")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_catalog_entry"),
+        ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="catalog_search_idx"),
+        ] + ([
+            # Typo-tolerant title matches, the % operator of pg_trgm
+            GinIndex(fields=["title"], opclasses=["gin_trgm_ops"], name="catalog_title_trgm_idx"),
+        ] if CATALOG_SEARCH_TRIGRAM else [])
+
+    def __str__(self):
+        return f"{self.kind}: {self.title}"
+
+    @classmethod
+    def index(cls, kind, instances):
+        """Inserts or refreshes the entries of ``instances`` in one statement."""
+        cls.objects.bulk_create(
+            [cls(kind=kind, object_id=instance.pk, **instance.catalog_document()) for instance in instances],
+            update_conflicts=True,
+            unique_fields=["kind", "object_id"],
+            update_fields=[*cls.DOCUMENT_FIELDS, "updated"],
+        )
+
+    @classmethod
+    def unindex(cls, kind, object_ids):
+        cls.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+    def entry_profile(self):
+        return {
+            "type": self.kind,
+            "id": self.object_id,
+            "slug": self.slug,
+            "title": self.title,
+            "description": self.description,
+            "category": self.category,
+            "tag": self.tag,
+            "price": str(self.price),
+            "created_by": str(self.user.first_name) + " " + str(self.user.last_name),
+        }
+
+class SimilarItem(models.Model):
+    """
+    One of a catalog entry's nearest neighbours by text similarity, ``rank``
+    1 being the closest. Built offline by the ``build_similar_items``
+    command, see talkmarketplace.similarity.
+    """
+    entry = models.ForeignKey(CatalogEntry, on_delete=models.CASCADE, related_name="similar_items")
+    similar = models.ForeignKey(CatalogEntry, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also the index neighbours_of() reads
+            models.UniqueConstraint(fields=["entry", "rank"], name="unique_similar_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.similar_id} #{self.rank} for {self.entry_id}"
+
+    @classmethod
+    def neighbours_of(cls, kind, object_id):
+        """Profiles of the items most like ``object_id``, closest first, in one query."""
+        neighbours = (
+            cls.objects.filter(entry__kind=kind, entry__object_id=object_id)
+            .select_related("similar__user")
+            .order_by("rank")
+        )
+        return [{**neighbour.similar.entry_profile(), "score": round(neighbour.score, 3)} for neighbour in neighbours]
+
+class ProviderDailyStats(ModelUtilsMixin):
+    """
+    What one provider's listings drew on one day: new listings, saves,
+    reviews and detail views. Rolled up from the source tables by the
+    ``refresh_provider_rollups`` command, see talkmarketplace.rollups, so the
+    dashboard reads one row per day instead of scanning every listing.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    listings = models.PositiveIntegerField(default=0)
+    saves = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    views = models.PositiveBigIntegerField(default=0)
+
+    METRICS = ("listings", "saves", "reviews", "rating_sum", "views")
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            # Also the index the dashboard's date range reads
+            models.UniqueConstraint(fields=["user", "day"], name="unique_provider_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} on {self.day}"
+
+    @staticmethod
+    def average_of(rating_sum, reviews):
+        return round(rating_sum / reviews, 2) if reviews else None
+
+    def stats_profile(self):
+        return {
+            "day": self.day.strftime("%Y-%m-%d"),
+            "listings": self.listings,
+            "saves": self.saves,
+            "reviews": self.reviews,
+            "average_rating": self.average_of(self.rating_sum, self.reviews),
+            "views": self.views,
+        }
+
+# kind -> model of the rows catalogued under it
+catalog_sources = {}
+
+def register_catalog(model, kind):
+    """Keeps the catalog entries of ``model`` in step as its rows are saved and deleted."""
+    def catalog_saved(sender, instance, raw=False, **kwargs):
+        if not raw:
+            CatalogEntry.index(kind, [instance])
+
+    def catalog_deleted(sender, instance, **kwargs):
+        CatalogEntry.unindex(kind, [instance.pk])
+
+    uid = f"catalog:{model._meta.label}"
+    post_save.connect(catalog_saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(catalog_deleted, sender=model, weak=False, dispatch_uid=uid)
+    catalog_sources[kind] = model
+
+
+register_image_variants(MarketPlaceProductImage, "image")
+register_image_variants(TakaProductImage, "image")
+register_image_variants(ServicesImage, "image")
+register_rating_aggregates(MarketPlaceProductReview, "product")
+register_rating_aggregates(TakaReview, "product")
+register_rating_aggregates(ServiceReview, "service")
+register_catalog(MarketPlaceProduct, CatalogEntry.Kind.MARKETPLACE)
+register_catalog(TakaProduct, CatalogEntry.Kind.TAKA)
+register_catalog(Service, CatalogEntry.Kind.SERVICE)
+register_upload_target("marketplace_video", MarketPlaceProductVideo, "product", "video_path")
+register_upload_target("taka_video", TakaProductVideo, "product", "video_path")
+register_upload_target("service_video", ServicesVideo, "service", "video_path")
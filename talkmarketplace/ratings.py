@@ -0,0 +1,87 @@
+"""
+Denormalized rating aggregates.
+
+Reviewable models carry ``rating_sum``, ``rating_count`` and a ``stars_<n>``
+histogram (see ``RatedModel``). ``register_rating_aggregates()`` keeps them in
+step with a review model: every review written or deleted moves the counters
+with one UPDATE of F() expressions, so concurrent reviews never overwrite
+each other's totals and nothing has to sum the reviews again.
+"""
+from django.db.models import F, Value
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+MIN_STARS = 1
+MAX_STARS = 5
+
+
+def _stars(rating):
+    return min(max(int(rating), MIN_STARS), MAX_STARS)
+
+
+def rating_deltas(rating, sign):
+    """The counter changes one review of ``rating`` makes, ``sign`` 1 to add it or -1 to remove it."""
+    return {
+        "rating_sum": sign * _stars(rating),
+        "rating_count": sign,
+        f"stars_{_stars(rating)}": sign,
+    }
+
+
+def apply_rating_deltas(model, pk, *deltas):
+    """Folds the counter changes in ``deltas`` into one UPDATE of ``model`` row ``pk``."""
+    merged = {}
+    for delta in deltas:
+        for field, change in delta.items():
+            merged[field] = merged.get(field, 0) + change
+    updates = {field: F(field) + Value(change) for field, change in merged.items() if change}
+    if updates:
+        model._default_manager.filter(pk=pk).update(**updates)
+
+
+def register_rating_aggregates(review_model, parent_field):
+    """
+    Keeps the aggregates on ``review_model.<parent_field>`` current as
+    reviews are created, re-rated, moved or deleted.
+    """
+    field = review_model._meta.get_field(parent_field)
+    # remote_field rather than related_model, which needs the app registry ready
+    parent_model, parent_attname = field.remote_field.model, field.attname
+    uid = f"rating_aggregates:{review_model._meta.label}"
+
+    def remember_rating(sender, instance, **kwargs):
+        # What the row held in the database, to undo on update or delete.
+        # Read from __dict__ so deferred fields are not loaded one row at a time
+        saved = (instance.__dict__.get(parent_attname), instance.__dict__.get("rating"))
+        if None not in saved:
+            instance._saved_rating = saved
+
+    def load_rating(sender, instance, raw=False, **kwargs):
+        if raw or instance._state.adding or hasattr(instance, "_saved_rating"):
+            return
+        saved = sender._default_manager.filter(pk=instance.pk).values_list(parent_attname, "rating").first()
+        if saved is not None:
+            instance._saved_rating = saved
+
+    def review_saved(sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        parent_id, rating = getattr(instance, parent_attname), instance.rating
+        saved = None if created else getattr(instance, "_saved_rating", None)
+        if saved == (parent_id, rating):
+            return
+        if saved is None or saved[0] != parent_id:
+            if saved is not None:
+                apply_rating_deltas(parent_model, saved[0], rating_deltas(saved[1], -1))
+            apply_rating_deltas(parent_model, parent_id, rating_deltas(rating, 1))
+        else:
+            apply_rating_deltas(parent_model, parent_id, rating_deltas(saved[1], -1), rating_deltas(rating, 1))
+        instance._saved_rating = (parent_id, rating)
+
+    def review_deleted(sender, instance, **kwargs):
+        parent_id, rating = getattr(instance, "_saved_rating", None) or (getattr(instance, parent_attname), instance.rating)
+        apply_rating_deltas(parent_model, parent_id, rating_deltas(rating, -1))
+
+    post_init.connect(remember_rating, sender=review_model, weak=False, dispatch_uid=uid)
+    pre_save.connect(load_rating, sender=review_model, weak=False, dispatch_uid=uid)
+    post_save.connect(review_saved, sender=review_model, weak=False, dispatch_uid=uid)
+    post_delete.connect(review_deleted, sender=review_model, weak=False, dispatch_uid=uid)
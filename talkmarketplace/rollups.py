@@ -0,0 +1,140 @@
+"""
+Daily per-provider rollups behind the provider dashboard.
+
+``refresh_provider_rollups()`` looks for what changed since its watermark:
+listings created, products saved, reviews written or re-rated, and view
+counters flushed (utils.viewcounts). Each change marks its provider and day
+as touched, and only those ``ProviderDailyStats`` rows are recomputed from
+the source tables, a day at a time. Recomputing rather than adding deltas
+keeps the rows right however often a run is repeated or interrupted.
+
+Deleted listings, reviews and saves leave no trace to look for, so the days
+they belonged to keep their old numbers until something else touches them
+or the rollups are rebuilt in full.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from utils.models import RollupWatermark, ViewCounter
+from .models import (
+    MarketPlaceProduct, MarketPlaceProductReview, ProviderDailyStats, SavedProduct, Service, ServiceReview,
+    TakaProduct, TakaReview,
+)
+
+ROLLUP_NAME = "provider_daily_stats"
+# Rows are read this many seconds behind the clock, so transactions still in
+# flight when a run starts have committed by the time they are read
+PROVIDER_ROLLUP_LAG = getattr(settings, "PROVIDER_ROLLUP_LAG", 60)
+
+# (view counter target, listing model)
+LISTINGS = (("marketplace", MarketPlaceProduct), ("taka", TakaProduct), ("service", Service))
+# (review model, path from a review to its listing's owner)
+REVIEWS = ((MarketPlaceProductReview, "product__user"), (TakaReview, "product__user"), (ServiceReview, "service__user"))
+# Paths from a saved product to its owner, one per product type
+SAVES = ("product__marketplaceproduct__user", "product__takaproduct__user")
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def _view_counters(target, model):
+    """View counters of ``model`` listings, with the listing's owner."""
+    return ViewCounter.objects.filter(target=target).annotate(
+        owner=Subquery(model.objects.filter(pk=OuterRef("object_id")).values("user")[:1])
+    ).filter(owner__isnull=False)
+
+
+def touched_days(since, until):
+    """
+    ``{day: {provider ids}}`` of the rollup rows that changes between
+    ``since`` (None for the beginning) and ``until`` may have moved.
+    """
+    def changed(queryset, field):
+        window = {f"{field}__lt": until}
+        if since is not None:
+            window[f"{field}__gte"] = since
+        return queryset.filter(**window).order_by()
+
+    sources = [
+        changed(model.objects.all(), "created").values(owner=F("user"), on=TruncDate("created"))
+        for _, model in LISTINGS
+    ]
+    sources += [
+        changed(SavedProduct.objects.filter(**{f"{path}__isnull": False}), "created")
+        .values(owner=F(path), on=TruncDate("created"))
+        for path in SAVES
+    ]
+    # updated as well as created, a re-rated review moves its day's rating
+    sources += [
+        changed(review_model.objects.all(), "updated").values(owner=F(path), on=TruncDate("created"))
+        for review_model, path in REVIEWS
+    ]
+    sources += [changed(_view_counters(target, model), "updated").values("owner", on=F("day")) for target, model in LISTINGS]
+
+    touched = {}
+    for source in sources:
+        for row in source.distinct():
+            touched.setdefault(row["on"], set()).add(row["owner"])
+    return touched
+
+
+def day_stats(day, provider_ids):
+    """Recomputes the stats of ``provider_ids`` on ``day`` from the source tables."""
+    start, end = day_bounds(day)
+    stats = {provider_id: dict.fromkeys(ProviderDailyStats.METRICS, 0) for provider_id in provider_ids}
+
+    def add(rows, **metrics):
+        for row in rows:
+            for metric, key in metrics.items():
+                stats[row["owner"]][metric] += row[key] or 0
+
+    for target, model in LISTINGS:
+        listings = model.objects.filter(user__in=provider_ids, created__gte=start, created__lt=end).order_by()
+        add(listings.values(owner=F("user")).annotate(total=Count("pk")), listings="total")
+        views = _view_counters(target, model).filter(day=day, owner__in=provider_ids).order_by()
+        add(views.values("owner").annotate(total=Sum("count")), views="total")
+    for path in SAVES:
+        saves = SavedProduct.objects.filter(
+            **{f"{path}__in": provider_ids}, created__gte=start, created__lt=end
+        ).order_by()
+        add(saves.values(owner=F(path)).annotate(total=Count("pk")), saves="total")
+    for review_model, path in REVIEWS:
+        reviews = review_model.objects.filter(
+            **{f"{path}__in": provider_ids}, created__gte=start, created__lt=end
+        ).order_by()
+        add(
+            reviews.values(owner=F(path)).annotate(total=Count("pk"), rating=Sum("rating")),
+            reviews="total", rating_sum="rating",
+        )
+    return stats
+
+
+def refresh_provider_rollups(full=False):
+    """
+    Brings ``ProviderDailyStats`` up to date with the source tables and moves
+    the watermark. With ``full`` every day is recomputed. Returns the number
+    of rows written.
+    """
+    since = None if full else RollupWatermark.position_of(ROLLUP_NAME)
+    until = timezone.now() - datetime.timedelta(seconds=PROVIDER_ROLLUP_LAG)
+    written = 0
+    for day, provider_ids in sorted(touched_days(since, until).items()):
+        stats = day_stats(day, provider_ids)
+        with transaction.atomic():
+            ProviderDailyStats.objects.bulk_create(
+                [ProviderDailyStats(user_id=provider_id, day=day, **values) for provider_id, values in stats.items()],
+                update_conflicts=True,
+                unique_fields=["user", "day"],
+                update_fields=[*ProviderDailyStats.METRICS, "updated"],
+            )
+        written += len(stats)
+    # Only once every touched day is written, an interrupted run starts over
+    RollupWatermark.advance(ROLLUP_NAME, until)
+    return written
@@ -14,7 +14,7 @@ from .models import (
     ServiceReview,
     SavedItem
 )
-from utils.helpers import FormattedDateTimeField
+from utils.helpers import FormattedDateTimeField, refresh_generated_fields
 
 
 class MarketPlaceProductImageSerializer(serializers.ModelSerializer):
@@ -76,6 +76,7 @@ class MarketPlaceProductSerializer(serializers.ModelSerializer):
             "tag",
             "price",
             "discount",
+            "effective_price",
             "images",
             "negotiable",
             "upload_images",   # request only
@@ -84,7 +85,7 @@ class MarketPlaceProductSerializer(serializers.ModelSerializer):
             "created",
             "updated",
         ]
-        read_only_fields = ["id", "slug", "created", "updated", "user", "approved"]
+        read_only_fields = ["id", "slug", "effective_price", "created", "updated", "user", "approved"]
         extra_kwargs = {
             'upload_images': {'required': False}
         }
@@ -101,6 +102,8 @@ class MarketPlaceProductSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         images = validated_data.pop("upload_images", [])
         instance = super().update(instance, validated_data)
+        # effective_price follows price and discount in the database
+        refresh_generated_fields(instance)
         for img in images:
             MarketPlaceProductImage.objects.create(product=instance, image=img)
         return instance
@@ -122,6 +125,7 @@ class TakaProductSerializer(serializers.ModelSerializer):
             "tag",
             "price",
             "discount",
+            "effective_price",
             "images",
             "negotiable",
             "upload_images",   # request only
@@ -131,7 +135,7 @@ class TakaProductSerializer(serializers.ModelSerializer):
             "updated",
         ]
 
-        read_only_fields = ["id", "slug", "created", "updated", "user", "approved"]
+        read_only_fields = ["id", "slug", "effective_price", "created", "updated", "user", "approved"]
         extra_kwargs = {
             'upload_images': {'required': False}
         }
@@ -148,11 +152,15 @@ class TakaProductSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         images = validated_data.pop("upload_images", [])
         instance = super().update(instance, validated_data)
+        # effective_price follows price and discount in the database
+        refresh_generated_fields(instance)
         for img in images:
             TakaProductImage.objects.create(product=instance, image=img)
         return instance
 
 class SavedItemsSerializer(serializers.ModelSerializer):
+    # The one product to save, the list itself goes through SavedProduct
+    product = serializers.UUIDField(write_only=True)
     created = FormattedDateTimeField(read_only=True)
     updated = FormattedDateTimeField(read_only=True)
 
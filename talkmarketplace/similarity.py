@@ -0,0 +1,251 @@
+"""
+Offline "similar items" neighbours.
+
+``build_similar_items()`` turns the title, description, category and tag of
+every catalog entry (see ``CatalogEntry``) into a TF-IDF vector, finds each
+entry's nearest neighbours by cosine similarity and stores them in
+``SimilarItem``, where a detail view reads them with one indexed lookup.
+
+Terms are hashed straight to one of ``features`` columns, so no vocabulary
+is held. Terms found in a single entry cannot link it to another and terms
+found in most entries tell none apart, both are dropped. The similarity
+matrix is never built whole: a block of rows at a time is multiplied
+against every row and only the top k of each row are kept.
+
+The memory budget covers what the build allocates, not the interpreter and
+Django it runs in: the entry ids, the TF-IDF matrix and its transpose, and
+the write buffer are held throughout, and blocks are cut so the pairs they
+can produce fit in what is left. A budget too small for the held part
+fails up front. With the defaults the held part is about 35MB, plus 16
+bytes per weighted term, plus 117 per entry: ``BYTES_PER_ID`` and the
+entry's row pointer and pair cost. 500k entries of ten weighted terms each
+hold 170MB, and a build of them within 512MB peaked at 450MB over the
+interpreter. Past about a million entries raise the budget too, the blocks
+left over would get too small to run in reasonable time.
+"""
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+from django.db import connection, reset_queries, transaction
+from scipy import sparse
+
+from .models import CatalogEntry, SimilarItem
+
+# Words of two or more letters or digits
+TOKEN = re.compile(r"[^\W_]{2,}")
+# Memory a candidate pair of a block takes at the peak of top_neighbours():
+# its score, column and row, the sort key and order and the sort's scratch.
+# Measured at 32 bytes with every pair kept (min_score=0)
+BYTES_PER_PAIR = 40
+# Memory held per entry: its id, a str of its UUID in a list, measured at 93
+# bytes, and the sparse product's two 4-byte accumulators per column
+BYTES_PER_ID = 101
+# Memory a neighbour row takes while its INSERT statement is built
+BYTES_PER_WRITTEN_ROW = 400
+READ_CHUNK_SIZE = 5000
+WRITE_BATCH_SIZE = 50000
+
+
+def entry_terms(title, description, category, tag):
+    terms = TOKEN.findall(f"{title} {description}".lower())
+    for field, value in (("category", category), ("tag", tag)):
+        if value and value != "None":
+            terms.append(f"{field}:{value.lower()}")
+    return terms
+
+
+def hashed_counts(entries, features):
+    """
+    Term counts of ``entries``, rows of ``(id, title, description, category,
+    tag)``, as a CSR matrix with ``features`` columns. Returns the matrix and
+    the entry ids, as strings, in row order.
+    """
+    ids, indptr, indices, counts = [], array("q", [0]), array("i"), array("f")
+    for entry_id, *text in entries:
+        # hash() only agrees with itself within a process, all one build needs
+        row = Counter(hash(term) % features for term in entry_terms(*text))
+        indices.extend(row.keys())
+        counts.extend(row.values())
+        indptr.append(len(indices))
+        ids.append(str(entry_id))
+    matrix = sparse.csr_matrix(
+        (np.frombuffer(counts, dtype=np.float32), np.frombuffer(indices, dtype=np.int32),
+         np.frombuffer(indptr, dtype=np.int64)),
+        shape=(len(ids), features),
+    )
+    return matrix, ids
+
+
+def row_sums(matrix, values):
+    """Sums ``values``, one per stored entry of ``matrix``, by row. Empty rows sum to 0."""
+    rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int32), np.diff(matrix.indptr))
+    return np.bincount(rows, weights=values, minlength=matrix.shape[0])
+
+
+def tfidf(counts, max_df, max_df_entries):
+    """
+    Turns ``counts`` into unit length TF-IDF rows in place, with sublinear
+    term frequencies. Terms in more than a ``max_df`` share of the rows, or
+    in more than ``max_df_entries`` rows, are dropped. Also returns each
+    column's document frequency, zero where it was dropped.
+    """
+    entries = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    useful = (df >= 2) & (df <= max(2, min(max_df * entries, max_df_entries)))
+    idf = np.where(useful, np.log((1 + entries) / (1 + df)) + 1, 0).astype(np.float32)
+
+    # Step by step in place, so no more than one temporary of the values is
+    # alive beside the matrix
+    np.log(counts.data, out=counts.data)
+    counts.data += 1
+    counts.data *= idf[counts.indices]
+    counts.eliminate_zeros()
+
+    lengths = np.diff(counts.indptr)
+    norms = np.sqrt(row_sums(counts, np.square(counts.data))).astype(np.float32)
+    norms[lengths == 0] = 1
+    counts.data /= np.repeat(norms, lengths)
+    return counts, np.where(useful, df, 0)
+
+
+def pair_costs(matrix, df):
+    """
+    The most pairs each row can produce against the whole matrix: the
+    entries that share one of its terms, the sum of its terms' document
+    frequencies.
+    """
+    return row_sums(matrix, df[matrix.indices]).astype(np.int64)
+
+
+def row_blocks(costs, max_pairs):
+    """``(start, end)`` row ranges whose pair ``costs`` add up to at most ``max_pairs``."""
+    entries = len(costs)
+    reached = np.cumsum(costs)
+    start = 0
+    while start < entries:
+        before = reached[start - 1] if start else 0
+        end = max(int(np.searchsorted(reached, before + max_pairs, side="right")), start + 1)
+        yield start, end
+        start = end
+
+
+def top_neighbours(block, start, transposed, neighbours, min_score):
+    """
+    The ``neighbours`` most similar rows of each row of ``block``, which
+    starts at row ``start``. Returns matrix rows, neighbour rows, ranks from
+    1 and scores, grouped by row, closest first.
+
+    Arrays over the pairs are 32-bit wherever the values fit and each one is
+    dropped as soon as it is used, so a candidate pair takes no more than
+    ``BYTES_PER_PAIR`` at the peak.
+    """
+    product = (block @ transposed).tocsr()
+    lengths = np.diff(product.indptr)
+    rows = np.repeat(np.arange(start, start + block.shape[0], dtype=np.int32), lengths)
+    keep = product.data >= min_score
+    keep &= product.indices != rows
+    rows, columns, scores = rows[keep], product.indices[keep], product.data[keep]
+    del product, keep
+
+    # Rows are whole numbers and scores at most 1, so this sorts by row and
+    # then by descending score in a single pass
+    order = np.argsort(rows * 2.0 - scores, kind="stable")
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    del order
+
+    # Rows are sorted, so each one starts where the counts before it end
+    counts = np.bincount(rows - start, minlength=block.shape[0]).astype(np.int32)
+    firsts = np.cumsum(counts, dtype=np.int32) - counts
+    ranks = np.arange(1, len(rows) + 1, dtype=np.int32) - np.repeat(firsts, counts)
+    keep = ranks <= neighbours
+    return rows[keep], columns[keep], ranks[keep], scores[keep]
+
+
+def matrix_bytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def check_budget(budget, needed, what):
+    if needed > budget:
+        raise ValueError(
+            f"{what} need {needed / 1024 ** 2:.0f}MB, more than the "
+            f"{budget / 1024 ** 2:.0f}MB memory budget. Raise the budget or lower max_df_entries."
+        )
+
+
+def write_neighbours(ids, rows, columns, ranks, scores):
+    """
+    Inserts neighbour rows, ``WRITE_BATCH_SIZE`` per statement. Each column
+    is sent as one array and unnested, which spares building a model
+    instance and a placeholder per value.
+    """
+    table = connection.ops.quote_name(SimilarItem._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            end = start + WRITE_BATCH_SIZE
+            cursor.execute(
+                f"INSERT INTO {table} (entry_id, similar_id, rank, score) "
+                f"SELECT * FROM unnest(%s::uuid[], %s::uuid[], %s::smallint[], %s::double precision[])",
+                [
+                    [ids[row] for row in rows[start:end].tolist()],
+                    [ids[column] for column in columns[start:end].tolist()],
+                    ranks[start:end].tolist(),
+                    scores[start:end].tolist(),
+                ],
+            )
+
+
+def build_similar_items(
+    neighbours=10, features=2 ** 20, max_df=0.2, max_df_entries=2000, min_score=0.05, memory_mb=512, log=None
+):
+    """
+    Recomputes the ``SimilarItem`` neighbours of every catalog entry.
+    Returns the number of entries and of neighbour rows written.
+
+    Capping document frequencies at ``max_df_entries`` caps the pairs each
+    entry can be scored against, so the work grows with the number of
+    entries rather than its square.
+    """
+    log = log or (lambda message: None)
+    budget = memory_mb * 1024 ** 2
+    entries = (
+        CatalogEntry.objects.order_by("id")
+        .values_list("id", "title", "description", "category", "tag")
+        .iterator(chunk_size=READ_CHUNK_SIZE)
+    )
+    counts, ids = hashed_counts(entries, features)
+    if not ids:
+        SimilarItem.objects.all().delete()
+        return 0, 0
+    # tfidf() peaks at about one and a half more copies of the counts
+    check_budget(budget, matrix_bytes(counts) * 5 // 2 + len(ids) * BYTES_PER_ID, "The term counts")
+    matrix, df = tfidf(counts, max_df, max_df_entries)
+    costs = pair_costs(matrix, df)
+    del counts
+
+    # The transpose holds the same values and a row per feature
+    held = (
+        matrix_bytes(matrix) * 2 + (features + 1) * matrix.indptr.itemsize + df.nbytes + costs.nbytes
+        + len(ids) * BYTES_PER_ID + min(WRITE_BATCH_SIZE, len(ids) * neighbours) * BYTES_PER_WRITTEN_ROW
+    )
+    largest = int(costs.max()) * BYTES_PER_PAIR
+    check_budget(budget, held + largest, "The TF-IDF matrices and the largest row")
+    transposed = matrix.T.tocsr()
+    max_pairs = (budget - held) // BYTES_PER_PAIR
+    log(f"{len(ids)} entries, {matrix.nnz} weighted terms, {held / 1024 ** 2:.0f}MB held, "
+        f"{max_pairs * BYTES_PER_PAIR / 1024 ** 2:.0f}MB for blocks")
+
+    written = 0
+    for start, end in row_blocks(costs, max_pairs):
+        rows, columns, ranks, scores = top_neighbours(matrix[start:end], start, transposed, neighbours, min_score)
+        # Entries are read in id order, so a block's entries are an id range
+        with transaction.atomic():
+            SimilarItem.objects.filter(entry_id__gte=ids[start], entry_id__lte=ids[end - 1]).delete()
+            write_neighbours(ids, rows, columns, ranks, scores)
+        # With DEBUG on every statement is kept, multi-megabyte INSERTs included
+        reset_queries()
+        written += len(rows)
+        log(f"rows {start}-{end - 1}: {len(rows)} neighbours")
+    return len(ids), written
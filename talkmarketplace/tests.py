@@ -1,3 +1,281 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from scipy import sparse
+
+from django.utils import timezone
+
+from utils.models import ViewCounter
+from utils.testing import APIViewTestCase
+from .filters import ListingFilter
+from .models import (
+    CatalogEntry, MarketPlaceProduct, MarketPlaceProductImage, MarketPlaceProductReview, MarketPlaceProductVideo,
+    ProviderDailyStats, SavedItem, Service, SimilarItem, ServiceReview, ServicesImage, ServicesVideo,
+    TakaProduct, TakaProductImage, TakaProductVideo, TakaReview,
+)
+from .rollups import refresh_provider_rollups
+from .similarity import build_similar_items, pair_costs, row_blocks, tfidf, top_neighbours
+from .views import (
+    ListMarketPlaceProductsView, ListServicesView, ListTakaProductsView,
+    DeleteSavedItemView, GetSavedItemsView, ProviderDashboardView, ProvidersMarketPlaceProductListView,
+    ProvidersServicesListView, ProvidersTakaProductListView, SaveItemView, SavedItemsLookupView, SearchCatalogView,
+    TakaProductUpdateView,
+)
+
+# Page count, the rows, then one query each for images, videos and reviews
+LIST_QUERY_BUDGET = 5
+# Product listings add the grouped facet count
+CATALOG_QUERY_BUDGET = LIST_QUERY_BUDGET + 1
+
+
+class ListingQueryBudgetTestCase(APIViewTestCase):
+    """Rendering a list page costs the same number of queries however many rows it holds."""
+
+    def add_listings(self, count):
+        for index in range(count):
+            product = MarketPlaceProduct.objects.create(
+                user=self.provider, name=f"Desk {index}", description="Sturdy", price=10
+            )
+            MarketPlaceProductImage.objects.create(product=product, image=f"products/desk-{index}.jpg")
+            MarketPlaceProductVideo.objects.create(product=product, video_path=f"products/desk-{index}.mp4")
+            MarketPlaceProductReview.objects.create(product=product, user=self.buyer, rating=5, comment="Great")
+
+            taka = TakaProduct.objects.create(user=self.provider, name=f"Lamp {index}", description="Bright")
+            TakaProductImage.objects.create(product=taka, image=f"products/lamp-{index}.jpg")
+            TakaProductVideo.objects.create(product=taka, video_path=f"products/lamp-{index}.mp4")
+            TakaReview.objects.create(product=taka, user=self.buyer, rating=4, comment="Good")
+
+            service = Service.objects.create(user=self.provider, title=f"Tutoring {index}", description="Maths")
+            ServicesImage.objects.create(service=service, image=f"services/tutor-{index}.jpg")
+            ServicesVideo.objects.create(service=service, video_path=f"services/tutor-{index}.mp4")
+            ServiceReview.objects.create(service=service, user=self.buyer, rating=5, comment="Patient")
+
+    def assert_list_budget(self, view, rows):
+        budget = LIST_QUERY_BUDGET if view.listing_filter is ListingFilter else CATALOG_QUERY_BUDGET
+        with self.assertNumQueries(budget):
+            response = self.call(view)
+        self.assertEqual(response.status_code, 200)
+        data = response.data["results"]["data"]
+        self.assertEqual(len(data), rows)
+        self.assertTrue(all(item["images"] and item["videos"] and item["reviews"] for item in data))
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        views = (
+            ListMarketPlaceProductsView, ProvidersMarketPlaceProductListView,
+            ListTakaProductsView, ProvidersTakaProductListView,
+            ListServicesView, ProvidersServicesListView,
+        )
+        self.add_listings(2)
+        for view in views:
+            with self.subTest(view=view.__name__, rows=2):
+                self.assert_list_budget(view, 2)
+
+        self.add_listings(10)
+        for view in views:
+            with self.subTest(view=view.__name__, rows=12):
+                self.assert_list_budget(view, 12)
+
+
+class RatingAggregatesTestCase(APIViewTestCase):
+
+    def test_reviews_move_the_aggregates(self):
+        service = Service.objects.create(user=self.provider, title="Tutoring", description="Maths")
+        other = Service.objects.create(user=self.provider, title="Editing", description="Essays")
+        five = ServiceReview.objects.create(service=service, user=self.buyer, rating=5)
+        three = ServiceReview.objects.create(service=service, user=self.buyer, rating=3)
+
+        five.rating = 4
+        five.save()
+        three.service = other
+        three.save()
+        service.refresh_from_db()
+        self.assertEqual(service.rating_profile(), {"average": 4.0, "count": 1, "stars": {1: 0, 2: 0, 3: 0, 4: 1, 5: 0}})
+
+        five.delete()
+        service.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((service.rating_count, service.average_rating), (0, 0))
+        self.assertEqual((other.rating_sum, other.rating_count, other.stars_3), (3, 1, 1))
+
+    def test_rating_sort_and_filter(self):
+        for title, ratings in (("Low", [1, 2]), ("High", [5, 4]), ("None", [])):
+            service = Service.objects.create(user=self.provider, title=title, description="-")
+            for rating in ratings:
+                ServiceReview.objects.create(service=service, user=self.buyer, rating=rating)
+
+        response = self.call(ListServicesView, data={"sort": "rating", "min_rating": "1"}, user=self.buyer)
+        self.assertEqual([item["title"] for item in response.data["results"]["data"]], ["High", "Low"])
+
+
+class CatalogFilterTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name, category, price, discount in (
+            ("Novel", "books", 800, 0), ("Atlas", "books", 6000, 2000), ("Phone", "tech", 90000, 0),
+        ):
+            TakaProduct.objects.create(
+                user=cls.provider, name=name, description="-", category=category, price=price, discount=discount
+            )
+
+    def get(self, **params):
+        return self.call(ListTakaProductsView, data=params)
+
+    def test_filters_sort_and_facets(self):
+        response = self.get(category="books", sort="-effective_price")
+        body = response.data["results"]
+        self.assertEqual([item["name"] for item in body["data"]], ["Atlas", "Novel"])
+        self.assertEqual(body["facets"]["total"], 2)
+        self.assertEqual(body["facets"]["category"], [{"value": "books", "count": 2}])
+        self.assertEqual([band["count"] for band in body["facets"]["price"]], [1, 0, 1, 0, 0])
+
+        response = self.get(min_price="1000", sort="price")
+        self.assertEqual([item["name"] for item in response.data["results"]["data"]], ["Atlas", "Phone"])
+
+    def test_update_returns_the_new_effective_price(self):
+        atlas = TakaProduct.objects.get(name="Atlas")
+        response = self.call(TakaProductUpdateView, "patch", {"price": "7000"}, format="multipart", slug=atlas.slug)
+        self.assertEqual(response.data["data"]["effective_price"], Decimal("5000"))
+
+    def test_invalid_parameters(self):
+        for params in ({"sort": "cheapest"}, {"min_price": "abc"}, {"negotiable": "maybe"}):
+            with self.subTest(**params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+
+class CatalogSearchTestCase(APIViewTestCase):
+
+    def search(self, **params):
+        return self.call(SearchCatalogView, data=params).data
+
+    def test_entries_follow_their_source(self):
+        lamp = TakaProduct.objects.create(user=self.provider, name="Lamp", description="Desk lamp")
+        lamp.name = "Reading lamp"
+        lamp.save()
+        self.assertEqual(CatalogEntry.objects.get(kind=CatalogEntry.Kind.TAKA, object_id=lamp.pk).title, "Reading lamp")
+        lamp.delete()
+        self.assertFalse(CatalogEntry.objects.exists())
+
+    def test_search_spans_every_kind(self):
+        MarketPlaceProduct.objects.create(user=self.provider, name="Calculus", description="Used maths textbook")
+        TakaProduct.objects.create(user=self.provider, name="Lamp", description="Light for reading")
+        Service.objects.create(user=self.provider, title="Tutoring", description="Calculus and algebra lessons")
+
+        body = self.search(q="calculus")
+        self.assertEqual([item["type"] for item in body["results"]["data"]], ["marketplace", "service"])
+
+        body = self.search(q="calculus", type="service", page_size=1)
+        self.assertEqual([item["title"] for item in body["results"]["data"]], ["Tutoring"])
+        self.assertIsNone(body["next"])
+
+
+class SavedItemsTestCase(APIViewTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.desk = MarketPlaceProduct.objects.create(user=cls.provider, name="Desk", description="-")
+        cls.lamp = TakaProduct.objects.create(user=cls.provider, name="Lamp", description="-")
+        cls.sofa = TakaProduct.objects.create(user=cls.provider, name="Sofa", description="-")
+
+    def call(self, view, *args, **kwargs):
+        return super().call(view, *args, user=self.buyer, **kwargs)
+
+    def test_save_and_unsave_are_idempotent(self):
+        for product in (self.desk, self.lamp, self.desk):
+            self.assertEqual(self.call(SaveItemView, "post", {"product": str(product.pk)}, format="json").status_code, 201)
+        self.assertEqual(SavedItem.objects.get(user=self.buyer).product.count(), 2)
+
+        for removed in (True, False):
+            response = self.call(DeleteSavedItemView, "delete", product_id=self.desk.pk)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(SavedItem.saved_among(self.buyer, [self.desk.pk, self.lamp.pk]), {self.lamp.pk})
+
+    def test_list_pages_newest_first(self):
+        for product in (self.desk, self.lamp, self.sofa):
+            SavedItem.save_for(self.buyer, product.pk)
+
+        body = self.call(GetSavedItemsView, data={"page_size": 2}).data
+        self.assertEqual([item["product"]["name"] for item in body["results"]["data"]], ["Sofa", "Lamp"])
+        cursor = body["next"].split("cursor=")[1].split("&")[0]
+        body = self.call(GetSavedItemsView, data={"page_size": 2, "cursor": cursor}).data
+        self.assertEqual([item["product"]["name"] for item in body["results"]["data"]], ["Desk"])
+        self.assertIsNone(body["next"])
+
+    def test_lookup(self):
+        SavedItem.save_for(self.buyer, self.lamp.pk)
+        response = self.call(SavedItemsLookupView, data={"ids": f"{self.desk.pk},{self.lamp.pk}"})
+        self.assertEqual(response.data["data"]["saved"], [str(self.lamp.pk)])
+        self.assertEqual(self.call(SavedItemsLookupView, data={"ids": "desk"}).status_code, 400)
+
+
+@mock.patch("talkmarketplace.rollups.PROVIDER_ROLLUP_LAG", 0)
+class ProviderRollupsTestCase(APIViewTestCase):
+
+    def test_rollups_follow_changes(self):
+        lamp = TakaProduct.objects.create(user=self.provider, name="Lamp", description="-")
+        service = Service.objects.create(user=self.provider, title="Tutoring", description="-")
+        SavedItem.save_for(self.buyer, lamp.pk)
+        review = TakaReview.objects.create(product=lamp, user=self.buyer, rating=2)
+        ServiceReview.objects.create(service=service, user=self.buyer, rating=5)
+        ViewCounter.add_views({("taka", lamp.pk, timezone.localdate()): 7})
+
+        refresh_provider_rollups()
+        stats = ProviderDailyStats.objects.get(user=self.provider)
+        self.assertEqual(
+            (stats.listings, stats.saves, stats.reviews, stats.rating_sum, stats.views), (2, 1, 2, 7, 7)
+        )
+
+        review.rating = 4
+        review.save()
+        self.assertEqual(refresh_provider_rollups(), 1)
+        self.assertEqual(refresh_provider_rollups(), 0)
+
+        body = self.call(ProviderDashboardView, data={"days": 7}).data["data"]
+        self.assertEqual(body["totals"], {"listings": 2, "saves": 1, "reviews": 2, "views": 7, "average_rating": 4.5})
+        self.assertEqual(len(body["days"]), 1)
+
+
+class SimilarItemsTestCase(APIViewTestCase):
+
+    def test_neighbours_share_terms(self):
+        provider = self.provider
+        tutoring = Service.objects.create(user=provider, title="Tutor", description="Calculus lessons")
+        TakaProduct.objects.create(user=provider, name="Calculus", description="Used textbook")
+        MarketPlaceProduct.objects.create(user=provider, name="Lamp", description="Bright desk lamp")
+        TakaProduct.objects.create(user=provider, name="Light", description="Reading lamp")
+
+        self.assertEqual(build_similar_items(neighbours=3, features=2 ** 10, memory_mb=1), (4, 4))
+        similar = SimilarItem.neighbours_of(CatalogEntry.Kind.SERVICE, tutoring.pk)
+        self.assertEqual([(item["type"], item["title"]) for item in similar], [("taka", "Calculus")])
+
+    def test_blocks_find_the_same_neighbours_as_the_whole_matrix(self):
+        rng = np.random.default_rng(1)
+        matrix = sparse.random(60, 40, density=0.1, format="csr", dtype=np.float32, random_state=rng)
+        transposed = matrix.T.tocsr()
+        whole = top_neighbours(matrix, 0, transposed, 3, 0.01)
+
+        costs = pair_costs(matrix, np.bincount(matrix.indices, minlength=40))
+        blocks = list(row_blocks(costs, int(costs.max())))
+        self.assertGreater(len(blocks), 1)
+        self.assertTrue(all(costs[start:end].sum() <= costs.max() for start, end in blocks))
+        parts = [top_neighbours(matrix[start:end], start, transposed, 3, 0.01) for start, end in blocks]
+        for joined, expected in zip(map(np.concatenate, zip(*parts)), whole):
+            np.testing.assert_array_equal(joined, expected)
+
+    def test_rows_are_unit_length_and_costed_with_empty_rows_last(self):
+        counts = sparse.csr_matrix(np.array([
+            [1, 2, 0, 0], [3, 1, 1, 0], [0, 0, 0, 0], [0, 0, 0, 0],
+        ], dtype=np.float32))
+        matrix, df = tfidf(counts, max_df=1, max_df_entries=10)
+        np.testing.assert_allclose(np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1, [1, 1, 0, 0], rtol=1e-6)
+        np.testing.assert_array_equal(pair_costs(matrix, df), [4, 4, 0, 0])
+
+    def test_a_budget_too_small_fails_up_front(self):
+        for index in range(3):
+            TakaProduct.objects.create(user=self.provider, name=f"Lamp {index}", description="Desk lamp")
+        with self.assertRaisesMessage(ValueError, "more than the 1MB memory budget"):
+            build_similar_items(memory_mb=1)
+        self.assertFalse(SimilarItem.objects.exists())
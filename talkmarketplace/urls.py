@@ -16,12 +16,15 @@ from .views import (
     SaveItemView,
     GetSavedItemsView,
     DeleteSavedItemView,
+    SavedItemsLookupView,
     ServiceCreateView,
     ListServicesView,
     ProvidersServicesListView,
     ServiceDetailView,
     ServiceUpdateView,
-    ServiceDeleteView
+    ServiceDeleteView,
+    SearchCatalogView,
+    ProviderDashboardView,
 )
 
 marketplace_urlpatterns = [
@@ -55,7 +58,10 @@ urlpatterns = [
     path("marketplace/", include(marketplace_urlpatterns)), 
     path("taka/", include(taka_urlpatterns)),
     path("services/", include(service_urlpatterns)),
+    path("providers/dashboard/", ProviderDashboardView.as_view(), name='provider_dashboard'),
+    path("catalog/search/", SearchCatalogView.as_view(), name='search_catalog'),
     path("save-items/", SaveItemView.as_view()),
     path("saved-items/", GetSavedItemsView.as_view(), name='get_saved_items'),
-    path('saved-items/<int:product_id>/delete/', DeleteSavedItemView.as_view(), name='delete_saved_item'),
+    path("saved-items/lookup/", SavedItemsLookupView.as_view(), name='lookup_saved_items'),
+    path('saved-items/<uuid:product_id>/delete/', DeleteSavedItemView.as_view(), name='delete_saved_item'),
 ]
@@ -1,3 +1,6 @@
+import uuid
+from datetime import timedelta
+
 from rest_framework.generics import (
     GenericAPIView,
     CreateAPIView,
@@ -9,8 +12,12 @@ from .models import (
     Product,
     MarketPlaceProduct,
     TakaProduct,
+    ProviderDailyStats,
     SavedItem,
-    Service
+    SimilarItem,
+    Service,
+    CatalogEntry,
+    CATALOG_SEARCH_TRIGRAM,
 )
 from .serializers import (
     MarketPlaceProductSerializer, 
@@ -26,7 +33,16 @@ from rest_framework import exceptions, status
 from django.shortcuts import get_object_or_404
 from rest_framework.parsers import MultiPartParser, FormParser
 from utils.helpers import custom_response
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from django.contrib.postgres.search import SearchQuery, TrigramSimilarity
+from django.db.models import Q
+from django.utils import timezone
+from utils.pagination import KeysetPagination
+from utils.search import search_rank
+from utils.models import RollupWatermark
+from utils.viewcounts import count_view
+from .filters import CatalogFilter, ListingFilter
+from .rollups import ROLLUP_NAME
 
 tag_names = {
     "marketplace": "Marketplace",
@@ -35,36 +51,62 @@ tag_names = {
     "inventory": "Inventory",
 }
 
+class ProfileListMixin:
+    """
+    Renders a list view from the models' ``*_profile()`` payloads, a page at
+    a time when paginated, filtered and sorted by ``listing_filter``.
+    Querysets should come from ``profile_queryset()`` so rendering a page
+    does not query per row.
+    """
+    empty_message = "No products found"
+    listing_filter = CatalogFilter
+
+    def render_profile(self, item):
+        return item.product_profile(image_size="thumb")
+
+    def list_profiles(self, queryset):
+        listing_filter = self.listing_filter(self.request.query_params)
+        queryset = listing_filter.sort(listing_filter.filter(queryset))
+        page = self.paginate_queryset(queryset)
+        data = [self.render_profile(item) for item in (queryset if page is None else page)]
+        body = custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Data retrieved successfully",
+            data=data
+        )
+        facets = listing_filter.facets(queryset)
+        if facets is not None:
+            body["facets"] = facets
+        if page is not None:
+            return self.get_paginated_response(body)
+        if not data:
+            raise exceptions.NotFound(self.empty_message)
+        return Response(body, status=status.HTTP_200_OK)
+
+def parse_product_ids(values, name):
+    try:
+        return [uuid.UUID(str(value)) for value in values]
+    except ValueError:
+        raise exceptions.ValidationError({name: "Must be product ids."})
+
 class SaveItemView(GenericAPIView):
     """
         Handles users item savings
     """
     serializer_class = SavedItemsSerializer
     permission_classes = [IsAuthenticated]
-    @extend_schema(tags=[tag_names["inventory"]], operation_id="Save an item for later")
 
+    @extend_schema(
+        tags=[tag_names["inventory"]],
+        operation_id="Save an item for later",
+        description="Adds a product to the user's saved list. Saving an item that is already saved changes nothing.",
+    )
     def post(self, request, *args, **kwargs):
-        product_id = request.data.get("product")
-        user = request.user
-        try:
-            product = get_object_or_404(Product, id=product_id)
-            instance, created = SavedItem.objects.get_or_create(user=user)
-            if created:
-                instance.save_item(product=product_id)
-            return Response(custom_response(
-                status_mthd=status.HTTP_201_CREATED,
-                status="success",
-                mssg="Item added successfully",
-                data=str(e)
-            ))
-        except Exception as e:
-            return Response(custom_response(
-                status_mthd=status.HTTP_400_BAD_REQUEST,
-                status="error",
-                mssg="Failed to save item",
-                data=str(e)
-            ), status=status.HTTP_400_BAD_REQUEST)
-        except ObjectDoesNotExist:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id = serializer.validated_data["product"]
+        if not Product.objects.filter(id=product_id).exists():
             return Response(custom_response(
                 status_mthd=status.HTTP_404_NOT_FOUND,
                 status="error",
@@ -72,35 +114,66 @@ class SaveItemView(GenericAPIView):
                 data=None
             ), status=status.HTTP_404_NOT_FOUND)
 
+        SavedItem.save_for(request.user, product_id)
+        return Response(custom_response(
+            status_mthd=status.HTTP_201_CREATED,
+            status="success",
+            mssg="Item added successfully",
+            data={"product": product_id, "saved": True}
+        ), status=status.HTTP_201_CREATED)
+
 class GetSavedItemsView(GenericAPIView):
     """
-        Retrieves all saved items for the authenticated user
+        Retrieves the saved items of the authenticated user, most recently saved first
     """
-    serializer_class = SavedItemsSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = SavedItem.LIST_ORDERING
 
-    @extend_schema(tags=[tag_names["inventory"]], operation_id="Get all saved items")
+    @extend_schema(
+        tags=[tag_names["inventory"]],
+        operation_id="Get all saved items",
+        description="The user's saved products, most recently saved first. Follow the `next` link for more.",
+        parameters=[OpenApiParameter("cursor", str, description="Opaque cursor taken from the previous page's `next` link.")],
+    )
     def get(self, request, *args, **kwargs):
-        user = request.user
-        try:
-            saved_instance = SavedItem.objects.get(user=user)
-            print(f"Saved instance: {saved_instance}")  # Debugging line
-            saved_items = saved_instance.get_user_saved_items()
-            print(f"Retrieved saved items: {saved_items}")  # Debugging line
-            serializer = self.get_serializer(saved_items, many=True)
-            return Response(custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Saved items retrieved successfully",
-                data=serializer.data
-            ), status=status.HTTP_200_OK)
-        except SavedItem.DoesNotExist:
-            return Response(custom_response(
-                status_mthd=status.HTTP_404_NOT_FOUND,
-                status="error",
-                mssg="No saved items for user",
-                data=None
-            ), status=status.HTTP_404_NOT_FOUND)
+        page = self.paginate_queryset(SavedItem.entries_of(request.user))
+        profiles = Product.profiles([entry.product_id for entry in page], image_size="thumb")
+        saved_at = {entry.product_id: entry.created for entry in page}
+        return self.get_paginated_response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Saved items retrieved successfully",
+            data=[
+                {"saved_at": saved_at[profile["id"]].strftime("%Y-%m-%d %H:%M:%S"), "product": profile}
+                for profile in profiles
+            ]
+        ))
+
+class SavedItemsLookupView(GenericAPIView):
+    """
+        Tells which of a list of products the authenticated user has saved
+    """
+    permission_classes = [IsAuthenticated]
+    max_ids = 100
+
+    @extend_schema(
+        tags=[tag_names["inventory"]],
+        operation_id="Look up saved items",
+        description=f"Which of up to {max_ids} products the user has saved, e.g. to mark a page of listings.",
+        parameters=[OpenApiParameter("ids", str, many=True, required=True, description="Product ids, repeated or comma separated.")],
+    )
+    def get(self, request, *args, **kwargs):
+        values = [value for param in request.query_params.getlist("ids") for value in param.split(",") if value]
+        if len(values) > self.max_ids:
+            raise exceptions.ValidationError({"ids": f"At most {self.max_ids} ids at a time."})
+        product_ids = parse_product_ids(values, "ids")
+        return Response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Saved items looked up successfully",
+            data={"saved": sorted(str(product_id) for product_id in SavedItem.saved_among(request.user, product_ids))}
+        ), status=status.HTTP_200_OK)
 
 
 class DeleteSavedItemView(GenericAPIView):
@@ -109,35 +182,20 @@ class DeleteSavedItemView(GenericAPIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @extend_schema(tags=[tag_names["inventory"]], operation_id="Delete a saved item")
+    @extend_schema(
+        tags=[tag_names["inventory"]],
+        operation_id="Delete a saved item",
+        description="Removes a product from the user's saved list. Removing an item that is not saved changes nothing.",
+    )
     def delete(self, request, *args, **kwargs):
         product_id = kwargs.get('product_id')
-        user = request.user
-
-        try:
-            product = get_object_or_404(Product, id=product_id)
-            saved_instance = SavedItem.objects.get(user=user)
-
-            if saved_instance.is_item_saved(product):
-                saved_instance.remove_item(product)
-                return Response(custom_response(
-                    status_mthd=status.HTTP_204_NO_CONTENT,
-                    status="success",
-                    mssg="Item removed from saved list"
-                ), status=status.HTTP_204_NO_CONTENT)
-
-            return Response(custom_response(
-                status_mthd=status.HTTP_404_NOT_FOUND,
-                status="error",
-                mssg="Item was not in saved list"
-            ), status=status.HTTP_404_NOT_FOUND)
-
-        except SavedItem.DoesNotExist:
-            return Response(custom_response(
-                status_mthd=status.HTTP_404_NOT_FOUND,
-                status="error",
-                mssg="No saved items for user"
-            ), status=status.HTTP_404_NOT_FOUND)
+        removed = SavedItem.unsave_for(request.user, product_id)
+        return Response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Item removed from saved list" if removed else "Item was not in saved list",
+            data={"product": product_id, "saved": False}
+        ), status=status.HTTP_200_OK)
 
 class MarketPlaceProductCreateView(GenericAPIView):
     serializer_class = MarketPlaceProductSerializer
@@ -181,84 +239,74 @@ class MarketPlaceProductCreateView(GenericAPIView):
 
 
 
-class ListMarketPlaceProductsView(ListAPIView):
+class ListMarketPlaceProductsView(ProfileListMixin, ListAPIView):
     """Lists all products with pagination and filtering."""
     serializer_class = MarketPlaceProductSerializer
-    queryset = MarketPlaceProduct.objects.all()
+    queryset = MarketPlaceProduct.profile_queryset()
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
 
-    @extend_schema(tags=[tag_names["marketplace"]], operation_id="Get all products")
+    @extend_schema(tags=[tag_names["marketplace"]], operation_id="Get all products", parameters=CatalogFilter.parameters)
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            data = [product.product_profile() for product in page]
-            return self.get_paginated_response(
-                custom_response(
-                    status_mthd=status.HTTP_200_OK,
-                    status="success",
-                    mssg="Data retrieved successfully",
-                    data=data
-                )
-            )
+        return self.list_profiles(self.get_queryset())
 
-        serializer = self.get_serializer(queryset, many=True)
-        if not serializer.data:
-            raise exceptions.NotFound("No products found")
-
-        data = [product.product_profile() for product in queryset]
-        return Response(
-            custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Data retrieved successfully",
-                data=data
-            ),
-            status=status.HTTP_200_OK
-        )
-
-class ProvidersMarketPlaceProductListView(GenericAPIView):
+class ProvidersMarketPlaceProductListView(ProfileListMixin, GenericAPIView):
     serializer_class = MarketPlaceProductSerializer
-    queryset = MarketPlaceProduct.objects.all()
+    queryset = MarketPlaceProduct.profile_queryset()
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
 
-    @extend_schema(tags=[tag_names["marketplace"]], operation_id="Get products of a service provider")
+    @extend_schema(tags=[tag_names["marketplace"]], operation_id="Get products of a service provider", parameters=CatalogFilter.parameters)
     def get(self, request, *args, **kwargs):
         user_id = request.user.id
         if not user_id:
             raise exceptions.NotAuthenticated("User not authenticated")
 
-        queryset = MarketPlaceProduct.objects.filter(user=user_id)
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            data = [product.product_profile() for product in page]
-            return self.get_paginated_response(
-                custom_response(
-                    status_mthd=status.HTTP_200_OK,
-                    status="success",
-                    mssg="Data retrieved successfully",
-                    data=data
-                )
-            )
+        return self.list_profiles(self.get_queryset().filter(user=user_id))
 
-        serializer = self.get_serializer(queryset, many=True)
-        if not serializer.data:
-            raise exceptions.NotFound("No products found")
+class ProviderDashboardView(GenericAPIView):
+    """
+        Daily numbers of the authenticated provider's listings, read from the rollups
+    """
+    permission_classes = [IsAuthenticated]
+    max_days = 366
 
-        data = [product.product_profile() for product in queryset]
-        return Response(
-            custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Data retrieved successfully",
-                data=data
-            ),
-            status=status.HTTP_200_OK
-        )
+    @extend_schema(
+        tags=[tag_names["inventory"]],
+        operation_id="Get a service provider's dashboard",
+        description="New listings, saves, reviews, average rating and views per day over the last `days` days, "
+                    "and their totals. Days without activity are left out. `refreshed` is when the rollups last "
+                    "caught up with the listings.",
+        parameters=[OpenApiParameter("days", int, description=f"How many days back, up to {max_days} (default: 30).")],
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= self.max_days:
+            raise exceptions.ValidationError({"days": f"Must be a number from 1 to {self.max_days}."})
+
+        today = timezone.localdate()
+        first_day = today - timedelta(days=days - 1)
+        stats = list(ProviderDailyStats.objects.filter(user=request.user, day__gte=first_day))
+        totals = {metric: sum(getattr(row, metric) for row in stats) for metric in ProviderDailyStats.METRICS}
+        rating_sum = totals.pop("rating_sum")
+        totals["average_rating"] = ProviderDailyStats.average_of(rating_sum, totals["reviews"])
+        refreshed = RollupWatermark.position_of(ROLLUP_NAME)
+
+        return Response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Dashboard retrieved successfully",
+            data={
+                "from": first_day.strftime("%Y-%m-%d"),
+                "to": today.strftime("%Y-%m-%d"),
+                "refreshed": refreshed.strftime("%Y-%m-%d %H:%M:%S") if refreshed else None,
+                "totals": totals,
+                "days": [row.stats_profile() for row in stats],
+            }
+        ), status=status.HTTP_200_OK)
 
 class MarketPlaceProductDetailView(GenericAPIView):
     queryset = MarketPlaceProduct.objects.all()
@@ -270,7 +318,7 @@ class MarketPlaceProductDetailView(GenericAPIView):
     def get(self, request, *args, **kwargs):
         slug = kwargs.get('slug')
         try:
-            product = MarketPlaceProduct.objects.get(slug=slug)
+            product = MarketPlaceProduct.profile_queryset().get(slug=slug)
         except ObjectDoesNotExist:
             raise exceptions.NotFound("Product not found")
 
@@ -279,7 +327,11 @@ class MarketPlaceProductDetailView(GenericAPIView):
                 status_mthd=status.HTTP_200_OK,
                 status="success",
                 mssg="Product details retrieved successfully",
-                data=product.product_profile()
+                data={
+                    **product.product_profile(),
+                    "views": count_view("marketplace", product.pk),
+                    "similar": SimilarItem.neighbours_of(CatalogEntry.Kind.MARKETPLACE, product.pk),
+                }
             ),
             status=status.HTTP_200_OK
         )
@@ -380,84 +432,30 @@ class TakaProductCreateView(GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class ListTakaProductsView(ListAPIView):
+class ListTakaProductsView(ProfileListMixin, ListAPIView):
     """Lists all products with pagination and filtering."""
     serializer_class = TakaProductSerializer
-    queryset = TakaProduct.objects.all()
+    queryset = TakaProduct.profile_queryset()
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
 
-    @extend_schema(tags=[tag_names["taka"]], operation_id="Get all products")
+    @extend_schema(tags=[tag_names["taka"]], operation_id="Get all products", parameters=CatalogFilter.parameters)
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            data = [product.product_profile() for product in page]
-            return self.get_paginated_response(
-                custom_response(
-                    status_mthd=status.HTTP_200_OK,
-                    status="success",
-                    mssg="Data retrieved successfully",
-                    data=data
-                )
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        if not serializer.data:
-            raise exceptions.NotFound("No products found")
-
-        data = [product.product_profile() for product in queryset]
-        return Response(
-            custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Data retrieved successfully",
-                data=data
-            ),
-            status=status.HTTP_200_OK
-        )
+        return self.list_profiles(self.get_queryset())
 
-class ProvidersTakaProductListView(GenericAPIView):
+class ProvidersTakaProductListView(ProfileListMixin, GenericAPIView):
     serializer_class = TakaProductSerializer
-    queryset = TakaProduct.objects.all()
+    queryset = TakaProduct.profile_queryset()
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
 
-    @extend_schema(tags=[tag_names["taka"]], operation_id="Get products of a service provider")
+    @extend_schema(tags=[tag_names["taka"]], operation_id="Get products of a service provider", parameters=CatalogFilter.parameters)
     def get(self, request, *args, **kwargs):
         user_id = request.user.id
         if not user_id:
             raise exceptions.NotAuthenticated("User not authenticated")
 
-        queryset = TakaProduct.objects.filter(user=user_id)
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            data = [product.product_profile() for product in page]
-            return self.get_paginated_response(
-                custom_response(
-                    status_mthd=status.HTTP_200_OK,
-                    status="success",
-                    mssg="Data retrieved successfully",
-                    data=data
-                )
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        if not serializer.data:
-            raise exceptions.NotFound("No products found")
-
-        data = [product.product_profile() for product in queryset]
-        return Response(
-            custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Data retrieved successfully",
-                data=data
-            ),
-            status=status.HTTP_200_OK
-        )
+        return self.list_profiles(self.get_queryset().filter(user=user_id))
 
 class TakaProductDetailView(GenericAPIView):
     serializer_class = TakaProductSerializer
@@ -481,7 +479,11 @@ class TakaProductDetailView(GenericAPIView):
                 status_mthd=status.HTTP_200_OK,
                 status="success",
                 mssg="Product details retrieved successfully",
-                data=serializer.data
+                data={
+                    **serializer.data,
+                    "views": count_view("taka", product.pk),
+                    "similar": SimilarItem.neighbours_of(CatalogEntry.Kind.TAKA, product.pk),
+                }
             ),
             status=status.HTTP_200_OK
         )
@@ -583,83 +585,39 @@ class ServiceCreateView(GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class ListServicesView(ListAPIView):
+class ListServicesView(ProfileListMixin, ListAPIView):
     serializer_class = ServiceSerializer
-    queryset = Service.objects.all()
+    queryset = Service.profile_queryset()
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
 
-    @extend_schema(tags=[tag_names["services"]], operation_id="Get all services")
-    def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            data = [service.service_profile() for service in page]
-            return self.get_paginated_response(
-                custom_response(
-                    status_mthd=status.HTTP_200_OK,
-                    status="success",
-                    mssg="Data retrieved successfully",
-                    data=data
-                )
-            )
+    listing_filter = ListingFilter
 
-        serializer = self.get_serializer(queryset, many=True)
-        if not serializer.data:
-            raise exceptions.NotFound("No products found")
+    def render_profile(self, item):
+        return item.service_profile(image_size="thumb")
 
-        data = [service.service_profile() for service in queryset]
-        return Response(
-            custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Data retrieved successfully",
-                data=data
-            ),
-            status=status.HTTP_200_OK
-        )
+    @extend_schema(tags=[tag_names["services"]], operation_id="Get all services", parameters=ListingFilter.parameters)
+    def get(self, request, *args, **kwargs):
+        return self.list_profiles(self.get_queryset())
 
-class ProvidersServicesListView(GenericAPIView):
+class ProvidersServicesListView(ProfileListMixin, GenericAPIView):
     serializer_class = ServiceSerializer
-    queryset = Service.objects.all()
+    queryset = Service.profile_queryset()
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
+    empty_message = "No service found"
+    listing_filter = ListingFilter
+
+    def render_profile(self, item):
+        return item.service_profile(image_size="thumb")
 
-    @extend_schema(tags=[tag_names["services"]], operation_id="Get services of a service provider")
+    @extend_schema(tags=[tag_names["services"]], operation_id="Get services of a service provider", parameters=ListingFilter.parameters)
     def get(self, request, *args, **kwargs):
         user_id = request.user.id
         if not user_id:
             raise exceptions.NotAuthenticated("User not authenticated")
-        
-        queryset = Service.objects.filter(user=user_id)
-        page = self.paginate_queryset(queryset)
 
-        if page is not None:
-            data = [service.service_profile() for service in page]
-            return self.get_paginated_response(
-                custom_response(
-                    status_mthd=status.HTTP_200_OK,
-                    status="success",
-                    mssg="Data retrieved successfully",
-                    data=data
-                )
-            )
-        
-        serializer = self.get_serializer(queryset, many=True)
-        if not serializer.data:
-            raise exceptions.NotFound("No service found")
-        
-        data = [service.service_profile() for service in queryset]
-        return Response(
-            custom_response(
-                status_mthd=status.HTTP_200_OK,
-                status="success",
-                mssg="Data retrieved successfully",
-                data=data
-            ),
-            status=status.HTTP_200_OK
-        )
+        return self.list_profiles(self.get_queryset().filter(user=user_id))
 
 class ServiceDetailView(GenericAPIView):
     serializer_class = ServiceSerializer
@@ -682,7 +640,11 @@ class ServiceDetailView(GenericAPIView):
                 status_mthd=status.HTTP_200_OK,
                 status="success",
                 mssg="Service detail retrieved successfully",
-                data=serializer.data
+                data={
+                    **serializer.data,
+                    "views": count_view("service", service.pk),
+                    "similar": SimilarItem.neighbours_of(CatalogEntry.Kind.SERVICE, service.pk),
+                }
             ),
             status=status.HTTP_200_OK
         )
@@ -741,3 +703,55 @@ class ServiceDeleteView(GenericAPIView):
             ),
             status=status.HTTP_204_NO_CONTENT
         )
+
+class SearchCatalogView(GenericAPIView):
+    queryset = CatalogEntry.objects.all()
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-rank", "id")
+
+    @extend_schema(
+        tags=[tag_names["marketplace"], tag_names["taka"], tag_names["services"]],
+        operation_id="Search the catalog",
+        description="Searches marketplace products, Taka products and services together, best matches first. "
+                    "Titles also match on similar spellings. Follow the `next` link for more results.",
+        parameters=[
+            OpenApiParameter("q", str, required=True, description="Search terms, quoted phrases and `-exclusions` are supported."),
+            OpenApiParameter("type", str, many=True, enum=CatalogEntry.Kind.values, description="Only these kinds of listing."),
+            OpenApiParameter("cursor", str, description="Opaque cursor taken from the previous page's `next` link."),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        terms = request.query_params.get("q", "").strip()
+        if not terms:
+            return Response(custom_response(
+                status_mthd=status.HTTP_400_BAD_REQUEST,
+                status="error",
+                mssg="q is required",
+                data=None
+            ), status=status.HTTP_400_BAD_REQUEST)
+
+        kinds = request.query_params.getlist("type")
+        unknown = set(kinds) - set(CatalogEntry.Kind.values)
+        if unknown:
+            raise exceptions.ValidationError({"type": f"Unknown type {', '.join(sorted(unknown))}."})
+
+        query = SearchQuery(terms, search_type="websearch", config="english")
+        matches = Q(search_vector=query)
+        boosts = []
+        if CATALOG_SEARCH_TRIGRAM:
+            matches |= Q(title__trigram_similar=terms)
+            boosts.append(TrigramSimilarity("title", terms))
+
+        entries = self.get_queryset().filter(matches)
+        if kinds:
+            entries = entries.filter(kind__in=kinds)
+        entries = entries.annotate(rank=search_rank(query, *boosts)).select_related("user").defer("search_vector")
+
+        page = self.paginate_queryset(entries)
+        return self.get_paginated_response(custom_response(
+            status_mthd=status.HTTP_200_OK,
+            status="success",
+            mssg="Catalog search results retrieved successfully",
+            data=[entry.entry_profile() for entry in page]
+        ))
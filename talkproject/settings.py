@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     # 'drf_yasg',
@@ -53,6 +54,7 @@ INSTALLED_APPS = [
     'talkapp',
     'talkcontent',
     'talkmarketplace',
+    'utils',
 ]
 
 MIDDLEWARE = [
@@ -102,6 +104,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Point CACHE_URL / POST_FRAGMENT_CACHE_URL at a shared backend (e.g. redis://)
+# when running several workers, the in-memory default is per process.
+
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://talk-default"),
+    # Rendered post payloads, see talkcontent.fragments
+    "post_fragments": {
+        **env.cache_url("POST_FRAGMENT_CACHE_URL", default="locmemcache://talk-post-fragments"),
+        "TIMEOUT": 60 * 60,
+    },
+}
+if CACHES["post_fragments"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache":
+    # Bound the in-process cache, other backends take their own OPTIONS
+    # (RedisCache hands them to the connection pool)
+    CACHES["post_fragments"]["OPTIONS"] = {"MAX_ENTRIES": 20000, "CULL_FREQUENCY": 10}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
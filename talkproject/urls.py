@@ -1,9 +1,10 @@
 from django.contrib import admin
 from rest_framework.permissions import AllowAny
-from django.urls import path, include
+from django.urls import path, re_path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.conf.urls.static import static
 from django.conf import settings
+from utils.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,8 +12,11 @@ urlpatterns = [
     path('', SpectacularSwaggerView.as_view(), name='swagger-ui'),
     path('api/v1/auth/', include('talkapp.urls')),
     path('api/v1/products/', include('talkmarketplace.urls')),
+    path('api/v1/uploads/', include('utils.urls')),
     path('api/v1/', include('talkcontent.urls')),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media),
+]
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
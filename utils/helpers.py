@@ -52,6 +52,17 @@ def format_ordinal_date(value):
 
 
 
+def refresh_generated_fields(instance):
+    """
+    Reloads the GeneratedFields of ``instance``. The database computes them,
+    and Django reads them back after an INSERT but not after an UPDATE.
+    """
+    fields = [field.attname for field in instance._meta.concrete_fields if field.generated]
+    if fields:
+        instance.refresh_from_db(fields=fields)
+    return instance
+
+
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
@@ -0,0 +1,178 @@
+"""
+Resized WebP variants of uploaded images.
+
+Models register their image fields with ``register_image_variants()``. When a
+new file is saved, a worker pool re-encodes the original without its EXIF
+block (applying the orientation it carried first) and writes one WebP per
+entry of ``IMAGE_VARIANT_SIZES`` next to it. The storage names are recorded
+in a JSON field beside the image, ``<field>_variants`` by default:
+
+    {"source": "post/imgs/.../cat.jpg", "thumb": ".../variants/cat-thumb.webp", ...}
+
+``source`` ties the variants to the file they were made from, so a replaced
+image falls back to its original until its own variants are ready. Nothing
+runs on the upload request itself.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of each variant in pixels, images are never upscaled
+IMAGE_VARIANT_SIZES = getattr(settings, "IMAGE_VARIANT_SIZES", {"thumb": 320, "medium": 1080})
+IMAGE_VARIANT_QUALITY = getattr(settings, "IMAGE_VARIANT_QUALITY", 80)
+VARIANT_DIRECTORY = "variants"
+
+_image_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+    thread_name_prefix="image-variants",
+)
+
+# (model, field name, variants field name, on_ready) of every registered field
+registry = []
+
+
+def variant_url(fieldfile, variants, size):
+    """URL of the ``size`` variant of ``fieldfile``, or of the original until it exists."""
+    if not fieldfile:
+        return None
+    variants = variants or {}
+    if size in variants and variants.get("source") == fieldfile.name:
+        return fieldfile.storage.url(variants[size])
+    return fieldfile.url
+
+
+def variant_urls(fieldfile, variants):
+    """The original URL and the URL of every variant size of ``fieldfile``."""
+    if not fieldfile:
+        return None
+    urls = {"original": fieldfile.url}
+    urls.update((size, variant_url(fieldfile, variants, size)) for size in IMAGE_VARIANT_SIZES)
+    return urls
+
+
+def _webp_ready(image):
+    if image.mode in ("RGB", "RGBA"):
+        return image
+    has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _replace(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def build_variants(fieldfile):
+    """
+    Writes a copy of ``fieldfile`` without its EXIF block and its WebP
+    variants. Returns the mapping to record in the variants field, whose
+    ``source`` is the name the stripped copy was stored under. The original
+    is left alone, process_image() deletes it once the field points at the
+    copy, so a failure in between never loses the upload.
+    """
+    storage = fieldfile.storage
+    name = fieldfile.name
+    with storage.open(name, "rb") as source:
+        image = Image.open(source)
+        image.load()
+
+    image_format = image.format
+    if image.getexif():
+        # Re-encoding without exif= drops the block, GPS position included
+        image = ImageOps.exif_transpose(image)
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=90, icc_profile=image.info.get("icc_profile"))
+        # save() picks a free name next to the original rather than overwriting it
+        name = storage.save(name, ContentFile(buffer.getvalue()))
+
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    variants = {"source": name}
+    try:
+        for size, edge in IMAGE_VARIANT_SIZES.items():
+            resized = _webp_ready(image.copy())
+            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP", quality=IMAGE_VARIANT_QUALITY, method=4)
+            variant_name = os.path.join(directory, VARIANT_DIRECTORY, f"{stem}-{size}.webp")
+            variants[size] = _replace(storage, variant_name, buffer.getvalue())
+    except Exception:
+        # Nothing gets recorded, so nothing written here may outlive the failure
+        for written in variants.values():
+            if written != fieldfile.name:
+                storage.delete(written)
+        raise
+    return variants
+
+
+def process_image(model, pk, field_name, variants_field, name, on_ready=None):
+    """Builds and records the variants of one stored image, if it is still current."""
+    current = model._default_manager.filter(pk=pk, **{field_name: name})
+    instance = current.first()
+    if instance is None:
+        # Deleted or replaced before the worker got to it
+        return
+    try:
+        variants = build_variants(getattr(instance, field_name))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception("Could not build variants of %s", name)
+        # Record the attempt so the file is not picked up again
+        variants = {"source": name}
+    updates = {variants_field: variants}
+    if variants["source"] != name:
+        updates[field_name] = variants["source"]
+    # update() rather than save() so the post_save hook does not fire again
+    recorded = current.update(**updates)
+    if variants["source"] != name:
+        storage = getattr(instance, field_name).storage
+        # Drop whichever copy the field does not point at
+        storage.delete(name if recorded else variants["source"])
+    if not recorded:
+        return
+    if on_ready is not None:
+        on_ready(instance)
+
+
+def _run_process_image(*args):
+    try:
+        process_image(*args)
+    except DatabaseError:
+        logger.exception("Recording image variants failed")
+    finally:
+        close_old_connections()
+
+
+def needs_variants(instance, field_name, variants_field):
+    fieldfile = getattr(instance, field_name)
+    return bool(fieldfile) and (getattr(instance, variants_field) or {}).get("source") != fieldfile.name
+
+
+def register_image_variants(model, field_name, variants_field=None, on_ready=None):
+    """
+    Builds variants of ``model.<field_name>`` in the background whenever a
+    new file is saved to it. ``on_ready(instance)`` runs on the worker once
+    they are recorded, e.g. to drop cached payloads that embed the URLs.
+    """
+    variants_field = variants_field or f"{field_name}_variants"
+
+    def schedule_variants(sender, instance, **kwargs):
+        if not needs_variants(instance, field_name, variants_field):
+            return
+        args = (model, instance.pk, field_name, variants_field, getattr(instance, field_name).name, on_ready)
+        transaction.on_commit(lambda: _image_pool.submit(_run_process_image, *args))
+
+    post_save.connect(
+        schedule_variants, sender=model, weak=False,
+        dispatch_uid=f"image_variants:{model._meta.label}.{field_name}",
+    )
+    registry.append((model, field_name, variants_field, on_ready))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from utils.models import UploadSession
+from utils.uploads import discard_partial
+
+
+class Command(BaseCommand):
+    help = "Delete upload sessions, and their partial files, that were abandoned before being finalized."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=48,
+            help="Purge unfinished sessions idle for longer than this (default: 48).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        stale = UploadSession.objects.filter(attached_id__isnull=True, updated__lt=cutoff)
+        purged = 0
+        for session in stale.iterator():
+            discard_partial(session)
+            session.delete()
+            purged += 1
+        # Finalized sessions only matter for retried finalize calls
+        finished, _ = UploadSession.objects.filter(attached_id__isnull=False, updated__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} abandoned and {finished} finalized upload sessions"))
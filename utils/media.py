@@ -0,0 +1,213 @@
+"""
+Serving of uploaded media with HTTP Range support.
+
+Whole files go out through ``FileResponse``, which hands the open file to the
+server's ``wsgi.file_wrapper`` (sendfile under gunicorn). Ranges are streamed
+from disk in blocks, so nothing is read into memory at once. With
+``MEDIA_OFFLOAD`` set, the view only checks the path and sets headers and a
+front proxy sends the bytes:
+
+    MEDIA_OFFLOAD = "x-accel-redirect"  # nginx, files under MEDIA_ACCEL_PREFIX
+    MEDIA_OFFLOAD = "x-sendfile"        # Apache mod_xsendfile, lighttpd
+"""
+import mimetypes
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .uploads import PARTIAL_UPLOAD_DIR
+
+MEDIA_OFFLOAD = getattr(settings, "MEDIA_OFFLOAD", None)
+# Internal nginx location aliased to MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+# Requests asking for more ranges than this get the whole file instead
+MEDIA_MAX_RANGES = getattr(settings, "MEDIA_MAX_RANGES", 16)
+BLOCK_SIZE = 64 * 1024
+
+RANGE_SPEC = re.compile(r"^(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of ``file`` starting at ``start``."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def media_path(path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    # Uploads still in progress are not media yet
+    partial_root = safe_join(settings.MEDIA_ROOT, PARTIAL_UPLOAD_DIR)
+    if os.path.commonpath([full_path, partial_root]) == partial_root or not os.path.isfile(full_path):
+        raise Http404("Not found")
+    return full_path
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Returns the ``(start, end)`` pairs, end inclusive, of a ``bytes=`` Range
+    header, or None when the header should be ignored and the whole file
+    sent. Raises RangeNotSatisfiable when no range overlaps the file.
+    """
+    unit, _, specs = (header or "").partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC.match(spec.strip())
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Suffix range, the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start <= end and start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable
+    if len(ranges) > MEDIA_MAX_RANGES:
+        return None
+    return ranges
+
+
+def if_range_matches(request, etag, mtime):
+    """Whether a Range may be honoured under the request's If-Range, if any."""
+    condition = request.headers.get("If-Range")
+    if not condition:
+        return True
+    if condition.startswith(('"', 'W/')):
+        return condition == etag
+    date = parse_http_date_safe(condition)
+    return date is not None and int(mtime) <= date
+
+
+def multipart_ranges(full_path, ranges, size, content_type, boundary):
+    """The parts of a multipart/byteranges body and its total length."""
+    headers = [
+        (
+            f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    length = sum(len(header) + end - start + 1 for header, (start, end) in zip(headers, ranges))
+    length += 2 * (len(ranges) - 1) + len(closing)
+
+    def body():
+        with open(full_path, "rb") as file:
+            for index, (header, (start, end)) in enumerate(zip(headers, ranges)):
+                if index:
+                    yield b"\r\n"
+                yield header
+                part = RangeFile(file, start, end - start + 1)
+                for block in iter(lambda: part.read(BLOCK_SIZE), b""):
+                    yield block
+        yield closing
+
+    return body(), length
+
+
+def offload_response(path, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if MEDIA_OFFLOAD == "x-accel-redirect":
+        response["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + path.lstrip("/")
+    else:
+        response["X-Sendfile"] = full_path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves ``path`` from MEDIA_ROOT, honouring single and multiple byte
+    ranges and conditional requests.
+    """
+    full_path = media_path(path)
+    stat = os.stat(full_path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    last_modified = http_date(stat.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        # 304 Not Modified or 412 Precondition Failed
+        response["ETag"] = etag
+        response["Last-Modified"] = last_modified
+        return response
+
+    if MEDIA_OFFLOAD:
+        # The proxy handles Range itself
+        response = offload_response(path, full_path, content_type)
+    else:
+        ranges = None
+        if request.method == "GET" and if_range_matches(request, etag, stat.st_mtime):
+            try:
+                ranges = parse_range(request.headers.get("Range"), size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                response["Accept-Ranges"] = "bytes"
+                return response
+
+        if not ranges:
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response = FileResponse(
+                RangeFile(open(full_path, "rb"), start, end - start + 1),
+                content_type=content_type, status=206,
+            )
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            boundary = uuid.uuid4().hex
+            body, length = multipart_ranges(full_path, ranges, size, content_type, boundary)
+            response = StreamingHttpResponse(
+                body, status=206, content_type=f"multipart/byteranges; boundary={boundary}"
+            )
+            response["Content-Length"] = length
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    return response
@@ -1,7 +1,15 @@
 import uuid
-from django.db import models
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import Sum
 from django.utils.timezone import now
 
+from .uploads import PARTIAL_UPLOAD_DIR
+
+# Counters written per INSERT when flushing views
+VIEW_COUNTER_BATCH_SIZE = 500
+
+
 class ModelUtilsMixin(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created = models.DateTimeField(auto_now_add=True)
@@ -9,3 +17,113 @@ class ModelUtilsMixin(models.Model):
 
     class Meta:
         abstract = True
+
+
+class UploadSession(ModelUtilsMixin):
+    """
+    A resumable upload in progress. Chunks are appended to a partial file in
+    media storage and ``received`` counts the bytes written so far, see
+    utils.uploads.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_sessions")
+    target = models.CharField(max_length=50)
+    target_id = models.UUIDField()
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    # Id of the media row created by finalize, null while uploading
+    attached_id = models.UUIDField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    @property
+    def partial_name(self):
+        return f"{PARTIAL_UPLOAD_DIR}/{self.id}.part"
+
+    @property
+    def is_complete(self):
+        return self.received == self.size
+
+    def session_profile(self):
+        return {
+            "id": self.id,
+            "target": self.target,
+            "target_id": self.target_id,
+            "filename": self.filename,
+            "size": self.size,
+            "received": self.received,
+            "finalized": self.attached_id is not None,
+            "attached_id": self.attached_id,
+            "created": self.created.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+class ViewCounter(ModelUtilsMixin):
+    """
+    Detail page views of one object on one day. Written in batches by
+    utils.viewcounts rather than on every view.
+    """
+    target = models.CharField(max_length=30)
+    object_id = models.UUIDField()
+    day = models.DateField()
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["target", "object_id", "day"], name="unique_view_counter"),
+        ]
+        indexes = [
+            # Rollups read the counters touched since their last run
+            models.Index(fields=["updated"], name="view_counter_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.target} {self.object_id} on {self.day}: {self.count}"
+
+    @classmethod
+    def add_views(cls, counts):
+        """
+        Adds ``counts``, a mapping of ``(target, object_id, day)`` to views,
+        onto the stored counters with one INSERT ... ON CONFLICT per batch.
+        Keys are written in sorted order so two workers flushing the same
+        counters lock them in the same order and cannot deadlock.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        stamp = now()
+        keys = sorted(counts)
+        for start in range(0, len(keys), VIEW_COUNTER_BATCH_SIZE):
+            batch = keys[start:start + VIEW_COUNTER_BATCH_SIZE]
+            params = []
+            for target, object_id, day in batch:
+                params += [uuid.uuid4(), target, object_id, day, counts[(target, object_id, day)], stamp, stamp]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (id, target, object_id, day, count, created, updated) "
+                    f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch))} "
+                    f"ON CONFLICT (target, object_id, day) DO UPDATE "
+                    f"SET count = {table}.count + EXCLUDED.count, updated = EXCLUDED.updated",
+                    params,
+                )
+
+    @classmethod
+    def total(cls, target, object_id):
+        return cls.objects.filter(target=target, object_id=object_id).aggregate(total=Sum("count"))["total"] or 0
+
+
+class RollupWatermark(ModelUtilsMixin):
+    """How far an incremental rollup has read its sources."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
+
+    @classmethod
+    def position_of(cls, name):
+        """Where the rollup called ``name`` stopped last, None if it never ran."""
+        return cls.objects.filter(name=name).values_list("position", flat=True).first()
+
+    @classmethod
+    def advance(cls, name, position):
+        cls.objects.update_or_create(name=name, defaults={"position": position})
@@ -0,0 +1,179 @@
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(ordering, values):
+    """
+    Builds the Q object matching rows that sort strictly after ``values``
+    under ``ordering``, i.e. the row-value comparison
+    ``(a, b, c) > (x, y, z)`` spelled out per column so each field can keep
+    its own direction.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+def encode_cursor(values):
+    def _prepare(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            # Keep full microsecond precision, the position must be exact
+            return value.isoformat()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
+
+    raw = json.dumps([_prepare(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise NotFound("Invalid cursor")
+    if not isinstance(values, list):
+        raise NotFound("Invalid cursor")
+    return values
+
+
+def ordering_field(queryset, name):
+    """The model field or annotation output field ``queryset`` sorts by as ``name``, if any."""
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    try:
+        return queryset.model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def cursor_position(queryset, ordering, values):
+    """
+    Converts decoded cursor ``values`` back to the types of the ``ordering``
+    fields of ``queryset``. A cursor that was tampered with, or taken from a
+    list sorted differently, fails here with a 404 instead of reaching the
+    database as a malformed comparison.
+    """
+    if len(values) != len(ordering):
+        raise NotFound("Invalid cursor")
+    position = []
+    for field, value in zip(ordering, values):
+        output = ordering_field(queryset, field.lstrip("-"))
+        # Keyset fields are never null, a null cannot be sorted past
+        if value is None or isinstance(value, (list, dict)):
+            raise NotFound("Invalid cursor")
+        try:
+            position.append(output.to_python(value) if output is not None else value)
+        except (ValidationError, ValueError, TypeError, OverflowError):
+            raise NotFound("Invalid cursor")
+    return position
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination that seeks past the last row of the previous
+    page instead of using OFFSET, and never runs a COUNT(*). Every page costs
+    one index range scan, however deep the client has scrolled, and rows
+    inserted at the head of the list do not shift the pages behind it.
+
+    ``ordering`` must end in a unique field (usually ``id``) and should be
+    backed by an index with the same column order. Its fields must not be
+    nullable.
+    """
+    ordering = ("-created", "id")
+    page_size = settings.REST_FRAMEWORK.get("PAGE_SIZE", 50)
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def get_ordering(self, view=None):
+        return tuple(getattr(view, "keyset_ordering", None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_position(self, request, queryset):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        return cursor_position(queryset, self.ordering, decode_cursor(cursor))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.get_position(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, position))
+
+        # One extra row tells us whether there is a next page without a COUNT
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+        self.next_position = None
+        if len(rows) > self.page_size:
+            last = page[-1]
+            self.next_position = [getattr(last, field.lstrip("-")) for field in self.ordering]
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor returned in `next` by the previous page.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Number of results per page (max {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+        ]
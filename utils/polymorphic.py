@@ -0,0 +1,62 @@
+from django.db.models.query import ModelIterable
+from polymorphic.managers import PolymorphicManager
+from polymorphic.query import PolymorphicQuerySet
+
+
+def parent_link_accessor(model):
+    """Name of the reverse one-to-one from a model's parent to ``model``."""
+    parent_link = next(iter(model._meta.parents.values()))
+    return parent_link.remote_field.get_accessor_name()
+
+
+class FastPathIterable(ModelIterable):
+    """
+    Yields the subclass instance joined onto each base row by
+    ``FastPathQuerySet.fast_path()``, or the base row itself when none is.
+    Annotations and other joined relations of the row carry over.
+    """
+
+    def __iter__(self):
+        accessors = self.queryset._fast_path_accessors
+        annotations = list(self.queryset.query.annotations)
+        for obj in super().__iter__():
+            cache = obj._state.fields_cache
+            child = next((cache[name] for name in accessors if cache.get(name) is not None), None)
+            if child is None:
+                yield obj
+                continue
+            for name, value in cache.items():
+                if name not in accessors:
+                    child._state.fields_cache.setdefault(name, value)
+            for name in annotations:
+                setattr(child, name, getattr(obj, name))
+            yield child
+
+
+class FastPathQuerySet(PolymorphicQuerySet):
+
+    def fast_path(self, *subclasses):
+        """
+        Loads the rows in a single statement instead of one query per
+        concrete subclass. The columns of each of ``subclasses`` (direct
+        children of the queried model) are LEFT JOINed on and rows of those
+        types come back as subclass instances; every other row comes back as
+        the queried model, without its subclass columns.
+
+        Pass only the subclasses whose own fields the caller actually reads.
+        """
+        accessors = [parent_link_accessor(subclass) for subclass in subclasses]
+        clone = self.non_polymorphic()
+        if accessors:
+            clone = clone.select_related(*accessors)
+        clone._fast_path_accessors = accessors
+        clone._iterable_class = FastPathIterable
+        return clone
+
+    def _clone(self, *args, **kwargs):
+        clone = super()._clone(*args, **kwargs)
+        clone._fast_path_accessors = getattr(self, "_fast_path_accessors", [])
+        return clone
+
+
+FastPathManager = PolymorphicManager.from_queryset(FastPathQuerySet, "FastPathManager")
@@ -0,0 +1,19 @@
+"""
+Full-text search expressions shared by the search views.
+"""
+from django.contrib.postgres.search import SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+
+def search_rank(query, *boosts):
+    """
+    Relevance of a row's ``search_vector`` to ``query``, plus any ``boosts``
+    such as a trigram similarity. ts_rank() returns a real, so the sum is
+    widened to double precision for the ``rank`` a keyset cursor carries to
+    round-trip exactly.
+    """
+    rank = SearchRank(F("search_vector"), query)
+    for boost in boosts:
+        rank = rank + boost
+    return Cast(rank, FloatField())
@@ -0,0 +1,32 @@
+"""
+Fixtures shared by the apps' API tests.
+
+``APIViewTestCase`` creates a service provider and a buyer once per class
+and calls views directly with ``call()``, authenticated as either of them.
+Each test case adds only the rows its own tests need.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def make_user(email, first_name="Test", last_name="User", **fields):
+    return get_user_model().objects.create(email=email, first_name=first_name, last_name=last_name, **fields)
+
+
+class APIViewTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = make_user(
+            "provider@example.com", first_name="Jane", last_name="Doe", user_role="service providers"
+        )
+        cls.buyer = make_user("buyer@example.com", first_name="John", last_name="Doe")
+
+    def call(self, view, method="get", data=None, user=None, format=None, **kwargs):
+        """Calls ``view`` as ``user``, the provider by default, and returns the rendered response."""
+        request = getattr(APIRequestFactory(), method)("/", data, format=format)
+        force_authenticate(request, user=user or self.provider)
+        response = view.as_view()(request, **kwargs)
+        response.render()
+        return response
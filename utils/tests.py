@@ -1,3 +1,184 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import NotFound
+
+from talkcontent.models import PostContent
+from . import images, viewcounts
+from .media import serve_media
+from .models import ViewCounter
+from .pagination import cursor_position, decode_cursor, encode_cursor
+from .testing import APIViewTestCase
+from .uploads import PARTIAL_UPLOAD_DIR
+from .views import UploadSessionSerializer
+
+
+class ViewCountsTestCase(TestCase):
+
+    def setUp(self):
+        viewcounts.flush_views()
+
+    def test_views_are_buffered_then_upserted(self):
+        listing, other = uuid.uuid4(), uuid.uuid4()
+        for _ in range(3):
+            viewcounts.record_view("taka", listing)
+        viewcounts.record_view("service", other)
+        self.assertEqual(viewcounts.view_count("taka", listing), 3)
+        self.assertFalse(ViewCounter.objects.exists())
+
+        self.assertEqual(viewcounts.flush_views(), 4)
+        self.assertEqual(viewcounts.count_view("taka", listing), 4)
+        viewcounts.flush_views()
+        self.assertEqual(ViewCounter.objects.get(target="taka", object_id=listing).count, 4)
+        self.assertEqual(ViewCounter.total("service", other), 1)
+
+
+class ViewCountFlusherTestCase(TransactionTestCase):
+    """An idle worker still writes its views out once the interval is up."""
+
+    def test_idle_buffers_are_flushed_on_the_interval(self):
+        listing = uuid.uuid4()
+        viewcounts.flush_views()
+        stop = threading.Event()
+        flusher = threading.Thread(target=viewcounts.flush_periodically, args=(stop,))
+        # The test drives its own flusher so it can stop it
+        with mock.patch.object(viewcounts, "VIEW_COUNT_FLUSH_INTERVAL", 0.2), \
+                mock.patch.object(viewcounts, "_start_flusher"):
+            viewcounts.record_view("taka", listing)
+            viewcounts.record_view("taka", listing)
+            flusher.start()
+            try:
+                deadline = time.monotonic() + 5
+                while not ViewCounter.total("taka", listing) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                stop.set()
+                flusher.join()
+        self.assertEqual(ViewCounter.total("taka", listing), 2)
+        self.assertEqual(viewcounts.view_count("taka", listing), 2)
+
+
+class CursorPositionTestCase(TestCase):
+    ordering = ("-created", "id")
+
+    def test_values_come_back_as_field_types(self):
+        created, pk = timezone.now(), uuid.uuid4()
+        values = decode_cursor(encode_cursor([created, pk]))
+        self.assertEqual(cursor_position(ViewCounter.objects.all(), self.ordering, values), [created, pk])
+
+        ranked = ViewCounter.objects.annotate(rank=Cast(F("count"), FloatField()))
+        self.assertEqual(cursor_position(ranked, ("-rank", "id"), ["0.5", str(pk)]), [0.5, pk])
+
+    def test_tampered_cursors_are_not_found(self):
+        now = timezone.now().isoformat()
+        for values in (
+            [now], [now, str(uuid.uuid4()), 1], ["yesterday", str(uuid.uuid4())], [now, "not-a-uuid"],
+            [now, None], [[now], str(uuid.uuid4())], [str(datetime.date.max) + "T99", str(uuid.uuid4())],
+        ):
+            with self.subTest(values=values), self.assertRaises(NotFound):
+                cursor_position(ViewCounter.objects.all(), self.ordering, values)
+
+        ranked = ViewCounter.objects.annotate(rank=Cast(F("count"), FloatField()))
+        with self.assertRaises(NotFound):
+            cursor_position(ranked, ("-rank", "id"), ["high", str(uuid.uuid4())])
+
+
+class UploadSessionSerializerTestCase(APIViewTestCase):
+
+    def validate(self, filename):
+        post = PostContent.objects.create(user=self.provider, title="Video", content="Watch")
+        serializer = UploadSessionSerializer(
+            data={"target": "post_video", "target_id": post.pk, "filename": filename, "size": 10},
+            context={"request": SimpleNamespace(user=self.provider)},
+        )
+        return serializer.is_valid(), serializer
+
+    def test_filenames_lose_their_directories(self):
+        for filename in ("../../talkproject/my clip.mp4", "/etc/my clip.mp4", "..\\..\\my clip.mp4"):
+            with self.subTest(filename=filename):
+                valid, serializer = self.validate(filename)
+                self.assertTrue(valid, serializer.errors)
+                self.assertEqual(serializer.validated_data["filename"], "my_clip.mp4")
+
+    def test_nameless_filenames_are_rejected(self):
+        for filename in ("..", "videos/"):
+            with self.subTest(filename=filename):
+                valid, serializer = self.validate(filename)
+                self.assertFalse(valid)
+                self.assertIn("filename", serializer.errors)
+
+
+class ServeMediaTestCase(SimpleTestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        for name in ("posts/clip.mp4", f"{PARTIAL_UPLOAD_DIR}/session.part"):
+            os.makedirs(os.path.join(media_root.name, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(media_root.name, name), "wb") as file:
+                file.write(b"0123456789")
+
+    def serve(self, path):
+        response = serve_media(RequestFactory().get(f"/media/{path}"), path)
+        return b"".join(response.streaming_content)
+
+    def test_finished_media_is_served(self):
+        self.assertEqual(self.serve("posts/clip.mp4"), b"0123456789")
+
+    def test_partial_uploads_are_not_served(self):
+        for path in (f"{PARTIAL_UPLOAD_DIR}/session.part", f"posts/../{PARTIAL_UPLOAD_DIR}/session.part"):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.serve(path)
+
+
+class ImageVariantsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.storage = FileSystemStorage(location=media_root.name)
+        exif = Image.Exif()
+        # Rotated, so the original is re-encoded into a stripped copy
+        exif[0x0112] = 6
+        os.makedirs(os.path.join(media_root.name, "posts"))
+        Image.new("RGB", (40, 20)).save(os.path.join(media_root.name, "posts/cat.jpg"), exif=exif)
+        self.fieldfile = SimpleNamespace(storage=self.storage, name="posts/cat.jpg")
+
+    def stored(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.storage.location)
+            for root, _, names in os.walk(self.storage.location) for name in names
+        )
+
+    def test_variants_are_written_next_to_a_stripped_copy(self):
+        variants = images.build_variants(self.fieldfile)
+        self.assertNotEqual(variants["source"], "posts/cat.jpg")
+        self.assertEqual(self.stored(), sorted(["posts/cat.jpg", *variants.values()]))
+
+    def test_a_failed_build_leaves_only_the_original(self):
+        replace = images._replace
+        calls = []
+
+        def fail_second(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            return replace(*args)
+
+        with mock.patch.object(images, "_replace", fail_second), self.assertRaises(OSError):
+            images.build_variants(self.fieldfile)
+        self.assertEqual(self.stored(), ["posts/cat.jpg"])
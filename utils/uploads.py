@@ -0,0 +1,133 @@
+"""
+Resumable chunked uploads.
+
+A client creates an ``UploadSession`` for a file, PUTs byte ranges of it with
+a ``Content-Range`` header, and finalizes the session once every byte has
+arrived. Each chunk is streamed from the request straight into a partial file
+under ``MEDIA_ROOT``, so neither the chunk nor the file is held in memory, and a
+dropped connection only loses the bytes that never arrived: the session
+records how far the file got and the client resumes from there.
+
+Finalizing moves the partial file to where the target model's ``upload_to``
+would have put it and creates the media row. Apps declare what uploads may
+be attached to with ``register_upload_target()``.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+# Largest file a session may be opened for, in bytes
+UPLOAD_MAX_SIZE = getattr(settings, "UPLOAD_MAX_SIZE", 2 * 1024 ** 3)
+# Chunk size suggested to clients, any size is accepted
+UPLOAD_CHUNK_SIZE = getattr(settings, "UPLOAD_CHUNK_SIZE", 8 * 1024 ** 2)
+STREAM_BLOCK_SIZE = 64 * 1024
+# Where sessions write their partial files in media storage, never served
+PARTIAL_UPLOAD_DIR = "uploads/partial"
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mov", ".webm", ".3gp", ".mkv")
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+# name -> (model, parent field, file field, allowed extensions)
+upload_targets = {}
+
+
+class UploadError(Exception):
+    pass
+
+
+def register_upload_target(name, model, parent_field, file_field, extensions=VIDEO_EXTENSIONS):
+    """
+    Lets finalized uploads be attached to ``model.<file_field>``, hanging off
+    the ``<parent_field>`` object the session was opened for. Only the owner
+    of that object (its ``user``) may upload to it.
+    """
+    upload_targets[name] = (model, parent_field, file_field, tuple(extensions))
+
+
+def target_parent(target, target_id, user_obj):
+    """The object an upload to ``target`` would hang off, if ``user_obj`` owns it."""
+    model, parent_field, _, _ = upload_targets[target]
+    parent_model = model._meta.get_field(parent_field).related_model
+    return parent_model._default_manager.filter(pk=target_id, user=user_obj).first()
+
+
+def check_filename(target, filename):
+    extensions = upload_targets[target][3]
+    if not filename.lower().endswith(extensions):
+        raise UploadError(f"Only {', '.join(extensions)} files can be uploaded here")
+
+
+def open_partial(session):
+    """Creates the empty partial file a new session is written to."""
+    path = default_storage.path(session.partial_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def parse_content_range(header, size):
+    """Returns ``(start, end)`` from ``bytes start-end/size``, end inclusive."""
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        raise UploadError("Content-Range must look like 'bytes <start>-<end>/<size>'")
+    start, end, total = (int(value) for value in match.groups())
+    if total != size or start > end or end >= size:
+        raise UploadError("Content-Range does not fit the upload")
+    return start, end
+
+
+def write_chunk(session, stream, start, end):
+    """
+    Streams the bytes ``start``-``end`` of the file from ``stream`` into the
+    partial file. Returns how many bytes arrived, which is short of the
+    range when the client dropped mid-chunk.
+    """
+    if stream is None:
+        # Empty body
+        return 0
+    remaining = end - start + 1
+    written = 0
+    with open(default_storage.path(session.partial_name), "r+b") as partial:
+        partial.seek(start)
+        while remaining:
+            block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            partial.write(block)
+            written += len(block)
+            remaining -= len(block)
+    return written
+
+
+def attach_upload(session):
+    """
+    Moves the finished partial file to its final name and creates the media
+    row for it. Returns the new row.
+    """
+    model, parent_field, file_field, _ = upload_targets[session.target]
+    instance = model(**{f"{parent_field}_id": session.target_id})
+    field = model._meta.get_field(file_field)
+    name = default_storage.get_available_name(field.generate_filename(instance, session.filename))
+
+    # Same filesystem, so the move is a rename rather than a copy
+    partial_path = default_storage.path(session.partial_name)
+    final_path = default_storage.path(name)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(partial_path, final_path)
+
+    getattr(instance, file_field).name = name
+    try:
+        instance.save()
+    except Exception:
+        # Put the file back so the finalize can be retried
+        os.replace(final_path, partial_path)
+        raise
+    return instance
+
+
+def discard_partial(session):
+    try:
+        os.remove(default_storage.path(session.partial_name))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import CreateUploadSessionView, UploadChunkView, FinalizeUploadView
+
+urlpatterns = [
+    path('', CreateUploadSessionView.as_view()),
+    path('<uuid:session_id>/', UploadChunkView.as_view()),
+    path('<uuid:session_id>/finalize/', FinalizeUploadView.as_view()),
+]
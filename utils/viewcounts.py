@@ -0,0 +1,125 @@
+"""
+Write-behind view counters.
+
+Detail views call ``count_view()``. The view is added to a counter held in
+this worker's memory, and the pending counters are written out together as
+one batched upsert (``ViewCounter.add_views``) once ``VIEW_COUNT_MAX_PENDING``
+counters are waiting, or by a daemon thread each worker starts with its first
+view once ``VIEW_COUNT_FLUSH_INTERVAL`` seconds have passed, whether or not
+more views come in. Hot listings therefore cost one row update per flush
+instead of one per view, and views never queue up on each other's row locks.
+
+The counts are approximate: other workers see a view only once it is
+flushed, at most one interval later, and a worker that is killed loses the
+views it had not flushed yet. That is one interval's worth, more if flushes
+have been failing and the views went back into the buffer. Workers flush
+what they hold when they exit normally.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .models import ViewCounter
+
+logger = logging.getLogger(__name__)
+
+# Longest a view waits in memory before it is written, in seconds
+VIEW_COUNT_FLUSH_INTERVAL = getattr(settings, "VIEW_COUNT_FLUSH_INTERVAL", 10)
+# Pending counters that trigger a flush before the interval is up
+VIEW_COUNT_MAX_PENDING = getattr(settings, "VIEW_COUNT_MAX_PENDING", 1000)
+
+_lock = threading.Lock()
+# (target, object_id, day) -> views not written yet
+_pending = Counter()
+# (target, object_id) -> the same views summed over days, for reads
+_pending_totals = Counter()
+_last_flush = time.monotonic()
+# The process the flusher thread runs in, threads do not survive a fork
+_flusher_pid = None
+
+
+def record_view(target, object_id):
+    """Counts a view of ``object_id``, flushing the buffer when it is due."""
+    _start_flusher()
+    with _lock:
+        _pending[(target, object_id, timezone.localdate())] += 1
+        _pending_totals[(target, object_id)] += 1
+        due = len(_pending) >= VIEW_COUNT_MAX_PENDING or time.monotonic() - _last_flush >= VIEW_COUNT_FLUSH_INTERVAL
+    if due:
+        flush_views()
+
+
+def view_count(target, object_id):
+    """Approximate views of ``object_id``: what is stored plus what this worker holds."""
+    stored = ViewCounter.total(target, object_id)
+    with _lock:
+        return stored + _pending_totals[(target, object_id)]
+
+
+def count_view(target, object_id):
+    """Records a view and returns the approximate count, this view included."""
+    record_view(target, object_id)
+    return view_count(target, object_id)
+
+
+def flush_views():
+    """
+    Writes the pending counters. If the write fails they go back into the
+    buffer for the next flush. Returns the number of views written.
+    """
+    global _pending, _pending_totals, _last_flush
+    with _lock:
+        counts, totals = _pending, _pending_totals
+        _pending, _pending_totals = Counter(), Counter()
+        _last_flush = time.monotonic()
+    if not counts:
+        return 0
+    try:
+        # A savepoint, so a failed flush does not break the request's transaction
+        with transaction.atomic():
+            ViewCounter.add_views(counts)
+    except DatabaseError:
+        logger.exception("Flushing %d view counters failed", len(counts))
+        with _lock:
+            _pending.update(counts)
+            _pending_totals.update(totals)
+        return 0
+    return sum(counts.values())
+
+
+def flush_periodically(stop):
+    """Flushes the buffer each time the interval is up, until ``stop`` is set."""
+    while not stop.wait(max(_last_flush + VIEW_COUNT_FLUSH_INTERVAL - time.monotonic(), 0)):
+        if time.monotonic() - _last_flush < VIEW_COUNT_FLUSH_INTERVAL:
+            # Another thread flushed in the meantime
+            continue
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Periodic view counter flush failed")
+        finally:
+            # Hold no connection while waiting for the next interval
+            connections.close_all()
+
+
+def _start_flusher():
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(
+        target=flush_periodically, args=(threading.Event(),), name="view-count-flusher", daemon=True,
+    ).start()
+
+
+atexit.register(flush_views)
@@ -1,3 +1,190 @@
-from django.shortcuts import render
+import os
 
-# Create your views here.
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.timezone import now
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import generics, serializers, status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .helpers import custom_response
+from .models import UploadSession
+from .uploads import (
+    UPLOAD_CHUNK_SIZE, UPLOAD_MAX_SIZE, UploadError, attach_upload, check_filename,
+    discard_partial, open_partial, parse_content_range, target_parent, upload_targets, write_chunk,
+)
+
+tag_names = {
+    "upload": "Upload",
+}
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    target = serializers.ChoiceField(choices=[])
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "target", "target_id", "filename", "size", "received"]
+        read_only_fields = ["id", "received"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["target"].choices = sorted(upload_targets)
+
+    def validate_filename(self, value):
+        # Only the name is kept, the storage decides which directory it lands in
+        try:
+            return default_storage.get_valid_name(os.path.basename(value.replace("\\", "/")))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError("Not a valid file name.")
+
+    def validate_size(self, value):
+        if value <= 0 or value > UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Uploads must be between 1 and {UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate(self, attrs):
+        try:
+            check_filename(attrs["target"], attrs["filename"])
+        except UploadError as e:
+            raise serializers.ValidationError({"filename": str(e)})
+        if target_parent(attrs["target"], attrs["target_id"], self.context["request"].user) is None:
+            raise serializers.ValidationError({"target_id": "Not found, or not yours to upload to."})
+        return attrs
+
+
+class UploadSessionMixin:
+
+    def get_session(self, lock=False):
+        sessions = UploadSession.objects.filter(user=self.request.user)
+        if lock:
+            sessions = sessions.select_for_update()
+        try:
+            return sessions.get(pk=self.kwargs["session_id"])
+        except (UploadSession.DoesNotExist, ValueError):
+            raise NotFound("Upload session not found")
+
+    def session_response(self, session, mssg, status_mthd=status.HTTP_200_OK, state="success"):
+        return Response(
+            custom_response(
+                status_mthd=status_mthd,
+                status=state,
+                mssg=mssg,
+                data=session.session_profile()
+            ),
+            status=status_mthd
+        )
+
+
+class CreateUploadSessionView(UploadSessionMixin, generics.GenericAPIView):
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=[tag_names["upload"]],
+        operation_id="Start an Upload",
+        description="Opens a resumable upload for a video of a post, product or service you own. "
+                    f"Then PUT the file to `uploads/<id>/` in chunks of about {UPLOAD_CHUNK_SIZE} bytes, "
+                    "each with a `Content-Range: bytes <start>-<end>/<size>` header, and POST "
+                    "`uploads/<id>/finalize/` once `received` equals `size`."
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(user=request.user)
+        open_partial(session)
+        return self.session_response(session, "Upload started", status.HTTP_201_CREATED)
+
+
+class UploadChunkView(UploadSessionMixin, generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    # The body is streamed to disk as it arrives, it is never parsed
+    parser_classes = []
+
+    @extend_schema(
+        tags=[tag_names["upload"]],
+        operation_id="Get Upload Progress",
+        description="Returns how many bytes have arrived. Resume by sending the range starting at `received`.",
+    )
+    def get(self, request, *args, **kwargs):
+        return self.session_response(self.get_session(), "Upload progress retrieved")
+
+    @extend_schema(
+        tags=[tag_names["upload"]],
+        operation_id="Upload a Chunk",
+        description="Writes the raw request body at the offset given by the `Content-Range` header. "
+                    "The range must start at the session's `received` offset.",
+        request={"application/octet-stream": bytes},
+        parameters=[OpenApiParameter("Content-Range", str, OpenApiParameter.HEADER, required=True)],
+    )
+    def put(self, request, *args, **kwargs):
+        session = self.get_session()
+        if session.attached_id is not None:
+            return self.session_response(session, "Upload already finalized", status.HTTP_409_CONFLICT, "error")
+        try:
+            start, end = parse_content_range(request.headers.get("Content-Range"), session.size)
+        except UploadError as e:
+            return self.session_response(session, str(e), status.HTTP_400_BAD_REQUEST, "error")
+        if start != session.received:
+            return self.session_response(
+                session, f"Expected a range starting at byte {session.received}",
+                status.HTTP_409_CONFLICT, "error"
+            )
+
+        # No transaction or row lock is held while a slow client sends the
+        # body. Two PUTs of the same range write the same bytes, and only the
+        # one that still finds the session at ``start`` moves it on
+        try:
+            written = write_chunk(session, request.stream, start, end)
+        except FileNotFoundError:
+            # Finalized while the chunk was arriving
+            written = None
+        advanced = written is not None and UploadSession.objects.filter(
+            pk=session.pk, received=start, attached_id__isnull=True
+        ).update(received=start + written, updated=now())
+        session.refresh_from_db()
+        if not advanced:
+            return self.session_response(
+                session, "Another request moved this upload on first", status.HTTP_409_CONFLICT, "error"
+            )
+
+        if written != end - start + 1:
+            return self.session_response(session, "Chunk was cut short", status.HTTP_400_BAD_REQUEST, "error")
+        return self.session_response(session, "Chunk received")
+
+
+class FinalizeUploadView(UploadSessionMixin, generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=[tag_names["upload"]],
+        operation_id="Finalize an Upload",
+        description="Attaches the completed file to its post, product or service.",
+        request=None,
+    )
+    def post(self, request, *args, **kwargs):
+        with transaction.atomic():
+            session = self.get_session(lock=True)
+            if session.attached_id is not None:
+                # Retried finalize, the first one went through
+                return self.session_response(session, "Upload finalized")
+            if not session.is_complete:
+                return self.session_response(
+                    session, f"{session.size - session.received} bytes are still missing",
+                    status.HTTP_409_CONFLICT, "error"
+                )
+            orphaned = target_parent(session.target, session.target_id, request.user) is None
+            if orphaned:
+                discard_partial(session)
+                session.delete()
+            else:
+                media = attach_upload(session)
+                session.attached_id = media.pk
+                session.save(update_fields=["attached_id", "updated"])
+
+        if orphaned:
+            raise NotFound("Upload target no longer exists")
+        return self.session_response(session, "Upload finalized")